@@ -0,0 +1,81 @@
+"""Critical-path report for the pre-fan-out stages of the petra_agent graph.
+
+Usage: python -m benchmarks.bench_critical_path [--latency 0.5] [--perspectives 5] [--prompts 5]
+
+Runs the graph against ``benchmarks.fakes`` once per ``pre_fanout_mode``
+(sequential, concurrent, speculative) with the same seed and prints, for
+each mode, the chain of node tasks that determined the end-to-end latency
+and how much wall time the mode saved compared to the sequential graph.
+
+The critical path is read off the recorded timeline: starting from the task
+that finished last, each step goes back to the latest-finishing task that
+ended before the current one started.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+from agent.petra_agent import graph
+from benchmarks.bench_graph import NodeTimer
+from benchmarks.fakes import FakeBehavior, install_fakes
+
+MODES = ("sequential", "concurrent", "speculative")
+Span = Tuple[str, float, float]
+
+
+def critical_path(spans: List[Span]) -> List[Span]:
+    """Return the chain of spans, earliest first, that ends with the last task to finish."""
+    path: List[Span] = []
+    remaining = sorted(spans, key=lambda span: span[2])
+    current = remaining[-1] if remaining else None
+    while current is not None:
+        path.append(current)
+        before = [span for span in remaining if span[2] <= current[1]]
+        current = before[-1] if before else None
+    return path[::-1]
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the graph once in ``mode`` and return its node spans and wall time."""
+    install_fakes(FakeBehavior(seed=args.seed, latency_median=args.latency, latency_sigma=args.sigma))
+    timer = NodeTimer()
+    inputs = {
+        "brand_info": {"company_name": "Acme", "website": "acme.example"},
+        "number_of_perspectives": args.perspectives,
+        "number_of_prompts": args.prompts,
+    }
+    config = {
+        "callbacks": [timer],
+        "configurable": {"model": "fake/bench", "search_backend": "fake", "pre_fanout_mode": mode, "max_concurrency": 64},
+    }
+    start = time.perf_counter()
+    await graph.ainvoke(inputs, config)
+    wall = time.perf_counter() - start
+    return {"mode": mode, "wall_s": wall, "path": [(node, s - start, e - start) for node, s, e in critical_path(timer.spans)]}
+
+
+def main() -> None:
+    """Print the critical path of every pre-fan-out mode."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="median fake call latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.1, help="log-normal latency spread")
+    parser.add_argument("--perspectives", type=int, default=5)
+    parser.add_argument("--prompts", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    reports = [asyncio.run(run_mode(mode, args)) for mode in MODES]
+    baseline = reports[0]["wall_s"]
+    for report in reports:
+        gained = baseline - report["wall_s"]
+        print(f"{report['mode']}: {report['wall_s']:.3f}s end to end, {gained:+.3f}s ({gained / baseline:+.0%}) vs. sequential")
+        for node, start, end in report["path"]:
+            print(f"  {start:7.3f} -> {end:7.3f}  {end - start:6.3f}s  {node}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Offline end-to-end benchmark of the petra_agent graph.
+
+Usage:
+    python -m benchmarks.bench_graph                    # run the sweep, compare to baseline
+    python -m benchmarks.bench_graph --save-baseline    # run the sweep and store it as the baseline
+    python -m benchmarks.bench_graph --quick            # smallest grid point only
+
+The graph runs against ``benchmarks.fakes`` (no API keys or network), sweeping
+perspectives x prompts x responses. Each point reports the median wall time
+of ``--repeats`` runs, model and search calls, graph steps and node tasks,
+calls/sec, peak traced memory and time spent per node.
+
+The comparison against ``benchmarks/baseline.json`` gates on the
+deterministic counts: with the same seed the fakes answer every request the
+same way, so more calls, steps or tasks than the baseline is a regression
+and a different number of responses is a behaviour change. The median wall
+time only fails the run when it is more than ``--tolerance`` slower, which
+leaves room for scheduler noise on sub-second runs. Re-save the baseline
+(``--save-baseline``) in the change that alters the graph.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from agent.petra_agent import graph
+from benchmarks.fakes import FakeBehavior, install_fakes
+
+BASELINE = Path(__file__).with_name("baseline.json")
+# Counts that are identical from run to run for the same seed and grid point.
+GATED = ("calls", "steps", "tasks")
+GRID = {"perspectives": [2, 5, 10], "prompts": [3, 5, 10], "responses": [1, 3]}
+QUICK_GRID = {"perspectives": [2], "prompts": [3], "responses": [1]}
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Accumulate wall time per graph node from callback start/end events.
+
+    ``spans`` keeps every node task as ``(node, start, end)`` perf_counter
+    times, for reports that need the timeline rather than the totals, and
+    ``steps`` is the number of graph steps (supersteps) the run took.
+    """
+
+    def __init__(self) -> None:
+        """Start with no timed tasks."""
+        self.started: Dict[UUID, tuple] = {}
+        self.nested: Dict[UUID, UUID] = {}
+        self.totals: Dict[str, float] = defaultdict(float)
+        self.spans: List[Tuple[str, float, float]] = []
+        self.steps = 0
+
+    def on_chain_start(self, serialized: Any, inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None,
+                       metadata: Optional[dict] = None, **kwargs: Any) -> None:
+        """Start timing a node task, unless the run is nested inside one."""
+        # Only the outermost run of each node task is timed; runnables nested
+        # inside it share its metadata and would otherwise be counted again.
+        if parent_run_id in self.started or parent_run_id in self.nested:
+            self.nested[run_id] = parent_run_id
+            return
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self.started[run_id] = (node, time.perf_counter())
+            self.steps = max(self.steps, metadata.get("langgraph_step", 0))
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        """Stop timing a node task and add its wall time to the node's total."""
+        self.nested.pop(run_id, None)
+        if run_id in self.started:
+            node, start = self.started.pop(run_id)
+            end = time.perf_counter()
+            self.totals[node] += end - start
+            self.spans.append((node, start, end))
+
+    on_chain_error = on_chain_end  # type: ignore[assignment]
+
+
+async def run_point(perspectives: int, prompts: int, responses: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one grid point ``--repeats`` times and report its counts and median wall time."""
+    behavior = FakeBehavior(seed=args.seed, latency_median=args.latency, latency_sigma=args.sigma, error_rate=args.error_rate,
+                            token_latency=args.token_latency)
+    inputs = {
+        "brand_info": {"company_name": behavior.brand, "website": "acme.example"},
+        "number_of_perspectives": perspectives,
+        "number_of_prompts": prompts,
+        "number_of_responses": responses,
+    }
+    configurable = {
+        "model": "fake/bench", "search_backend": "fake",
+        "max_concurrency": args.concurrency, "backoff_base": 0.01, "backoff_max": 0.05,
+        "prompt_execution_mode": args.mode,
+        "response_token_budget": args.token_budget, "response_stop_rule": args.stop_rule,
+    }
+    walls = []
+    for _ in range(max(1, args.repeats)):
+        # Fresh fakes per run, so every run makes the same requests.
+        model, search = install_fakes(behavior)
+        timer = NodeTimer()
+        start = time.perf_counter()
+        state = await graph.ainvoke(inputs, {"callbacks": [timer], "configurable": configurable})
+        walls.append(time.perf_counter() - start)
+    wall = statistics.median(walls)
+    calls = model.calls + search.calls
+
+    # Memory is traced in a separate, identical run: tracemalloc slows Python
+    # down enough to distort the timings above.
+    install_fakes(behavior)
+    tracemalloc.start()
+    await graph.ainvoke(inputs, {"configurable": configurable})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "key": f"p{perspectives}x{prompts}x{responses}",
+        "wall_s": round(wall, 4),
+        "wall_range_s": [round(min(walls), 4), round(max(walls), 4)],
+        "calls": calls,
+        "steps": timer.steps,
+        "tasks": len(timer.spans),
+        "calls_per_s": round(calls / wall, 2) if wall else 0.0,
+        "peak_mb": round(peak / 2**20, 2),
+        "responses": len(state["responses"]),
+        "node_s": {node: round(total, 4) for node, total in sorted(timer.totals.items())},
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> bool:
+    """Print each point against the baseline; return False if any point regressed."""
+    ok = True
+    for result in results:
+        base = baseline.get(result["key"])
+        if not base:
+            continue
+        flags = [f"{metric} {base[metric]} -> {result[metric]}" for metric in GATED if result[metric] > base.get(metric, result[metric])]
+        if result["responses"] != base["responses"]:
+            flags.append(f"responses {base['responses']} -> {result['responses']}")
+        ratio = result["wall_s"] / base["wall_s"] if base["wall_s"] else 1.0
+        if ratio > 1 + tolerance:
+            flags.append(f"median wall {ratio:.2f}x")
+        ok = ok and not flags
+        counts = " ".join(f"{metric}={result[metric]}" for metric in GATED)
+        print(f"  {result['key']:<12} wall {base['wall_s']:.3f}s -> {result['wall_s']:.3f}s ({ratio:.2f}x) {counts}"
+              + (f"  REGRESSION: {'; '.join(flags)}" if flags else ""))
+    return ok
+
+
+def main() -> None:
+    """Run the benchmark grid and compare it to, or save it as, the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per grid point; the median is reported")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed median wall-time slowdown vs. baseline")
+    parser.add_argument("--latency", type=float, default=0.02, help="median fake call latency in seconds")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake seconds per streamed word")
+    parser.add_argument("--sigma", type=float, default=0.5, help="log-normal latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", choices=["send", "batch"], default="send")
+    parser.add_argument("--token-budget", type=int, help="stream executions and stop them after this many output tokens")
+    parser.add_argument("--stop-rule", help="stream executions and stop them once this rule fires, e.g. brand_mentioned")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write results to this file")
+    args = parser.parse_args()
+
+    grid = QUICK_GRID if args.quick else GRID
+    results = []
+    print(f"{'point':<12} {'wall s':>7} {'calls':>6} {'steps':>6} {'tasks':>6} {'calls/s':>8} {'peak MB':>8}  slowest nodes (seconds summed over tasks)")
+    for perspectives, prompts, responses in itertools.product(*grid.values()):
+        result = asyncio.run(run_point(perspectives, prompts, responses, args))
+        results.append(result)
+        slowest = sorted(result["node_s"].items(), key=lambda kv: -kv[1])[:3]
+        print(f"{result['key']:<12} {result['wall_s']:>7.3f} {result['calls']:>6} {result['steps']:>6} {result['tasks']:>6} {result['calls_per_s']:>8.1f} "
+              f"{result['peak_mb']:>8.2f}  " + ", ".join(f"{n}={s:.3f}" for n, s in slowest))
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps({r["key"]: r for r in results}, indent=2) + "\n")
+        print(f"baseline saved to {BASELINE}")
+    elif BASELINE.exists():
+        print("compared to baseline:")
+        if not compare(results, json.loads(BASELINE.read_text()), args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
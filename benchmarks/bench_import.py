@@ -0,0 +1,63 @@
+"""Benchmark cold-start cost: importing the graph vs. building the clients.
+
+Usage: python -m benchmarks.bench_import [--runs 5]
+
+Each measurement runs in a fresh interpreter. Importing ``agent`` should not
+construct any client or need API keys; the provider SDK cost is paid on the
+first ``get_model()`` call instead.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SNIPPETS = {
+    "import agent": "import agent",
+    "import + get_model()": "import agent; from agent.config import get_model; get_model()",
+    "import + get_search_tool()": "import agent; from agent.config import get_search_tool; get_search_tool()",
+}
+
+TIMER = """
+import time
+start = time.perf_counter()
+{snippet}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(snippet: str, runs: int, env: dict) -> list:
+    """Time ``snippet`` in ``runs`` fresh interpreters, in seconds."""
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", TIMER.format(snippet=snippet)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main() -> None:
+    """Print cold import times of the agent package."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # Dummy keys so client construction succeeds; nothing is sent over the network.
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-bench"), "TAVILY_API_KEY": os.environ.get("TAVILY_API_KEY", "tvly-bench")}
+    print(f"{'scenario':<28} {'median s':>9} {'min s':>7}")
+    for name, snippet in SNIPPETS.items():
+        timings = measure(snippet, args.runs, env)
+        print(f"{name:<28} {statistics.median(timings):>9.3f} {min(timings):>7.3f}")
+
+    no_keys = {k: v for k, v in os.environ.items() if k not in ("OPENAI_API_KEY", "TAVILY_API_KEY")}
+    measure("import agent", 1, no_keys)
+    print("import agent without API keys: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark MentionMatcher against the naive per-entity substring scan.
+
+Usage: python -m benchmarks.bench_matching [--entities 100] [--responses 10000]
+
+Time per response should stay flat as the number of responses grows (linear
+total time) and grow only slowly with the number of entities.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import time
+from typing import List
+
+from agent.matching import MentionMatcher
+
+
+def _word(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def make_corpus(rng: random.Random, entities: List[str], responses: int, words: int = 300) -> List[str]:
+    """Generate ``responses`` random texts that mention some of ``entities``."""
+    vocabulary = [_word(rng, rng.randint(3, 10)) for _ in range(5000)]
+    corpus = []
+    for _ in range(responses):
+        tokens = rng.choices(vocabulary, k=words)
+        for _ in range(rng.randint(0, 6)):
+            tokens[rng.randrange(words)] = rng.choice(entities)
+        corpus.append(" ".join(tokens))
+    return corpus
+
+
+def naive_scan(texts: List[str], entities: List[str]) -> int:
+    """Count mentions the way count_brand_mentions did before MentionMatcher."""
+    # The pre-matcher count_brand_mentions approach: lowercase per entity per response.
+    hits = 0
+    for entity in entities:
+        for text in texts:
+            if entity.lower() in text.lower():
+                hits += 1
+    return hits
+
+
+def main() -> None:
+    """Compare MentionMatcher with the naive scan on a generated corpus."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entities", type=int, default=100)
+    parser.add_argument("--responses", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    entities = sorted({f"{_word(rng, 6).title()} {_word(rng, 5).title()}" for _ in range(args.entities)})
+    corpus = make_corpus(rng, entities, args.responses)
+    matcher = MentionMatcher({name: [] for name in entities})
+
+    print(f"{'responses':>10} {'entities':>9} {'matcher s':>10} {'us/resp':>8} {'naive s':>8}")
+    size = max(1, args.responses // 8)
+    while True:
+        texts = corpus[:size]
+        start = time.perf_counter()
+        for text in texts:
+            matcher.scan(text)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        naive_scan(texts, entities)
+        naive = time.perf_counter() - start
+        print(f"{size:>10} {len(entities):>9} {elapsed:>10.3f} {elapsed / size * 1e6:>8.1f} {naive:>8.3f}")
+        if size >= args.responses:
+            break
+        size = min(args.responses, size * 2)
+
+
+if __name__ == "__main__":
+    main()
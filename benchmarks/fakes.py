@@ -0,0 +1,346 @@
+"""Deterministic offline stand-ins for the chat model and the search tool.
+
+``FakeChatModel`` answers free-text prompts with answer-engine-style text that
+mentions the brand and its competitors at a configurable rate, and returns
+schema-valid ``Competitors``, ``Perspectives`` and ``Prompts`` objects for
+structured calls. Latency is drawn from a log-normal distribution and a
+fraction of calls fail with retryable 429/5xx errors. Every random draw is
+seeded from the request content, so a run is reproducible regardless of
+scheduling order.
+
+``install_fakes()`` registers both under the ``fake`` provider/backend, so a
+run selects them with ``{"model": "fake/<name>", "search_backend": "fake"}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence, Type
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from pydantic import BaseModel, ConfigDict, PrivateAttr
+
+from agent.schema import (
+    Competitor,
+    Competitors,
+    Perspective,
+    PerspectivePrompts,
+    Perspectives,
+    Prompt,
+    Prompts,
+    PromptsByPerspective,
+)
+
+_COUNT = re.compile(r"exactly\W{0,3}(\d+)", re.IGNORECASE)
+_PERSPECTIVE = re.compile(r"^Perspective (\d+):", re.MULTILINE)
+_FILLER = (
+    "quality comfort price durability design support warranty shipping reviews value "
+    "performance selection availability returns sizing materials service reputation"
+).split()
+
+
+class FakeProviderError(Exception):
+    """Mimics a provider HTTP error; retryable for 429 and 5xx like the real thing."""
+
+    def __init__(self, status_code: int) -> None:
+        """Fail like a provider answering with ``status_code``."""
+        super().__init__(f"fake provider error {status_code}")
+        self.status_code = status_code
+
+
+class FakeBehavior(BaseModel):
+    """Latency, failure and content knobs shared by the fake model and search tool."""
+
+    seed: int = 0
+    latency_median: float = 0.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    brand: str = "Acme"
+    competitors: List[str] = ["Globex", "Initech", "Umbrella", "Hooli", "Stark"]
+    mention_rate: float = 0.5
+    response_words: int = 150
+    token_latency: float = 0.0  # seconds per streamed word, after the time to first token
+
+    def rng(self, *parts: Any) -> random.Random:
+        """Return a generator seeded by the behavior's seed and ``parts``."""
+        digest = hashlib.sha256(repr((self.seed, *parts)).encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def latency(self, rng: random.Random) -> float:
+        """Draw one call's latency in seconds."""
+        if self.latency_median <= 0:
+            return 0.0
+        return rng.lognormvariate(0.0, self.latency_sigma) * self.latency_median
+
+    def maybe_fail(self, rng: random.Random) -> None:
+        """Raise a FakeProviderError with probability ``error_rate``."""
+        if self.error_rate and rng.random() < self.error_rate:
+            raise FakeProviderError(rng.choice([429, 429, 500, 503]))
+
+
+class _CallLog:
+    """Thread-safe call counter; the n-th identical request gets its own seed."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.streamed = 0
+        self.seen: Counter = Counter()
+
+    def next(self, key: str) -> int:
+        with self._lock:
+            self.calls += 1
+            self.seen[key] += 1
+            return self.seen[key]
+
+    def stream(self) -> None:
+        with self._lock:
+            self.streamed += 1
+
+
+def _text(messages: Sequence[BaseMessage]) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model with reproducible content, latency and failures."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    behavior: FakeBehavior = FakeBehavior()
+    model_name: str = "fake"
+    temperature: float = 0.0
+    _log: _CallLog = PrivateAttr(default_factory=_CallLog)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def calls(self) -> int:
+        """Number of requests made, including failed ones."""
+        return self._log.calls
+
+    @property
+    def streamed_chunks(self) -> int:
+        """Number of chunks delivered by streamed requests; stops growing when a stream is closed."""
+        return self._log.streamed
+
+    # --- Request handling ---
+    def _draw(self, prompt: str) -> random.Random:
+        attempt = self._log.next(prompt)
+        rng = self.behavior.rng(prompt, attempt)
+        return rng
+
+    def _answer(self, prompt: str, rng: random.Random) -> str:
+        behavior = self.behavior
+        words = [rng.choice(_FILLER) for _ in range(behavior.response_words)]
+        entities = [behavior.brand, *behavior.competitors]
+        for entity in entities:
+            if rng.random() < behavior.mention_rate:
+                words.insert(rng.randrange(len(words) + 1), entity)
+        return " ".join(words)
+
+    def _result(self, text: str, prompt: str) -> ChatResult:
+        usage = {
+            "input_tokens": len(prompt) // 4 + 1,
+            "output_tokens": len(text) // 4 + 1,
+            "total_tokens": len(prompt) // 4 + len(text) // 4 + 2,
+        }
+        message = AIMessage(content=text, usage_metadata=usage, response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = _text(messages)
+        rng = self._draw(prompt)
+        time.sleep(self.behavior.latency(rng))
+        self.behavior.maybe_fail(rng)
+        text = self._answer(prompt, rng)
+        time.sleep(self.behavior.token_latency * (len(text.split(" ")) + 1))  # as long as streaming it all
+        return self._result(text, prompt)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = _text(messages)
+        rng = self._draw(prompt)
+        await asyncio.sleep(self.behavior.latency(rng))
+        self.behavior.maybe_fail(rng)
+        text = self._answer(prompt, rng)
+        await asyncio.sleep(self.behavior.token_latency * (len(text.split(" ")) + 1))
+        return self._result(text, prompt)
+
+    # --- Streaming: one chunk per word, then a usage-only chunk ---
+    def _chunks(self, text: str, prompt: str) -> List[ChatGenerationChunk]:
+        words = text.split(" ")
+        chunks = [ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else f" {word}")) for i, word in enumerate(words)]
+        usage = self._result(text, prompt).generations[0].message.usage_metadata
+        chunks.append(ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage, response_metadata={"model_name": self.model_name})))
+        return chunks
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt = _text(messages)
+        rng = self._draw(prompt)
+        time.sleep(self.behavior.latency(rng))
+        self.behavior.maybe_fail(rng)
+        # Words are due at fixed times, so sleep overshoot does not add up over a long answer.
+        due = time.perf_counter()
+        for chunk in self._chunks(self._answer(prompt, rng), prompt):
+            due += self.behavior.token_latency
+            time.sleep(max(0.0, due - time.perf_counter()))
+            self._log.stream()
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = _text(messages)
+        rng = self._draw(prompt)
+        await asyncio.sleep(self.behavior.latency(rng))
+        self.behavior.maybe_fail(rng)
+        due = time.perf_counter()
+        for chunk in self._chunks(self._answer(prompt, rng), prompt):
+            due += self.behavior.token_latency
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            self._log.stream()
+            yield chunk
+
+    # --- Structured output ---
+    def _structured(self, schema: Type[BaseModel], prompt: str, rng: random.Random) -> BaseModel:
+        match = _COUNT.search(prompt)
+        count = int(match.group(1)) if match else 5
+        if schema is Competitors:
+            return Competitors(competitors=[
+                Competitor(name=name, description=f"{name} competes with {self.behavior.brand}.", website=f"https://{name.lower()}.example",
+                           logo="", industry="retail", location="United States")
+                for name in self.behavior.competitors
+            ])
+        if schema is Perspectives:
+            return Perspectives(perspectives=[
+                Perspective(intent=f"Intent {i}: {rng.choice(_FILLER)}", demographic=rng.choice(["Student", "Parent", "Retiree", "Professional"]),
+                            knowledge_level=rng.choice(["Novice", "Intermediate", "Expert"]), query_type="Commercial Investigation")
+                for i in range(count)
+            ])
+        if schema is Prompts:
+            return Prompts(prompts=self._prompts(prompt, count, rng))
+        if schema is PromptsByPerspective:
+            return PromptsByPerspective(perspectives=[
+                PerspectivePrompts(perspective_id=int(i), prompts=self._prompts(f"{prompt}#{i}", count, rng))
+                for i in _PERSPECTIVE.findall(prompt)
+            ])
+        raise ValueError(f"FakeChatModel has no structured output for {schema.__name__}")
+
+    def _prompts(self, prompt: str, count: int, rng: random.Random) -> List[Prompt]:
+        topic = hashlib.sha256(prompt.encode()).hexdigest()[:6]
+        return [
+            Prompt(text=f"What are the best options for {rng.choice(_FILLER)} and {rng.choice(_FILLER)} ({topic}-{i})?")
+            for i in range(count)
+        ]
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Runnable:  # type: ignore[override]
+        """Return a runnable producing ``schema`` instances with the same latency and failures."""
+
+        def call(messages: Any) -> BaseModel:
+            prompt = _text(messages) if isinstance(messages, list) else str(messages)
+            rng = self._draw(prompt)
+            time.sleep(self.behavior.latency(rng))
+            self.behavior.maybe_fail(rng)
+            return self._structured(schema, prompt, rng)
+
+        async def acall(messages: Any) -> BaseModel:
+            prompt = _text(messages) if isinstance(messages, list) else str(messages)
+            rng = self._draw(prompt)
+            await asyncio.sleep(self.behavior.latency(rng))
+            self.behavior.maybe_fail(rng)
+            return self._structured(schema, prompt, rng)
+
+        return RunnableLambda(call, afunc=acall, name=f"{schema.__name__}Output")
+
+
+class FakeSearchTool:
+    """Offline search tool returning Tavily-shaped results."""
+
+    def __init__(self, behavior: Optional[FakeBehavior] = None, max_results: int = 5) -> None:
+        """Answer queries with ``max_results`` results, timed and failing like ``behavior``."""
+        self.behavior = behavior or FakeBehavior()
+        self.max_results = max_results
+        self._log = _CallLog()
+
+    @property
+    def calls(self) -> int:
+        """Number of searches made."""
+        return self._log.calls
+
+    def _results(self, query: Any, rng: random.Random) -> dict:
+        brand = self.behavior.brand
+        return {
+            "query": str(query.get("query") if isinstance(query, dict) else query),
+            "results": [
+                {
+                    "title": f"{brand} result {i}",
+                    "url": f"https://example.com/{brand.lower()}/{i}",
+                    "content": " ".join([brand, *(rng.choice(_FILLER) for _ in range(60))]),
+                    "score": round(1 - i / (self.max_results + 1), 3),
+                }
+                for i in range(self.max_results)
+            ],
+        }
+
+    def invoke(self, query: Any, config: Any = None, **kwargs: Any) -> dict:
+        """Return Tavily-style results for ``query``."""
+        rng = self.behavior.rng("search", repr(query), self._log.next(repr(query)))
+        time.sleep(self.behavior.latency(rng))
+        self.behavior.maybe_fail(rng)
+        return self._results(query, rng)
+
+    async def ainvoke(self, query: Any, config: Any = None, **kwargs: Any) -> dict:
+        """Async variant of invoke."""
+        rng = self.behavior.rng("search", repr(query), self._log.next(repr(query)))
+        await asyncio.sleep(self.behavior.latency(rng))
+        self.behavior.maybe_fail(rng)
+        return self._results(query, rng)
+
+
+def install_fakes(behavior: Optional[FakeBehavior] = None) -> tuple[FakeChatModel, FakeSearchTool]:
+    """Register the fakes as the ``fake`` model provider and search backend and return them."""
+    from agent.config import register_model_provider, register_search_backend
+
+    behavior = behavior or FakeBehavior()
+    model = FakeChatModel(behavior=behavior)
+    search = FakeSearchTool(behavior)
+    register_model_provider("fake", lambda name, temperature: model)
+    register_search_backend("fake", lambda max_results: search)
+    return model, search
@@ -3,6 +3,6 @@
 This module defines a custom graph.
 """
 
-from agent.petra_agent import graph
+from agent.petra_agent import arun_brands, batch_graph, graph, run_brands
 
-__all__ = ["graph"]
+__all__ = ["graph", "batch_graph", "run_brands", "arun_brands"]
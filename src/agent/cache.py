@@ -0,0 +1,164 @@
+"""Persistent, content-addressed cache for LLM and search calls.
+
+Entries live in a single SQLite file keyed by a SHA-256 of everything that
+determines the provider's answer: model name, temperature, the input
+messages and, for structured calls, the output schema. Entries expire after
+a TTL. Once the table grows past ``max_entries`` it is trimmed, in
+least-recently-used order, to ``TRIM_RATIO`` of the bound, so the trim runs
+once per batch of inserts rather than on every one.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel
+
+from agent.configuration import Configuration
+
+MISSING = object()
+TRIM_RATIO = 0.9
+
+
+def _canonical(payload: Any) -> Any:
+    if isinstance(payload, BaseMessage):
+        return [payload.type, _canonical(payload.content)]
+    if isinstance(payload, BaseModel):
+        return payload.model_dump(mode="json")
+    if isinstance(payload, dict):
+        return {str(k): _canonical(v) for k, v in sorted(payload.items())}
+    if isinstance(payload, (list, tuple)):
+        return [_canonical(item) for item in payload]
+    if payload is None or isinstance(payload, (str, int, float, bool)):
+        return payload
+    return str(payload)
+
+
+def cache_key(kind: str, payload: Any, **params: Any) -> str:
+    """Hash a call's inputs into a stable cache key."""
+    document = {"kind": kind, "payload": _canonical(payload), "params": _canonical(params)}
+    encoded = json.dumps(document, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _encode(value: Any) -> str:
+    if isinstance(value, BaseMessage):
+        return json.dumps({"type": "message", "value": messages_to_dict([value])[0]})
+    if isinstance(value, BaseModel):
+        return json.dumps({"type": "model", "value": value.model_dump(mode="json")})
+    return json.dumps({"type": "json", "value": value})
+
+
+def _decode(raw: str, schema: Optional[type[BaseModel]] = None) -> Any:
+    document = json.loads(raw)
+    if document["type"] == "message":
+        return messages_from_dict([document["value"]])[0]
+    if document["type"] == "model":
+        if schema is None:
+            raise ValueError("A schema is required to decode a cached structured result")
+        return schema.model_validate(document["value"])
+    return document["value"]
+
+
+class ResponseCache:
+    """SQLite-backed cache with TTL expiry, LRU trimming and hit/miss counters."""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        """Open (or create) the cache database at ``path``."""
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._count = self._row_count()
+
+    def _row_count(self) -> int:
+        return int(self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0])
+
+    def get(self, key: str, node: str = "", schema: Optional[type[BaseModel]] = None) -> Any:
+        """Return the cached value or the ``MISSING`` sentinel."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._count -= 1
+                row = None
+            if row is None:
+                self.stats[node]["misses"] += 1
+                return MISSING
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.stats[node]["hits"] += 1
+        return _decode(row[0], schema)
+
+    def put(self, key: str, value: Any) -> None:
+        """Store ``value``; past the size bound, evict least-recently-used entries in a batch."""
+        now = time.time()
+        encoded = _encode(value)
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, encoded, now, now),
+            )
+            self._count += not exists
+            if self.max_entries is not None and self._count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    " SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (math.ceil(self.max_entries * TRIM_RATIO),),
+                )
+                # Recount: other processes may share the file.
+                self._count = self._row_count()
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._count = 0
+            self.stats.clear()
+
+    def __len__(self) -> int:
+        """Return the number of stored entries."""
+        with self._lock:
+            return self._row_count()
+
+
+# --- Process-wide registry, one cache per database file ---
+_caches: Dict[Tuple[str, Optional[float], Optional[int]], ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(config: Optional[RunnableConfig] = None, node: Optional[str] = None) -> Optional[ResponseCache]:
+    """Return the cache for this run, or None if caching is off (for ``node``)."""
+    configuration = Configuration.from_runnable_config(config)
+    if not configuration.cache_path:
+        return None
+    if node is not None and node not in configuration.cache_nodes:
+        return None
+    settings = (configuration.cache_path, configuration.cache_ttl_seconds, configuration.cache_max_entries)
+    with _caches_lock:
+        cache = _caches.get(settings)
+        if cache is None:
+            cache = ResponseCache(*settings)
+            _caches[settings] = cache
+        return cache
@@ -0,0 +1,203 @@
+"""Token-budgeted condensation of search results.
+
+Search results arrive as verbose, overlapping page extracts. ``condense``
+splits them into sentence snippets, drops exact and near-duplicate snippets
+(shingle Jaccard, see ``agent.dedup``), ranks the rest by the search
+engine's relevance score, position and whether they name the brand, and
+packs the best ones into a token budget. The kept snippets are printed back
+grouped by source and in their original order, so the context stays readable.
+
+Tokens are counted with tiktoken for the configured model. Its encoding is
+loaded once per process, on the first ``token_counter`` call, never at import:
+tiktoken fetches the BPE files over the network on first use. Point
+``TIKTOKEN_CACHE_DIR`` at a directory holding them to run offline, or call
+``load_encodings`` to fetch them ahead of a run. If an encoding could not be
+loaded the count falls back to the ~4 characters per token estimate, with a
+single warning.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+from dataclasses import dataclass
+from functools import cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from agent.dedup import jaccard, shingles
+from agent.scheduler import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE = 0.8
+SNIPPET_MAX_WORDS = 60
+_SENTENCE = re.compile(r"(?<=[.!?])\s+(?=[^a-z])|\n+")
+
+
+@dataclass
+class Snippet:
+    """One sentence of one search result."""
+
+    source: int
+    position: int
+    text: str
+    score: float = 0.0
+
+
+# --- Token counting ---
+ENCODINGS = ("o200k_base", "cl100k_base")
+DEFAULT_ENCODING = "o200k_base"
+_encodings: Dict[str, Any] = {}
+_attempted: Set[str] = set()
+
+
+def load_encodings(names: Iterable[str] = ENCODINGS) -> None:
+    """Load tiktoken encodings that have not been tried yet; warn once for each that fails."""
+    names = [name for name in names if name not in _attempted]
+    if not names:
+        return
+    _attempted.update(names)
+    try:
+        import tiktoken
+    except ImportError as e:
+        logger.warning("tiktoken unavailable (%s); estimating tokens from length", e)
+        return
+    for name in names:
+        try:
+            _encodings[name] = tiktoken.get_encoding(name)
+        except Exception as e:  # the BPE file could not be fetched
+            logger.warning("tiktoken encoding %s unavailable (%s); estimating tokens from length", name, e)
+
+
+def _encoding_name(model: str) -> str:
+    try:
+        from tiktoken.model import encoding_name_for_model
+
+        return encoding_name_for_model(model.rpartition("/")[2])
+    except (ImportError, KeyError):
+        return DEFAULT_ENCODING
+
+
+@cache
+def token_counter(model: str = "gpt-4o") -> Callable[[str], int]:
+    """Return a function counting the tokens of a string for ``model``."""
+    name = _encoding_name(model)
+    # Loads the encoding on first use; a no-op once it has been tried.
+    load_encodings([name])
+    encoding = _encodings.get(name)
+    if encoding is None:
+        return estimate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, budget: Optional[int], model: str = "gpt-4o") -> str:
+    """Cut ``text`` to at most ``budget`` tokens, at a sentence boundary when possible."""
+    count = token_counter(model)
+    if budget is None or count(text) <= budget:
+        return text
+    # Keep a prefix of the original text, so newlines and list markers survive.
+    end = start = used = 0
+    for match in [*_SENTENCE.finditer(text), None]:
+        stop = match.start() if match else len(text)
+        cost = count(text[start:stop]) + 1
+        if used + cost > budget:
+            break
+        end, used = stop, used + cost
+        start = match.end() if match else stop
+    if end:
+        return text[:end]
+    # A single sentence over budget: cut it proportionally.
+    return text[: max(1, len(text) * budget // max(1, count(text)))]
+
+
+# --- Parsing ---
+def _results(search_results: Any) -> List[Dict[str, Any]]:
+    if isinstance(search_results, str):
+        try:
+            search_results = json.loads(search_results)
+        except ValueError:
+            return [{"content": search_results}]
+    if isinstance(search_results, dict):
+        results = list(search_results.get("results") or [])
+        if search_results.get("answer"):
+            results.insert(0, {"title": "Search answer", "content": search_results["answer"], "score": 1.0})
+        return results
+    if isinstance(search_results, list):
+        return [r if isinstance(r, dict) else {"content": str(r)} for r in search_results]
+    return [{"content": str(search_results)}]
+
+
+def _sentences(content: str) -> List[str]:
+    # Unpunctuated extracts (tables, scraped lists) are cut into word windows
+    # so one huge "sentence" cannot exceed the budget on its own.
+    out = []
+    for sentence in _SENTENCE.split(content):
+        words = sentence.split()
+        out.extend(" ".join(words[i:i + SNIPPET_MAX_WORDS]) for i in range(0, len(words), SNIPPET_MAX_WORDS))
+    return out
+
+
+def snippets(search_results: Any) -> List[Snippet]:
+    """Split Tavily-style results (dict, JSON string or list) into sentence snippets."""
+    out = []
+    for source, result in enumerate(_results(search_results)):
+        content = result.get("content") or result.get("raw_content") or ""
+        score = float(result.get("score") or 0.0)
+        for position, sentence in enumerate(_sentences(str(content))):
+            if len(sentence) > 20:
+                out.append(Snippet(source=source, position=position, text=sentence, score=score))
+    return out
+
+
+def _dedupe(items: List[Snippet]) -> List[Snippet]:
+    kept: List[Snippet] = []
+    seen = set()
+    kept_shingles = []
+    for snippet in items:
+        key = snippet.text.lower()
+        if key in seen:
+            continue
+        grams = shingles(snippet.text)
+        if any(jaccard(grams, other) >= NEAR_DUPLICATE for other in kept_shingles):
+            continue
+        seen.add(key)
+        kept.append(snippet)
+        kept_shingles.append(grams)
+    return kept
+
+
+def _rank(snippet: Snippet, brand: str) -> float:
+    # Relevance of the page, then earlier sentences (lead paragraphs), then brand mentions.
+    mentions_brand = bool(brand) and brand.lower() in snippet.text.lower()
+    return snippet.score + 1.0 / (1 + snippet.position) + (0.5 if mentions_brand else 0.0)
+
+
+def condense(search_results: Any, budget: Optional[int], brand: str = "", model: str = "gpt-4o") -> str:
+    """Condense search results into at most ``budget`` tokens of deduplicated snippets."""
+    results = _results(search_results)
+    headers = [_header(source, result) for source, result in enumerate(results)]
+    ranked = sorted(_dedupe(snippets(search_results)), key=lambda s: -_rank(s, brand))
+    count = token_counter(model)
+    chosen: List[Snippet] = []
+    sources = set()
+    used = 0
+    for snippet in ranked:
+        # A source's header is paid for with its first snippet.
+        cost = count(snippet.text) + 2 + (0 if snippet.source in sources else count(headers[snippet.source]) + 2)
+        if budget is not None and used + cost > budget:
+            continue
+        chosen.append(snippet)
+        sources.add(snippet.source)
+        used += cost
+
+    sections = []
+    for source in sorted(sources):
+        body = "\n".join(f"- {s.text}" for s in sorted(chosen, key=lambda s: s.position) if s.source == source)
+        sections.append(f"{headers[source]}\n{body}")
+    return "\n\n".join(sections)
+
+
+def _header(source: int, result: Dict[str, Any]) -> str:
+    parts = [f"[{source + 1}]", result.get("title"), f"({result['url']})" if result.get("url") else None]
+    return " ".join(str(part) for part in parts if part)
@@ -1,10 +1,188 @@
-from langchain_openai import ChatOpenAI
-from langchain_tavily import TavilySearch
+"""Lazy, per-process factories for the LLM and search clients.
+
+Nothing here touches the network, the environment or the heavy provider SDKs
+at import time. Clients are built on first use, cached per process and keyed
+by their settings, and every OpenAI model shares one pooled sync HTTP client.
+An async HTTP client's connections belong to the event loop that opened them,
+so async callers get a pooled client, and chat models using it, per running
+loop (each ``asyncio.run`` gets its own). Which model and search backend a run
+uses comes from ``config["configurable"]`` (see
+``agent.configuration.Configuration``).
+
+``model`` and ``search_tool`` are still importable from this module; they
+resolve lazily to the default model and search backend.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import weakref
+from functools import cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
 from dotenv import load_dotenv
+from langchain_core.runnables import RunnableConfig
+
+from agent.configuration import Configuration
+
+# --- HTTP connection pooling ---
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60.0)
+HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+_env_lock = threading.Lock()
+_env_loaded = False
+
+_loop_lock = threading.Lock()
+_loop_async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient] = weakref.WeakKeyDictionary()
+_loop_models: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, float], Any]] = weakref.WeakKeyDictionary()
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def load_env() -> None:
+    """Load ``.env`` once per process, on first client construction."""
+    global _env_loaded
+    with _env_lock:
+        if not _env_loaded:
+            load_dotenv()
+            _env_loaded = True
+
+
+@cache
+def http_client() -> httpx.Client:
+    """Return the process-wide pooled sync HTTP client."""
+    return httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+def http_async_client() -> httpx.AsyncClient:
+    """Return the running event loop's pooled async HTTP client."""
+    loop = asyncio.get_running_loop()
+    with _loop_lock:
+        client = _loop_async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+            _loop_async_clients[loop] = client
+        return client
+
+
+# --- Model providers ---
+# Retries belong to agent.scheduler, which backs off and goes back through the
+# rate buckets; SDK-level retries would multiply with its attempts unseen.
+def _openai_model(name: str, temperature: float) -> Any:
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=name,
+        temperature=temperature,
+        max_retries=0,
+        http_client=http_client(),
+        # Built outside a loop, the model only serves sync calls (see get_model).
+        http_async_client=http_async_client() if _running_loop() else None,
+    )
+
+
+def _init_chat_model(provider: str) -> Callable[[str, float], Any]:
+    def factory(name: str, temperature: float) -> Any:
+        try:
+            from langchain.chat_models import init_chat_model
+        except ImportError as e:
+            raise ValueError(f"Model provider '{provider}' requires the 'langchain' package") from e
+        return init_chat_model(name, model_provider=provider, temperature=temperature, max_retries=0)
+
+    return factory
+
+
+MODEL_PROVIDERS: Dict[str, Callable[[str, float], Any]] = {"openai": _openai_model}
+
+
+def register_model_provider(provider: str, factory: Callable[[str, float], Any]) -> None:
+    """Make ``provider/<name>`` model strings build their model with ``factory(name, temperature)``."""
+    MODEL_PROVIDERS[provider] = factory
+    load_chat_model.cache_clear()
+    with _loop_lock:
+        _loop_models.clear()
+
+
+def _build_chat_model(fully_specified_name: str, temperature: float) -> Any:
+    provider, _, name = fully_specified_name.rpartition("/")
+    provider = provider or "openai"
+    load_env()
+    factory = MODEL_PROVIDERS.get(provider) or _init_chat_model(provider)
+    return factory(name, temperature)
+
+
+@cache
+def load_chat_model(fully_specified_name: str, temperature: float = 0.0) -> Any:
+    """Build (once per process) a chat model from a ``provider/model`` string."""
+    return _build_chat_model(fully_specified_name, temperature)
+
+
+def loop_chat_model(fully_specified_name: str, temperature: float = 0.0) -> Any:
+    """Build (once per running event loop) a chat model for async calls."""
+    loop = asyncio.get_running_loop()
+    key = (fully_specified_name, temperature)
+    with _loop_lock:
+        model = _loop_models.get(loop, {}).get(key)
+    if model is None:
+        # Built outside the lock: the OpenAI factory takes it for the loop's HTTP client.
+        model = _build_chat_model(fully_specified_name, temperature)
+        with _loop_lock:
+            model = _loop_models.setdefault(loop, {}).setdefault(key, model)
+    return model
+
+
+# --- Search backends ---
+def _tavily_search(max_results: int) -> Any:
+    # TavilySearch makes a single request per call, so retries stay with the scheduler.
+    from langchain_tavily import TavilySearch
+
+    return TavilySearch(max_results=max_results)
+
+
+SEARCH_BACKENDS: Dict[str, Callable[[int], Any]] = {"tavily": _tavily_search}
+
+
+def register_search_backend(backend: str, factory: Callable[[int], Any]) -> None:
+    """Make ``search_backend=backend`` build its tool with ``factory(max_results)``."""
+    SEARCH_BACKENDS[backend] = factory
+    load_search_tool.cache_clear()
+
+
+@cache
+def load_search_tool(backend: str = "tavily", max_results: int = 5) -> Any:
+    """Build (once per process) a search tool for ``backend``."""
+    if backend not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown search backend '{backend}'. Available: {sorted(SEARCH_BACKENDS)}")
+    load_env()
+    return SEARCH_BACKENDS[backend](max_results)
+
+
+# --- Per-run accessors used by the nodes ---
+def get_model(config: Optional[RunnableConfig] = None) -> Any:
+    """Return the chat model selected by this run's configuration."""
+    configuration = Configuration.from_runnable_config(config)
+    if _running_loop() is not None:
+        return loop_chat_model(configuration.model, configuration.temperature)
+    return load_chat_model(configuration.model, configuration.temperature)
+
+
+def get_search_tool(config: Optional[RunnableConfig] = None) -> Any:
+    """Return the search tool selected by this run's configuration."""
+    configuration = Configuration.from_runnable_config(config)
+    return load_search_tool(configuration.search_backend, configuration.search_max_results)
 
-# --- Load environment variables ---
-load_dotenv()
 
-# --- Setup LLM and Search Tool ---
-model = ChatOpenAI(temperature=0, model="gpt-4o")
-search_tool = TavilySearch(max_results=5)
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    # Backwards-compatible module attributes, built on first access.
+    if name == "model":
+        return get_model()
+    if name == "search_tool":
+        return get_search_tool()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,181 @@
+"""Define the configurable parameters for the agent."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field, fields
+from typing import Dict, FrozenSet, Literal, Optional
+
+from langchain_core.runnables import RunnableConfig, ensure_config
+
+
+@dataclass(kw_only=True)
+class Configuration:
+    """Per-run settings read from ``config["configurable"]``."""
+
+    model: str = field(
+        default="openai/gpt-4o",
+        metadata={"description": "Chat model as 'provider/model-name'."},
+    )
+    temperature: float = field(
+        default=0.0,
+        metadata={"description": "Sampling temperature of the chat model."},
+    )
+    search_backend: str = field(
+        default="tavily",
+        metadata={"description": "Registered search backend used by search_brand_info."},
+    )
+    search_max_results: int = field(
+        default=5,
+        metadata={"description": "Number of search results requested."},
+    )
+    search_context_tokens: Optional[int] = field(
+        default=2000,
+        metadata={"description": "Token budget for the condensed search results sent to synthesis. None keeps every unique snippet."},
+    )
+    description_tokens: Optional[int] = field(
+        default=1500,
+        metadata={"description": "Token budget for the synthesized brand description sent to later calls. None disables trimming."},
+    )
+    max_concurrency: int = field(
+        default=8,
+        metadata={"description": "Maximum number of in-flight LLM requests per process."},
+    )
+    requests_per_minute: Optional[int] = field(
+        default=None,
+        metadata={"description": "LLM requests-per-minute limit. None disables the bucket."},
+    )
+    tokens_per_minute: Optional[int] = field(
+        default=None,
+        metadata={"description": "LLM tokens-per-minute limit. None disables the bucket."},
+    )
+    search_max_concurrency: int = field(
+        default=4,
+        metadata={"description": "Maximum number of in-flight search requests per process."},
+    )
+    search_requests_per_minute: Optional[int] = field(
+        default=None,
+        metadata={"description": "Search requests-per-minute limit. None disables the bucket."},
+    )
+    max_retries: int = field(
+        default=5,
+        metadata={"description": "Retries on 429/5xx and connection errors before giving up."},
+    )
+    backoff_base: float = field(
+        default=1.0,
+        metadata={"description": "Base delay in seconds for exponential backoff."},
+    )
+    backoff_max: float = field(
+        default=60.0,
+        metadata={"description": "Upper bound in seconds for a single backoff delay."},
+    )
+    prompt_execution_mode: Literal["send", "batch"] = field(
+        default="send",
+        metadata={"description": "'send' runs one graph task per prompt; 'batch' runs chunks of prompts per task."},
+    )
+    prompt_batch_size: int = field(
+        default=25,
+        metadata={"description": "Prompts per execute_prompt_batch task in 'batch' mode."},
+    )
+    pre_fanout_mode: Literal["sequential", "concurrent", "speculative"] = field(
+        default="concurrent",
+        metadata={"description": "'concurrent' runs find_competitors alongside generate_perspectives; 'speculative' also starts perspectives, and the prompts generated from them, from the search results while synthesis runs; 'sequential' runs them one after another."},
+    )
+    prompt_generation_mode: Literal["per_perspective", "chunked"] = field(
+        default="per_perspective",
+        metadata={"description": "'per_perspective' makes one prompt-generation call per perspective; 'chunked' covers several perspectives per call."},
+    )
+    prompt_generation_chunk_size: int = field(
+        default=5,
+        metadata={"description": "Perspectives per generate_prompt_chunk call in 'chunked' mode. Bounded by the model's output limit."},
+    )
+    response_streaming: bool = field(
+        default=False,
+        metadata={"description": "Stream prompt executions and scan them for mentions as tokens arrive."},
+    )
+    response_token_budget: Optional[int] = field(
+        default=None,
+        metadata={"description": "Stop a streamed execution after this many output tokens. Implies response_streaming."},
+    )
+    response_stop_rule: Optional[str] = field(
+        default=None,
+        metadata={"description": "Stop a streamed execution once this rule fires: 'brand_mentioned', 'first_mention', 'all_mentioned' or one added with agent.streaming.register_stopping_rule. Implies response_streaming."},
+    )
+    sampling_min_samples: int = field(
+        default=3,
+        metadata={"description": "Samples taken per prompt before early stopping is considered."},
+    )
+    sampling_ci_half_width: float = field(
+        default=0.15,
+        metadata={"description": "Stop sampling a prompt once its mention-rate interval is this tight."},
+    )
+    sampling_confidence: float = field(
+        default=0.95,
+        metadata={"description": "Confidence level of the mention-rate interval."},
+    )
+    sampling_temperature: Optional[float] = field(
+        default=0.7,
+        metadata={"description": "Temperature for repeated samples (number_of_responses > 1); at 0 the samples are near-copies of each other. None keeps the model's own setting."},
+    )
+    cache_path: Optional[str] = field(
+        default=None,
+        metadata={"description": "SQLite file for the LLM/search response cache. None disables caching."},
+    )
+    cache_ttl_seconds: Optional[float] = field(
+        default=7 * 24 * 3600,
+        metadata={"description": "Age after which cached entries are ignored. None keeps them forever."},
+    )
+    cache_max_entries: Optional[int] = field(
+        default=50_000,
+        metadata={"description": "Size bound for the cache; least-recently-used entries are evicted."},
+    )
+    cache_nodes: FrozenSet[str] = field(
+        default=frozenset(
+            {
+                "search_brand_info",
+                "synthesize_brand_description",
+                "find_competitors",
+                "generate_perspectives",
+                "generate_prompts_for_perspective",
+                "generate_prompt_chunk",
+            }
+        ),
+        metadata={"description": "Nodes whose calls are cached. Prompt executions are sampled fresh by default."},
+    )
+    instrumentation: bool = field(
+        default=False,
+        metadata={"description": "Record per-node wall time, queue wait, tokens, cost and retries into state.metrics."},
+    )
+    metrics_exporter: Optional[str] = field(
+        default=None,
+        metadata={"description": "Where to export node metrics, as 'jsonl:<path>' or 'prometheus:<path>'. Implies instrumentation."},
+    )
+    dedup_threshold: Optional[float] = field(
+        default=None,
+        metadata={"description": "Collapse prompts at least this similar (shingle Jaccard, 0-1, ignoring the language's function words) before execution; 0.8 is a good starting point. None (the default) disables it."},
+    )
+    results_store_path: Optional[str] = field(
+        default=None,
+        metadata={"description": "SQLite file that accumulates every run's prompt set, responses and mentions. None disables it."},
+    )
+    freshness_seconds: Optional[float] = field(
+        default=None,
+        metadata={"description": "Incremental mode: reuse the brand's stored prompt set and re-execute only prompts last answered longer ago than this. None always runs the full pipeline."},
+    )
+    checkpoint_path: Optional[str] = field(
+        default=None,
+        metadata={"description": "SQLite file for durable runs (agent.durable.run/resume)."},
+    )
+    node_timeouts: Optional[Dict[str, Optional[float]]] = field(
+        default=None,
+        metadata={"description": "Per-node timeouts in seconds, overriding agent.durable.NODE_POLICIES. None disables a node's timeout."},
+    )
+
+    @classmethod
+    def from_runnable_config(
+        cls, config: Optional[RunnableConfig] = None
+    ) -> Configuration:
+        """Create a Configuration instance from a RunnableConfig object."""
+        config = ensure_config(config)
+        configurable = config.get("configurable") or {}
+        _fields = {f.name for f in fields(cls) if f.init}
+        return cls(**{k: v for k, v in configurable.items() if k in _fields})
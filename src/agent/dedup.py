@@ -0,0 +1,109 @@
+"""Near-duplicate prompt detection.
+
+Perspectives are expanded into prompts independently, so different personas
+often ask the same question in slightly different words ("best running shoes
+for beginners" / "best beginner running shoes"). Prompts are compared by the
+Jaccard similarity of their shingles: character 4-grams of each normalized
+word, which ignores word order, punctuation and plural/inflection endings.
+Function words of the prompts' language are dropped first, where a list for
+that language exists (``STOPWORDS``); words like "best" or "cheapest" carry
+the intent of a prompt and are kept. MinHash signatures with LSH banding
+find candidate pairs without comparing every prompt to every other one;
+candidates are then confirmed with the exact Jaccard similarity, so the
+threshold is applied exactly.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+SHINGLE_SIZE = 4
+NUM_PERMUTATIONS = 64
+BANDS = 16  # 16 bands x 4 rows: pairs at 0.8 similarity collide with probability > 0.999
+# Rewordings of the same question score above this; different questions on
+# the same topic stay below it. Deduplication itself is opt-in.
+RECOMMENDED_THRESHOLD = 0.8
+
+_MERSENNE = (1 << 61) - 1
+_WORD = re.compile(r"\w+")
+# Function words per language (BrandInfo.language, lower-cased). Languages
+# without a list keep every word.
+STOPWORDS: Dict[str, FrozenSet[str]] = {
+    "english": frozenset(
+        "a an and are as at be by can do does for from how i in is it me my of on or should "
+        "that the their them there these this to was what when where which who why will with you your".split()
+    ),
+    "turkish": frozenset(
+        "ve veya ile bir bu şu o için mi mı mu mü da de ne nedir hangi hangisi hangileri nasıl neden nerede "
+        "gibi ki ya ama olan var mıdır midir benim bana ben siz sizin".split()
+    ),
+}
+
+
+def _permutations() -> List[tuple]:
+    # Fixed (a, b) pairs so signatures, and therefore results, are reproducible.
+    out = []
+    for i in range(NUM_PERMUTATIONS):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        out.append((int.from_bytes(digest[:8], "big") % (_MERSENNE - 1) + 1, int.from_bytes(digest[8:], "big") % _MERSENNE))
+    return out
+
+
+_PERMUTATIONS = _permutations()
+
+
+def shingles(text: str, language: Optional[str] = None) -> FrozenSet[str]:
+    """Character 4-grams of each case-folded content word of ``text``."""
+    stopwords = STOPWORDS.get((language or "").strip().lower(), frozenset())
+    all_words = _WORD.findall(text.casefold())
+    words = [w for w in all_words if w not in stopwords] or all_words
+    grams = set()
+    for word in words:
+        padded = f" {word} "
+        if len(padded) <= SHINGLE_SIZE:
+            grams.add(padded)
+        grams.update(padded[i:i + SHINGLE_SIZE] for i in range(len(padded) - SHINGLE_SIZE + 1))
+    return frozenset(grams)
+
+
+def jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """Exact Jaccard similarity of two shingle sets."""
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+def minhash(grams: Iterable[str]) -> List[int]:
+    """MinHash signature of a shingle set."""
+    hashes = [int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "big") for g in grams]
+    if not hashes:
+        return [0] * NUM_PERMUTATIONS
+    return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def find_duplicates(texts: Sequence[str], threshold: float, language: Optional[str] = None) -> Dict[int, int]:
+    """Map the index of each near-duplicate text to the index of the first text it duplicates.
+
+    Texts are visited in order and each is compared only against earlier
+    representatives, so a chain of small rewordings never drifts into
+    collapsing two dissimilar prompts.
+    """
+    rows = NUM_PERMUTATIONS // BANDS
+    buckets: Dict[tuple, List[int]] = {}
+    sets: Dict[int, FrozenSet[str]] = {}
+    duplicates: Dict[int, int] = {}
+    for i, text in enumerate(texts):
+        grams = shingles(text, language)
+        signature = minhash(grams)
+        keys = [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(BANDS)]
+        candidates = sorted({j for key in keys for j in buckets.get(key, ())})
+        match = next((j for j in candidates if jaccard(grams, sets[j]) >= threshold), None)
+        if match is not None:
+            duplicates[i] = match
+            continue
+        sets[i] = grams
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+    return duplicates
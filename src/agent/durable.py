@@ -0,0 +1,258 @@
+"""Durable, resumable runs and per-node retry/timeout policies.
+
+A durable run compiles the graph with a SQLite checkpointer at
+``Configuration.checkpoint_path`` and uses the run id as the LangGraph
+thread id. Every finished node task, including each ``Send`` task, is
+written to the checkpoint as it completes, so after a crash or a failed
+task ``resume(run_id)`` re-executes only the tasks that never finished.
+
+Node policies apply to every run. A policy's retry part becomes the node's
+LangGraph ``RetryPolicy``, which retries the whole node on timeouts, output
+parsing errors and errors the scheduler already gave up on. Its timeout
+part is enforced by ``with_timeout`` and can be overridden per run with
+``node_timeouts``. A timeout counts from when the node starts running, and
+a timed-out sync node that is still running in the background is not
+retried: a second attempt would pay for the same calls twice.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextvars
+import inspect
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+from functools import cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.types import RetryPolicy
+from pydantic import BaseModel, ValidationError
+
+from agent import schema
+from agent.configuration import Configuration
+from agent.scheduler import is_retryable
+
+
+class NodeTimeoutError(TimeoutError):
+    """A node ran longer than its timeout.
+
+    ``abandoned`` is the future of a sync node's call, which keeps running
+    after the timeout; it is None for async nodes, which are cancelled.
+    """
+
+    def __init__(self, *args: Any, abandoned: Optional[concurrent.futures.Future] = None) -> None:
+        """Create the error; ``abandoned`` is the timed-out sync call, if any."""
+        super().__init__(*args)
+        self.abandoned = abandoned
+
+    @property
+    def still_running(self) -> bool:
+        """Whether the timed-out call is still running (and spending) in the background."""
+        return self.abandoned is not None and not self.abandoned.done()
+
+
+# --- Policies ---
+@dataclass(frozen=True)
+class NodePolicy:
+    """Retry, backoff and timeout settings for one node."""
+
+    max_attempts: int = 3
+    initial_interval: float = 1.0
+    backoff_factor: float = 2.0
+    max_interval: float = 30.0
+    timeout: Optional[float] = None
+
+    def retry_policy(self) -> RetryPolicy:
+        """Return the LangGraph retry policy for this node policy."""
+        return RetryPolicy(
+            initial_interval=self.initial_interval,
+            backoff_factor=self.backoff_factor,
+            max_interval=self.max_interval,
+            max_attempts=self.max_attempts,
+            retry_on=retry_on,
+        )
+
+
+def retry_on(exc: Exception) -> bool:
+    """Node-level retries: timeouts, unparseable output and transient provider errors."""
+    if isinstance(exc, NodeTimeoutError) and exc.still_running:
+        return False
+    return isinstance(exc, (TimeoutError, OutputParserException, ValidationError)) or is_retryable(exc)
+
+
+# Fan-out workers (prompt generation and execution) have no default timeout:
+# their time includes waiting for a scheduler slot, which grows with the
+# number of tasks rather than their work. Execution workers also get fewer
+# attempts, since a retry re-pays every sample of the task.
+DEFAULT_POLICY = NodePolicy()
+NODE_POLICIES: Dict[str, NodePolicy] = {
+    "search_brand_info": NodePolicy(timeout=60.0),
+    "synthesize_brand_description": NodePolicy(timeout=180.0),
+    "find_competitors": NodePolicy(timeout=180.0),
+    "generate_perspectives": NodePolicy(timeout=180.0),
+    "execute_prompts": NodePolicy(max_attempts=2),
+    "execute_prompt_batch": NodePolicy(max_attempts=2),
+    "profile_brand": NodePolicy(max_attempts=2),
+}
+
+
+def policy_for(node: str) -> NodePolicy:
+    """Return the policy of ``node``, or the default one."""
+    return NODE_POLICIES.get(node, DEFAULT_POLICY)
+
+
+def _timeout(node: str, config: RunnableConfig) -> Optional[float]:
+    overrides = Configuration.from_runnable_config(config).node_timeouts
+    if overrides and node in overrides:
+        return overrides[node]
+    return policy_for(node).timeout
+
+
+def _start(node: str, func: Callable[..., Any], *args: Any) -> concurrent.futures.Future:
+    """Run ``func(*args)`` on a thread of its own; return once it has started.
+
+    A dedicated thread means the call never queues behind other nodes, so the
+    timeout measures the node's own running time. A timed-out call is
+    abandoned, not killed: it finishes in the background.
+    """
+    future: concurrent.futures.Future = concurrent.futures.Future()
+    started = threading.Event()
+    # The copied context carries the run's config and callbacks into the thread.
+    context = contextvars.copy_context()
+
+    def target() -> None:
+        started.set()
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(context.run(func, *args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name=f"node-timeout-{node}", daemon=True).start()
+    started.wait()
+    return future
+
+
+def with_timeout(node: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a ``(state, config)`` node so it raises NodeTimeoutError past its timeout."""
+    if inspect.iscoroutinefunction(func):
+        async def awrapped(state: Any, config: RunnableConfig) -> Any:
+            timeout = _timeout(node, config)
+            if timeout is None:
+                return await func(state, config)
+            try:
+                return await asyncio.wait_for(func(state, config), timeout)
+            except asyncio.TimeoutError as e:
+                raise NodeTimeoutError(f"{node} did not finish within {timeout}s") from e
+
+        return awrapped
+
+    def wrapped(state: Any, config: RunnableConfig) -> Any:
+        timeout = _timeout(node, config)
+        if timeout is None:
+            return func(state, config)
+        future = _start(node, func, state, config)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError as e:
+            raise NodeTimeoutError(f"{node} did not finish within {timeout}s", abandoned=future) from e
+
+    return wrapped
+
+
+# --- Checkpointing ---
+# The checkpointer only revives types it is told about; every state model lives in agent.schema.
+CHECKPOINT_TYPES = tuple(
+    obj for obj in vars(schema).values()
+    if isinstance(obj, type) and issubclass(obj, BaseModel) and obj.__module__ == schema.__name__
+)
+
+
+def checkpoint_serde() -> JsonPlusSerializer:
+    """Return a serializer that round-trips the agent's state models."""
+    return JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES)
+
+
+def _builder(graph: str) -> Any:
+    from agent import petra_agent
+
+    builders = {"petra_agent": petra_agent.builder, "petra_batch": petra_agent.batch_builder}
+    if graph not in builders:
+        raise ValueError(f"Unknown graph '{graph}'. Available: {sorted(builders)}")
+    return builders[graph]
+
+
+def _checkpoint_path(config: Optional[RunnableConfig]) -> str:
+    path = Configuration.from_runnable_config(config).checkpoint_path
+    if not path:
+        raise ValueError("Durable runs need `checkpoint_path` in config['configurable']")
+    return path
+
+
+@cache
+def durable_graph(path: str, graph: str = "petra_agent") -> Any:
+    """Compile (once per process) ``graph`` with a SQLite checkpointer at ``path``."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    saver = SqliteSaver(sqlite3.connect(path, check_same_thread=False), serde=checkpoint_serde())
+    return _builder(graph).compile(checkpointer=saver)
+
+
+def _run_config(config: Optional[RunnableConfig], run_id: str) -> RunnableConfig:
+    config = dict(config or {})
+    config["configurable"] = {**(config.get("configurable") or {}), "thread_id": run_id}
+    return config
+
+
+def new_run_id() -> str:
+    """Return a fresh run id."""
+    return uuid.uuid4().hex
+
+
+def run(run_id: str, inputs: Any, config: Optional[RunnableConfig] = None, graph: str = "petra_agent") -> dict:
+    """Start durable run ``run_id`` and return its final state.
+
+    The caller picks the id up front, so it still has it to ``resume`` with
+    if this call fails part way through.
+    """
+    compiled = durable_graph(_checkpoint_path(config), graph)
+    return compiled.invoke(inputs, _run_config(config, run_id), durability="sync")
+
+
+def resume(run_id: str, config: Optional[RunnableConfig] = None, graph: str = "petra_agent") -> dict:
+    """Continue ``run_id`` from its last checkpoint, re-running only unfinished tasks."""
+    compiled = durable_graph(_checkpoint_path(config), graph)
+    return compiled.invoke(None, _run_config(config, run_id), durability="sync")
+
+
+def pending_nodes(run_id: str, config: Optional[RunnableConfig] = None, graph: str = "petra_agent") -> Tuple[str, ...]:
+    """Nodes ``run_id`` would execute next; empty once the run has finished."""
+    compiled = durable_graph(_checkpoint_path(config), graph)
+    return compiled.get_state(_run_config(config, run_id)).next
+
+
+async def _ainvoke_durable(inputs: Any, config: Optional[RunnableConfig], run_id: str, graph: str) -> dict:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    # aiosqlite connections belong to one event loop, so each async run opens its own.
+    async with aiosqlite.connect(_checkpoint_path(config)) as conn:
+        compiled = _builder(graph).compile(checkpointer=AsyncSqliteSaver(conn, serde=checkpoint_serde()))
+        return await compiled.ainvoke(inputs, _run_config(config, run_id), durability="sync")
+
+
+async def arun(run_id: str, inputs: Any, config: Optional[RunnableConfig] = None, graph: str = "petra_agent") -> dict:
+    """Async variant of run."""
+    return await _ainvoke_durable(inputs, config, run_id, graph)
+
+
+async def aresume(run_id: str, config: Optional[RunnableConfig] = None, graph: str = "petra_agent") -> dict:
+    """Async variant of resume."""
+    return await _ainvoke_durable(None, config, run_id, graph)
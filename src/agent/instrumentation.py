@@ -0,0 +1,310 @@
+"""Per-node latency, token and cost instrumentation.
+
+Enabled per run with ``{"instrumentation": True}`` (or a ``metrics_exporter``)
+in ``config["configurable"]``. Each graph node task then records its wall
+time, and every provider call it makes records the time spent queued in the
+scheduler (slot waits, rate-limit sleeps and backoff), retries, prompt and
+completion tokens from ``AIMessage.usage_metadata`` and an estimated cost.
+The counters are returned as a ``metrics`` update, so the final state holds
+them aggregated per node and per perspective, and are handed to the
+configured exporter after every node task.
+
+When disabled, a node pays for one configuration lookup and each provider
+call for one context-variable read.
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tracers.context import register_configure_hook
+
+from agent.configuration import Configuration
+from agent.scheduler import CallStats, estimate_tokens
+from agent.schema import NodeMetrics, RunMetrics
+
+# --- Prices ---
+# USD per million (input, output) tokens. Model names match by longest
+# prefix, so dated snapshots ("gpt-4o-2024-08-06") use their family's price.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "o3-mini": (1.10, 4.40),
+    "o4-mini": (1.10, 4.40),
+}
+# USD per request.
+SEARCH_PRICES: Dict[str, float] = {"tavily": 0.008}
+
+
+def register_price(model: str, input_per_million: float, output_per_million: float) -> None:
+    """Set the token prices used to estimate the cost of ``model`` calls."""
+    MODEL_PRICES[model] = (input_per_million, output_per_million)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Estimate the USD cost of a call; unknown models cost 0."""
+    name = model.rpartition("/")[2]
+    matches = [prefix for prefix in MODEL_PRICES if name.startswith(prefix)]
+    if not matches:
+        return 0.0
+    input_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+# --- Collection ---
+class _Collector:
+    """Accumulates the metrics of one node task; shared by its threads and tasks."""
+
+    def __init__(self) -> None:
+        self.metrics = RunMetrics()
+        self._lock = threading.Lock()
+
+    def record(self, node: str, metrics: NodeMetrics, perspective: Optional[str]) -> None:
+        with self._lock:
+            self.metrics.nodes.setdefault(node, NodeMetrics()).add(metrics)
+            if perspective is not None:
+                self.metrics.perspectives.setdefault(perspective, NodeMetrics()).add(metrics)
+
+
+class _UsageRecorder(BaseCallbackHandler):
+    """Sums ``usage_metadata`` of the chat model runs inside one tracked call."""
+
+    def __init__(self) -> None:
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self.model: Optional[str] = None
+        self._prompt_tokens: Dict[UUID, int] = {}
+
+    def _add(self, model: str, input_tokens: int, output_tokens: int) -> None:
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost_usd += estimate_cost(model or self.model or "", input_tokens, output_tokens)
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._prompt_tokens[run_id] = estimate_tokens(messages)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._prompt_tokens.pop(run_id, None)
+        for generations in response.generations:
+            for generation in generations:
+                message = generation.message if isinstance(generation, ChatGeneration) else None
+                usage = getattr(message, "usage_metadata", None)
+                if not usage:
+                    continue
+                self._add(message.response_metadata.get("model_name"), usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: Optional[UUID] = None, response: Optional[LLMResult] = None, **kwargs: Any) -> None:
+        # A stream closed early by streamed execution never gets its usage
+        # chunk, but the tokens it did receive are billed: estimate them.
+        prompt_tokens = self._prompt_tokens.pop(run_id, 0)
+        if not isinstance(error, GeneratorExit) or response is None or not response.generations:
+            return
+        generation = response.generations[0][0] if response.generations[0] else None
+        if isinstance(generation, ChatGeneration):
+            self._add(generation.message.response_metadata.get("model_name"), prompt_tokens, estimate_tokens(generation.text))
+
+
+_collector: ContextVar[Optional[_Collector]] = ContextVar("agent_metrics_collector", default=None)
+_node: ContextVar[str] = ContextVar("agent_metrics_node", default="")
+_perspective: ContextVar[Optional[str]] = ContextVar("agent_metrics_perspective", default=None)
+# Registered once: every chat model run inside a tracked call reports to the
+# recorder in this variable, without replacing the run's own callbacks.
+_usage: ContextVar[Optional[_UsageRecorder]] = ContextVar("agent_metrics_usage", default=None)
+register_configure_hook(_usage, inheritable=True)
+
+
+@contextmanager
+def perspective_scope(perspective_id: Optional[int]) -> Iterator[None]:
+    """Attribute the provider calls made inside the block to ``perspective_id``."""
+    token = _perspective.set(None if perspective_id is None or perspective_id < 0 else str(perspective_id))
+    try:
+        yield
+    finally:
+        _perspective.reset(token)
+
+
+@contextmanager
+def track_call(model: Optional[str] = None, search_backend: Optional[str] = None) -> Iterator[Optional[CallStats]]:
+    """Record one provider call; yields the stats to hand to the scheduler, or None when disabled."""
+    collector = _collector.get()
+    if collector is None:
+        yield None
+        return
+    stats = CallStats()
+    recorder = _UsageRecorder()
+    recorder.model = model
+    token = _usage.set(recorder)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        _usage.reset(token)
+        metrics = NodeMetrics(
+            calls=1,
+            retries=stats.retries,
+            wall_seconds=time.perf_counter() - start,
+            wait_seconds=stats.wait_seconds,
+            input_tokens=recorder.input_tokens,
+            output_tokens=recorder.output_tokens,
+            cost_usd=recorder.cost_usd + (SEARCH_PRICES.get(search_backend, 0.0) if search_backend else 0.0),
+        )
+        collector.record(_node.get(), metrics, _perspective.get())
+
+
+def record_cache_hit() -> None:
+    """Count a provider call answered from the response cache."""
+    collector = _collector.get()
+    if collector is not None:
+        collector.record(_node.get(), NodeMetrics(cache_hits=1), _perspective.get())
+
+
+# --- Exporters ---
+class JsonLinesExporter:
+    """Append one JSON object per node task to ``path``."""
+
+    def __init__(self, path: str) -> None:
+        """Append records to the JSON-lines file at ``path``."""
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, node: str, metrics: RunMetrics, config: Optional[RunnableConfig] = None) -> None:
+        """Append one record per node of ``metrics``."""
+        configurable = (config or {}).get("configurable") or {}
+        record = {
+            "timestamp": time.time(),
+            "thread_id": configurable.get("thread_id"),
+            "node": node,
+            **metrics.nodes.get(node, NodeMetrics()).model_dump(),
+            "perspectives": {key: value.model_dump() for key, value in metrics.perspectives.items()},
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class PrometheusTextfileExporter:
+    """Keep cumulative per-node counters in a Prometheus textfile.
+
+    The counters are rewritten to ``path`` in the Prometheus text format, for
+    node_exporter's textfile collector.
+    """
+
+    PREFIX = "petra_node_"
+
+    def __init__(self, path: str) -> None:
+        """Write the counters to ``path``."""
+        self.path = path
+        self.totals: Dict[str, NodeMetrics] = {}
+        self._lock = threading.Lock()
+
+    def export(self, node: str, metrics: RunMetrics, config: Optional[RunnableConfig] = None) -> None:
+        """Add ``metrics`` to the totals and rewrite the file."""
+        with self._lock:
+            for name, node_metrics in metrics.nodes.items():
+                self.totals.setdefault(name, NodeMetrics()).add(node_metrics)
+            self._write()
+
+    def render(self) -> str:
+        """Render the totals in the Prometheus text format."""
+        lines = []
+        for field in NodeMetrics.model_fields:
+            metric = f"{self.PREFIX}{field}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for node, totals in sorted(self.totals.items()):
+                lines.append(f'{metric}{{node="{node}"}} {getattr(totals, field)}')
+        return "\n".join(lines) + "\n"
+
+    def _write(self) -> None:
+        # Write-then-rename so the collector never reads a half-written file.
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, self.path)
+
+
+EXPORTERS: Dict[str, Callable[[str], Any]] = {
+    "jsonl": JsonLinesExporter,
+    "prometheus": PrometheusTextfileExporter,
+}
+
+
+def register_exporter(scheme: str, factory: Callable[[str], Any]) -> None:
+    """Make ``metrics_exporter="<scheme>:<target>"`` export through ``factory(target)``."""
+    EXPORTERS[scheme] = factory
+    get_exporter.cache_clear()
+
+
+@cache
+def get_exporter(spec: str) -> Any:
+    """Build (once per process) the exporter for a ``scheme:target`` string."""
+    scheme, sep, target = spec.partition(":")
+    if not sep or scheme not in EXPORTERS:
+        raise ValueError(f"Unknown metrics exporter '{spec}'. Available schemes: {sorted(EXPORTERS)}")
+    return EXPORTERS[scheme](target)
+
+
+# --- Node wrapper ---
+def instrument(node: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a (sync or async) node so that, when enabled, it adds its metrics to its update."""
+    takes_config = "config" in inspect.signature(func).parameters
+
+    def settings(config: RunnableConfig) -> Tuple[bool, Optional[str]]:
+        configuration = Configuration.from_runnable_config(config)
+        return configuration.instrumentation or bool(configuration.metrics_exporter), configuration.metrics_exporter
+
+    def finish(collector: _Collector, start: float, update: Any, config: RunnableConfig, exporter: Optional[str]) -> Any:
+        collector.record(node, NodeMetrics(tasks=1, wall_seconds=time.perf_counter() - start), None)
+        if exporter:
+            get_exporter(exporter).export(node, collector.metrics, config)
+        if isinstance(update, dict):
+            return {**update, "metrics": collector.metrics}
+        return update
+
+    if inspect.iscoroutinefunction(func):
+        async def awrapped(state: Any, config: RunnableConfig) -> Any:
+            args = (state, config) if takes_config else (state,)
+            enabled, exporter = settings(config)
+            if not enabled:
+                return await func(*args)
+            collector, start = _Collector(), time.perf_counter()
+            tokens = (_collector.set(collector), _node.set(node))
+            try:
+                update = await func(*args)
+            finally:
+                _collector.reset(tokens[0])
+                _node.reset(tokens[1])
+            return finish(collector, start, update, config, exporter)
+
+        return awrapped
+
+    def wrapped(state: Any, config: RunnableConfig) -> Any:
+        args = (state, config) if takes_config else (state,)
+        enabled, exporter = settings(config)
+        if not enabled:
+            return func(*args)
+        collector, start = _Collector(), time.perf_counter()
+        tokens = (_collector.set(collector), _node.set(node))
+        try:
+            update = func(*args)
+        finally:
+            _collector.reset(tokens[0])
+            _node.reset(tokens[1])
+        return finish(collector, start, update, config, exporter)
+
+    return wrapped
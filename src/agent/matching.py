@@ -0,0 +1,189 @@
+"""Single-pass, word-boundary-aware matching of brand and competitor mentions.
+
+All names and aliases are compiled into one regular expression shaped like a
+trie (shared prefixes are factored out), so each response is scanned once
+regardless of how many entities are tracked. Matches must start and end on
+Unicode word boundaries, so "Nike" does not match "Nikes" and "Apple" does
+not match "pineapple". Where names overlap the longest one wins.
+
+Names and responses are compared after Unicode case folding
+(``str.casefold``), so "Straße" matches "STRASSE". Turkish dotted and
+dotless i are folded together as well: "İstanbul", "ISTANBUL" and
+"istanbul" are the same name, as are "Kırmızı" and "KIRMIZI", because
+answer engines do not apply the Turkish casing rules consistently.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from agent.schema import Mention, ResponseMentions
+
+# Characters whose casefold is not what Turkish text needs: "İ".casefold() is
+# "i" plus a combining dot, and "ı" has no case folding at all.
+_FOLD_EXCEPTIONS = {"İ": "i", "ı": "i"}
+_FOLD_TABLE = str.maketrans(_FOLD_EXCEPTIONS)
+
+
+def _fold(text: str) -> Tuple[str, Optional[List[int]]]:
+    """Case-fold ``text``; also return each folded character's index in ``text``.
+
+    The index list is None when folding kept every character's position,
+    which is the case for most text.
+    """
+    folded = text.translate(_FOLD_TABLE).casefold()
+    if len(folded) == len(text):
+        return folded, None
+    # Some character folded into several ("ß" -> "ss"): map offsets back.
+    pieces: List[str] = []
+    origins: List[int] = []
+    for index, ch in enumerate(text):
+        piece = _FOLD_EXCEPTIONS.get(ch) or ch.casefold()
+        pieces.append(piece)
+        origins.extend([index] * len(piece))
+    return "".join(pieces), origins
+
+
+def _normalize(alias: str) -> str:
+    return " ".join(_fold(alias)[0].split())
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [
+            (r"\s+" if ch == " " else re.escape(ch)) + build(child)
+            for ch, child in sorted(node.items())
+            if ch
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Optional continuation: greedy, so the longest alias is tried first.
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class MentionMatcher:
+    """Match many entities (each with any number of aliases) in one scan."""
+
+    def __init__(self, entities: Mapping[str, Iterable[str]]) -> None:
+        """Compile a matcher for ``entities``, a mapping of entity name to its aliases."""
+        self.entities: List[str] = list(entities)
+        self._alias_to_entity: Dict[str, str] = {}
+        for entity, aliases in entities.items():
+            for alias in [entity, *aliases]:
+                key = _normalize(alias)
+                if key:
+                    self._alias_to_entity.setdefault(key, entity)
+        self._pattern: Optional[re.Pattern[str]] = None
+        if self._alias_to_entity:
+            # Texts are folded before matching, so the pattern is case-sensitive.
+            self._pattern = re.compile(r"(?<!\w)" + _trie_pattern(self._alias_to_entity) + r"(?!\w)")
+
+    @classmethod
+    def for_brand(
+        cls,
+        brand: str,
+        competitors: Iterable[str] = (),
+        aliases: Optional[Mapping[str, Iterable[str]]] = None,
+    ) -> MentionMatcher:
+        """Build a matcher for a brand, its competitors and user-supplied aliases."""
+        aliases = aliases or {}
+        entities: Dict[str, List[str]] = {brand: list(aliases.get(brand, []))}
+        for name in competitors:
+            entities.setdefault(name, []).extend(aliases.get(name, []))
+        return cls(entities)
+
+    def scan(self, text: str) -> ResponseMentions:
+        """Return hit positions, per-entity counts and first-mention ranks for one text."""
+        hits: List[Mention] = []
+        counts: Dict[str, int] = {}
+        first_mention_rank: Dict[str, int] = {}
+        if self._pattern is None:
+            return ResponseMentions()
+        folded, origins = _fold(text)
+        for match in self._pattern.finditer(folded):
+            entity = self._alias_to_entity.get(" ".join(match.group().split()))
+            if entity is None:
+                continue
+            start, end = _span(match, origins)
+            hits.append(Mention(entity=entity, start=start, end=end))
+            counts[entity] = counts.get(entity, 0) + 1
+            if entity not in first_mention_rank:
+                first_mention_rank[entity] = len(first_mention_rank) + 1
+        return ResponseMentions(hits=hits, counts=counts, first_mention_rank=first_mention_rank)
+
+    def stream(self) -> StreamingScan:
+        """Start an incremental scan of a response that arrives in chunks."""
+        return StreamingScan(self)
+
+
+def _span(match: re.Match[str], origins: Optional[List[int]]) -> Tuple[int, int]:
+    """Offsets of ``match`` (in folded text) in the original text."""
+    if origins is None:
+        return match.start(), match.end()
+    return origins[match.start()], origins[match.end() - 1] + 1
+
+
+_LAST_BOUNDARY = re.compile(r"\W(?=\w*\Z)")
+
+
+class StreamingScan:
+    """Count mentions while a response streams in, without rescanning it per chunk.
+
+    Only text up to the last non-word character is scanned, since a name can
+    still grow past it. Each scan starts an alias-length before the previous
+    one stopped so names split across chunks are found, and a match is only
+    counted if it starts after the last counted one. Where a short alias is
+    later extended into a longer one the short match stands, so final counts
+    should come from ``MentionMatcher.scan`` of the full text.
+    """
+
+    def __init__(self, matcher: MentionMatcher) -> None:
+        """Start an empty scan with ``matcher``."""
+        self.matcher = matcher
+        self.text = ""
+        self.mentions = ResponseMentions()
+        # Scanning works on the folded text; offsets below are into it.
+        self._folded = ""
+        self._origins: Optional[List[int]] = None
+        self._scanned = 0
+        self._counted = 0
+        self._overlap = 2 * max((len(alias) for alias in matcher._alias_to_entity), default=0)
+
+    def feed(self, chunk: str) -> ResponseMentions:
+        """Add ``chunk`` and return the mentions found so far (updated in place)."""
+        folded, origins = _fold(chunk)
+        if origins is not None and self._origins is None:
+            self._origins = list(range(len(self._folded)))
+        if self._origins is not None:
+            offset = len(self.text)
+            self._origins.extend(offset + index for index in (origins if origins is not None else range(len(chunk))))
+        self.text += chunk
+        self._folded += folded
+        boundary = _LAST_BOUNDARY.search(self._folded, self._scanned)
+        if self.matcher._pattern is None or boundary is None:
+            return self.mentions
+        start = max(self._counted, self._scanned - self._overlap)
+        for match in self.matcher._pattern.finditer(self._folded, start, boundary.start()):
+            entity = self.matcher._alias_to_entity.get(" ".join(match.group().split()))
+            if entity is None or match.start() < self._counted:
+                continue
+            hit_start, hit_end = _span(match, self._origins)
+            self.mentions.hits.append(Mention(entity=entity, start=hit_start, end=hit_end))
+            self.mentions.counts[entity] = self.mentions.counts.get(entity, 0) + 1
+            self.mentions.first_mention_rank.setdefault(entity, len(self.mentions.first_mention_rank) + 1)
+            self._counted = match.end()
+        self._scanned = boundary.start()
+        return self.mentions
@@ -1,121 +1,590 @@
-from langchain_core.messages import HumanMessage, AIMessage
-from agent.schema import Response, Perspectives, Prompts, State, Competitors
-from agent.config import model, search_tool
-from langgraph.constants import Send
-from typing import List
+import uuid
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.types import Send
+from pydantic import BaseModel
+
+from agent.cache import MISSING, cache_key, get_cache
+from agent.condense import condense, token_counter, truncate_to_tokens
+from agent.config import get_model, get_search_tool
+from agent.configuration import Configuration
+from agent.dedup import find_duplicates
+from agent.instrumentation import perspective_scope, record_cache_hit, track_call
+from agent.matching import MentionMatcher
 from agent.prompts.generate_perspectives import generate_perspectives_system_message
-from agent.prompts.generate_prompts import generate_prompts_system_message
+from agent.prompts.generate_prompts import (
+    generate_prompts_for_perspectives_system_message,
+    generate_prompts_system_message,
+)
+from agent.sampling import SequentialSampler
+from agent.scheduler import estimate_tokens, get_scheduler
+from agent.schema import (
+    BatchState,
+    BrandProfile,
+    BrandResult,
+    Competitors,
+    Perspectives,
+    Prompt,
+    Prompts,
+    PromptsByPerspective,
+    Response,
+    State,
+    VisibilityTally,
+    merge_tallies,
+)
+from agent.scoring import response_key, score_response
+from agent.store import get_store, prompt_set_key
+from agent.streaming import StreamState, aconsume, consume, stream_info
 
-# --- Workflow Node Implementations ---
-def search_brand_info(state: State) -> State:
+
+# --- Helpers shared by the sync and async node variants ---
+def _message_text(ai_message: AIMessage) -> str:
+    # Ensure the response content is a string.
+    if isinstance(ai_message.content, list):
+        return "\n".join(str(x) for x in ai_message.content)
+    return str(ai_message.content)
+
+def _model_call(config: RunnableConfig, payload: Any, schema: Optional[Type[BaseModel]], model_kwargs: Dict[str, Any], sample: Optional[int] = None) -> Tuple[Any, str]:
+    configuration = Configuration.from_runnable_config(config)
+    model = get_model(config)
+    runnable = model.bind(**model_kwargs) if model_kwargs else model
+    if schema:
+        runnable = runnable.with_structured_output(schema)
+    # Repeated samples of a prompt are separate draws, so each gets its own cache entry.
+    extra = {"sample": sample} if sample is not None else {}
+    key = cache_key(
+        "llm", payload,
+        model=configuration.model,
+        temperature=model_kwargs.get("temperature", configuration.temperature),
+        schema=schema.model_json_schema() if schema else None,
+        **extra,
+    )
+    return runnable, key
+
+def _invoke(config: RunnableConfig, node: str, payload: Any, schema: Optional[Type[BaseModel]] = None, sample: Optional[int] = None, **model_kwargs: Any) -> Any:
+    """Call the model (optionally with structured output) through the cache and scheduler.
+
+    ``sample`` is the index of a repeated sample of the same payload; it keeps the samples' cache entries apart.
+    """
+    runnable, key = _model_call(config, payload, schema, model_kwargs, sample)
+    cache = get_cache(config, node)
+    if cache is not None:
+        cached = cache.get(key, node, schema)
+        if cached is not MISSING:
+            record_cache_hit()
+            return cached
+    with track_call(model=Configuration.from_runnable_config(config).model) as stats:
+        result = get_scheduler(config).call(runnable.invoke, payload, tokens=estimate_tokens(payload), stats=stats)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+async def _ainvoke(config: RunnableConfig, node: str, payload: Any, schema: Optional[Type[BaseModel]] = None, sample: Optional[int] = None, **model_kwargs: Any) -> Any:
+    runnable, key = _model_call(config, payload, schema, model_kwargs, sample)
+    cache = get_cache(config, node)
+    if cache is not None:
+        cached = cache.get(key, node, schema)
+        if cached is not MISSING:
+            record_cache_hit()
+            return cached
+    with track_call(model=Configuration.from_runnable_config(config).model) as stats:
+        result = await get_scheduler(config).acall(runnable.ainvoke, payload, tokens=estimate_tokens(payload), stats=stats)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+def _streams(configuration: Configuration) -> bool:
+    return configuration.response_streaming or configuration.response_token_budget is not None or configuration.response_stop_rule is not None
+
+def _stream_call(config: RunnableConfig, payload: Any, matcher: MentionMatcher, brand: str, sample: Optional[int], model_kwargs: Dict[str, Any]) -> Tuple[Any, str, Any]:
+    configuration = Configuration.from_runnable_config(config)
+    runnable, key = _model_call(config, payload, None, model_kwargs, sample)
+    # A stopped stream's partial answer is only a valid cache hit for the same budget and rule.
+    key = cache_key("llm-stream", key, budget=configuration.response_token_budget, rule=configuration.response_stop_rule)
+    count_tokens = token_counter(configuration.model)
+    # Each attempt (the scheduler retries failed streams) starts a fresh scan.
+    def new_state() -> StreamState:
+        return StreamState(matcher.stream(), brand, configuration.response_token_budget, configuration.response_stop_rule, count_tokens)
+    return runnable, key, new_state
+
+def _stream_invoke(config: RunnableConfig, node: str, payload: Any, matcher: MentionMatcher, brand: str, sample: Optional[int] = None, **model_kwargs: Any) -> AIMessage:
+    """Stream the model's answer through the cache and scheduler, closing it early at the token budget or stopping rule."""
+    runnable, key, new_state = _stream_call(config, payload, matcher, brand, sample, model_kwargs)
+    cache = get_cache(config, node)
+    if cache is not None:
+        cached = cache.get(key, node)
+        if cached is not MISSING:
+            record_cache_hit()
+            return cached
+    tokens = estimate_tokens(payload)
+    with track_call(model=Configuration.from_runnable_config(config).model) as stats:
+        result = get_scheduler(config).call(lambda p: consume(runnable.stream(p), new_state(), tokens), payload, tokens=tokens, stats=stats)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+async def _astream_invoke(config: RunnableConfig, node: str, payload: Any, matcher: MentionMatcher, brand: str, sample: Optional[int] = None, **model_kwargs: Any) -> AIMessage:
+    runnable, key, new_state = _stream_call(config, payload, matcher, brand, sample, model_kwargs)
+    cache = get_cache(config, node)
+    if cache is not None:
+        cached = cache.get(key, node)
+        if cached is not MISSING:
+            record_cache_hit()
+            return cached
+    tokens = estimate_tokens(payload)
+    with track_call(model=Configuration.from_runnable_config(config).model) as stats:
+        result = await get_scheduler(config).acall(lambda p: aconsume(runnable.astream(p), new_state(), tokens), payload, tokens=tokens, stats=stats)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+def _search(config: RunnableConfig, node: str, query: dict) -> Any:
+    """Run the search tool through the cache and the search scheduler."""
+    configuration = Configuration.from_runnable_config(config)
+    key = cache_key("search", query, backend=configuration.search_backend, max_results=configuration.search_max_results)
+    cache = get_cache(config, node)
+    if cache is not None:
+        cached = cache.get(key, node)
+        if cached is not MISSING:
+            record_cache_hit()
+            return cached
+    with track_call(search_backend=configuration.search_backend) as stats:
+        result = get_scheduler(config, "search").call(get_search_tool(config).invoke, query, stats=stats)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+async def _asearch(config: RunnableConfig, node: str, query: dict) -> Any:
+    configuration = Configuration.from_runnable_config(config)
+    key = cache_key("search", query, backend=configuration.search_backend, max_results=configuration.search_max_results)
+    cache = get_cache(config, node)
+    if cache is not None:
+        cached = cache.get(key, node)
+        if cached is not MISSING:
+            record_cache_hit()
+            return cached
+    with track_call(search_backend=configuration.search_backend) as stats:
+        result = await get_scheduler(config, "search").acall(get_search_tool(config).ainvoke, query, stats=stats)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+# Messages are a human-readable log, not a data store: long contents are cut
+# so the raw search dump and the full description are not checkpointed again.
+MESSAGE_CHAR_LIMIT = 500
+
+def _log(state: State, message: BaseMessage) -> List[BaseMessage]:
+    """Return the update appending ``message`` (truncated) to the message log."""
+    content = message.content if isinstance(message.content, str) else _message_text(message)
+    if len(content) > MESSAGE_CHAR_LIMIT:
+        message = message.model_copy(update={"content": content[:MESSAGE_CHAR_LIMIT] + f"... [{len(content) - MESSAGE_CHAR_LIMIT} chars truncated]"})
+    return [message]
+
+def _search_query(state: State) -> dict:
     company_name = state.brand_info.company_name
     website = state.brand_info.website
-    query = f"What is {company_name} ({website})? Give a comprehensive overview of the brand, its products, market, and recent activities."
-    search_results = search_tool.invoke({"query": query})
-    state.brand_description = str(search_results)
-    state.messages.append(HumanMessage(content=f"Tavily search results for {company_name}: {search_results}"))
-    return state
+    return {"query": f"What is {company_name} ({website})? Give a comprehensive overview of the brand, its products, market, and recent activities."}
 
-def synthesize_brand_description(state: State) -> State:
+# Nodes return partial updates rather than the whole state: returning State
+# would feed every reducer field (prompts, tally, metrics, ...) back into its
+# own reducer and double it.
+def _record_search(state: State, search_results: Any, config: RunnableConfig) -> dict:
+    # The raw payload is condensed to a token budget before anything else sees it.
+    configuration = Configuration.from_runnable_config(config)
+    context = condense(search_results, configuration.search_context_tokens, state.brand_info.company_name, configuration.model)
+    return {
+        "brand_description": context,
+        "messages": _log(state, HumanMessage(content=f"Tavily search results for {state.brand_info.company_name}: {context}")),
+    }
+
+def _synthesis_messages(state: State) -> List[HumanMessage]:
     company_name = state.brand_info.company_name
     website = state.brand_info.website
     search_context = state.brand_description or ""
     prompt = f"""
 Given the following search results about the brand {company_name} (website: {website}), write a comprehensive, objective, and up-to-date description of the brand, its core business, products, market position, and any recent news or activities. Be as detailed as possible for an AI agent to understand the brand's domain and context.\n\nSearch Results:\n{search_context}
 """
-    messages = [HumanMessage(content=prompt)]
-    ai_message: AIMessage = model.invoke(messages)
-    if isinstance(ai_message.content, list):
-        description = "\n".join(str(x) for x in ai_message.content)
-    else:
-        description = str(ai_message.content)
-    state.brand_description = description
-    state.messages.append(ai_message)
-    return state
-
-def find_competitors(state: State) -> State:
+    return [HumanMessage(content=prompt)]
+
+def _record_synthesis(state: State, ai_message: AIMessage, config: RunnableConfig) -> dict:
+    # Every later call resends the description, so it is held to its own budget.
+    configuration = Configuration.from_runnable_config(config)
+    description = truncate_to_tokens(_message_text(ai_message), configuration.description_tokens, configuration.model)
+    return {"brand_description": description, "messages": _log(state, ai_message)}
+
+def _competitor_messages(state: State) -> List[HumanMessage]:
     brand_description = state.brand_description or ""
     prompt = f"""
 Given the following brand description, find the top 10 competitors of the brand :
 {brand_description}
 """
-    structured_llm = model.with_structured_output(Competitors)
-    competitors = structured_llm.invoke([HumanMessage(content=prompt)])
-    state.competitors = competitors.competitors
-
-    return state
+    return [HumanMessage(content=prompt)]
 
-def generate_perspectives(state: State) -> State:
+def _perspective_messages(state: State) -> list:
     brand_description = state.brand_description or ""
-    number_of_perspectives = state.number_of_perspectives
-    region = state.brand_info.region
-    language = state.brand_info.language
-
-    system_message = generate_perspectives_system_message(number_of_perspectives, region, language)
-    
+    system_message = generate_perspectives_system_message(state.number_of_perspectives, state.brand_info.region, state.brand_info.language)
     human_message = HumanMessage(content=f"Generate perspectives based on this brand description:\n{brand_description}")
-    
-    # Use structured output for Perspectives
-    structured_llm = model.with_structured_output(Perspectives)
-    result = structured_llm.invoke([system_message, human_message])
-    
-    state.perspectives = result.perspectives
-    state.messages.append(AIMessage(content=f"Generated {len(result.perspectives)} perspectives"))
-    return state
-
-def generate_prompts_for_perspective(state: dict) -> dict:
-    """Receives a dictionary payload from Send() and generates prompts."""
+    return [system_message, human_message]
+
+def _record_perspectives(state: State, result: Perspectives) -> dict:
+    return {
+        "perspectives": result.perspectives,
+        "messages": _log(state, AIMessage(content=f"Generated {len(result.perspectives)} perspectives")),
+    }
+
+# Prompt-generation calls put everything that is the same for every call of a
+# run (system message, brand description) first and the perspective(s) last,
+# so providers can serve the shared prefix from their prompt cache.
+def _prompt_prefix(state: dict, system_message_factory) -> list:
+    number_of_prompts = state.get("number_of_prompts", 5)
+    region = state.get("region") or "United States"
+    language = state.get("language") or "English"
+    return [
+        system_message_factory(number_of_prompts, region, language),
+        HumanMessage(content=f"Brand Description:\n{state.get('brand_description') or ''}"),
+    ]
+
+def _prompt_messages(state: dict) -> list:
     # Use dictionary key access instead of attribute access
-    brand_description = state.get("brand_description", "")
     perspective = state.get("current_perspective")
-    number_of_prompts = state.get("number_of_prompts", 5)
-    region = state.get("region", "United States")
-    language = state.get("language", "English")
+    human_message = HumanMessage(content=f"""Generate prompts for this perspective:
+{perspective.model_dump_json(indent=2, exclude_none=True)}""")
+    return [*_prompt_prefix(state, generate_prompts_system_message), human_message]
 
-    if not perspective:
-        return {"prompts": []} # Return a valid update, even if empty
+def _chunk_messages(state: dict) -> list:
+    listing = "\n\n".join(
+        f"Perspective {i}:\n{perspective.model_dump_json(indent=2, exclude_none=True)}"
+        for i, perspective in zip(state["perspective_ids"], state["perspectives"])
+    )
+    human_message = HumanMessage(content=f"Generate prompts for each of these perspectives:\n{listing}")
+    return [*_prompt_prefix(state, generate_prompts_for_perspectives_system_message), human_message]
 
-    system_message = generate_prompts_system_message(number_of_prompts, region, language)
+# --- Workflow Node Implementations ---
+def search_brand_info(state: State, config: RunnableConfig) -> dict:
+    search_results = _search(config, "search_brand_info", _search_query(state))
+    return _record_search(state, search_results, config)
 
-    human_message = HumanMessage(content=f"""Generate prompts for this perspective:
-{perspective.model_dump_json(indent=2)}
+async def asearch_brand_info(state: State, config: RunnableConfig) -> dict:
+    """Async variant of search_brand_info."""
+    search_results = await _asearch(config, "search_brand_info", _search_query(state))
+    return _record_search(state, search_results, config)
 
-Brand Description:
-{brand_description}""")
+def synthesize_brand_description(state: State, config: RunnableConfig) -> dict:
+    ai_message: AIMessage = _invoke(config, "synthesize_brand_description", _synthesis_messages(state))
+    return _record_synthesis(state, ai_message, config)
+
+async def asynthesize_brand_description(state: State, config: RunnableConfig) -> dict:
+    """Async variant of synthesize_brand_description."""
+    ai_message: AIMessage = await _ainvoke(config, "synthesize_brand_description", _synthesis_messages(state))
+    return _record_synthesis(state, ai_message, config)
+
+def find_competitors(state: State, config: RunnableConfig) -> dict:
+    competitors = _invoke(config, "find_competitors", _competitor_messages(state), Competitors)
+    return {"competitors": competitors.competitors}
+
+async def afind_competitors(state: State, config: RunnableConfig) -> dict:
+    """Async variant of find_competitors."""
+    competitors = await _ainvoke(config, "find_competitors", _competitor_messages(state), Competitors)
+    return {"competitors": competitors.competitors}
+
+def generate_perspectives(state: State, config: RunnableConfig) -> dict:
+    # Use structured output for Perspectives
+    result = _invoke(config, "generate_perspectives", _perspective_messages(state), Perspectives)
+    return _record_perspectives(state, result)
+
+async def agenerate_perspectives(state: State, config: RunnableConfig) -> dict:
+    """Async variant of generate_perspectives."""
+    result = await _ainvoke(config, "generate_perspectives", _perspective_messages(state), Perspectives)
+    return _record_perspectives(state, result)
+
+# --- Pre-fan-out routing ---
+# Perspectives only need a description of the brand and competitors are only
+# needed once prompts are executed and scored, so by default find_competitors
+# runs in the same step as generate_perspectives. Speculative mode also starts
+# generate_perspectives from the condensed search results while synthesis is
+# in flight. The prompt fan-out is routed from inside that generate_perspectives
+# task, which cannot see what synthesis writes in the same step, so in this
+# mode the prompts are written from the search results too; only competitors
+# come from the synthesized description. In every mode collect_prompts waits
+# for find_competitors before prompts are executed.
+def route_after_search(state: State, config: RunnableConfig) -> List[str]:
+    """Start generate_perspectives alongside synthesis in speculative mode."""
+    if Configuration.from_runnable_config(config).pre_fanout_mode == "speculative":
+        return ["synthesize_brand_description", "generate_perspectives"]
+    return ["synthesize_brand_description"]
+
+def route_after_synthesis(state: State, config: RunnableConfig) -> List[str]:
+    """Start generate_perspectives alongside find_competitors in concurrent mode."""
+    if Configuration.from_runnable_config(config).pre_fanout_mode == "concurrent":
+        return ["find_competitors", "generate_perspectives"]
+    return ["find_competitors"]
+
+def route_after_competitors(state: State, config: RunnableConfig) -> List[str]:
+    """Start generate_perspectives after find_competitors in sequential mode."""
+    if Configuration.from_runnable_config(config).pre_fanout_mode == "sequential":
+        return ["generate_perspectives"]
+    return []
+
+def _tag_prompts(prompts: List[Prompt], state: dict) -> List[Prompt]:
+    # Prompts reference their perspective by index instead of embedding a copy of it.
+    perspective_id = state.get("perspective_id", -1)
+    return [p.model_copy(update={"perspective_id": perspective_id}) for p in prompts]
+
+def generate_prompts_for_perspective(state: dict, config: RunnableConfig) -> dict:
+    """Receives a dictionary payload from Send() and generates prompts."""
+    if not state.get("current_perspective"):
+        return {"prompts": []} # Return a valid update, even if empty
 
     # Use structured output for Prompts
-    structured_llm = model.with_structured_output(Prompts)
-    result = structured_llm.invoke([system_message, human_message])
+    with perspective_scope(state.get("perspective_id")):
+        result = _invoke(config, "generate_prompts_for_perspective", _prompt_messages(state), Prompts)
 
     # Wrap the list in a dictionary with the key matching the State field
-    return {"prompts": result.prompts}
+    return {"prompts": _tag_prompts(result.prompts, state)}
 
-def parallel_prompt_generation(state: State) -> str | List[Send]:
+async def agenerate_prompts_for_perspective(state: dict, config: RunnableConfig) -> dict:
+    """Async variant of generate_prompts_for_perspective."""
+    if not state.get("current_perspective"):
+        return {"prompts": []}
+
+    with perspective_scope(state.get("perspective_id")):
+        result = await _ainvoke(config, "generate_prompts_for_perspective", _prompt_messages(state), Prompts)
+    return {"prompts": _tag_prompts(result.prompts, state)}
+
+def _chunk_prompts(result: PromptsByPerspective, state: dict) -> Tuple[List[Prompt], List[int]]:
+    """Tag the prompts of a chunked call; also return the requested perspectives the model skipped."""
+    requested = state["perspective_ids"]
+    by_id: Dict[int, List[Prompt]] = {}
+    for entry in result.perspectives:
+        if entry.perspective_id in requested and entry.perspective_id not in by_id and entry.prompts:
+            by_id[entry.perspective_id] = entry.prompts
+    prompts = [p.model_copy(update={"perspective_id": i}) for i in requested for p in by_id.get(i, [])]
+    return prompts, [i for i in requested if i not in by_id]
+
+def _single_perspective(state: dict, perspective_id: int) -> dict:
+    perspective = state["perspectives"][state["perspective_ids"].index(perspective_id)]
+    return {**state, "current_perspective": perspective, "perspective_id": perspective_id}
+
+def generate_prompt_chunk(state: dict, config: RunnableConfig) -> dict:
+    """Generate prompts for several perspectives with one structured call.
+
+    Perspectives the model leaves out are generated one by one, so every perspective gets prompts.
     """
-    Route based on human feedback. If feedback is provided, return to perspective generation.
-    Otherwise, initiate parallel prompt generation using Send().
+    if not state.get("perspectives"):
+        return {"prompts": []}
+
+    result = _invoke(config, "generate_prompt_chunk", _chunk_messages(state), PromptsByPerspective)
+    prompts, missing = _chunk_prompts(result, state)
+    for perspective_id in missing:
+        prompts += generate_prompts_for_perspective(_single_perspective(state, perspective_id), config)["prompts"]
+    return {"prompts": prompts}
+
+async def agenerate_prompt_chunk(state: dict, config: RunnableConfig) -> dict:
+    """Async variant of generate_prompt_chunk."""
+    if not state.get("perspectives"):
+        return {"prompts": []}
+
+    result = await _ainvoke(config, "generate_prompt_chunk", _chunk_messages(state), PromptsByPerspective)
+    prompts, missing = _chunk_prompts(result, state)
+    for perspective_id in missing:
+        prompts += (await agenerate_prompts_for_perspective(_single_perspective(state, perspective_id), config))["prompts"]
+    return {"prompts": prompts}
+
+def parallel_prompt_generation(state: State, config: RunnableConfig) -> Union[List[Send], str]:
+    """Initiate parallel prompt generation using Send().
+
+    There is one task per perspective, or one per chunk of perspectives in 'chunked' mode.
+    Without perspectives there is nothing to fan out, and the join after prompt
+    generation would never fire, so the run goes straight to collect_prompts.
     """
+    if not state.perspectives:
+        return "collect_prompts"
+    configuration = Configuration.from_runnable_config(config)
+    payload = {
+        "brand_description": state.brand_description,
+        "number_of_prompts": state.number_of_prompts,
+        "region": state.brand_info.region,
+        "language": state.brand_info.language,
+    }
+    if configuration.prompt_generation_mode == "chunked":
+        size = max(1, configuration.prompt_generation_chunk_size)
+        return [
+            Send("generate_prompt_chunk", {"perspectives": state.perspectives[i:i + size], "perspective_ids": list(range(i, min(i + size, len(state.perspectives)))), **payload})
+            for i in range(0, len(state.perspectives), size)
+        ]
     return [
-        Send("generate_prompts_for_perspective", {"current_perspective": perspective, "brand_description": state.brand_description, "number_of_prompts": state.number_of_prompts})
-        for perspective in state.perspectives
+        Send("generate_prompts_for_perspective", {"current_perspective": perspective, "perspective_id": i, **payload})
+        for i, perspective in enumerate(state.perspectives)
     ]
 
-def execute_prompts_in_parallel(state: State) -> List[Send]:
+def _sampling_payload(state: State) -> dict:
+    # Workers score their own responses, so they need every entity to match.
+    # A batch run scores every audited brand; early stopping follows the first.
+    brand = state.brand_info.company_name
+    entities = {brand: state.aliases.get(brand, [])}
+    for other in state.brands if isinstance(state, BatchState) else []:
+        entities.setdefault(other.company_name, state.aliases.get(other.company_name, []))
+    for competitor in state.competitors:
+        entities.setdefault(competitor.name, state.aliases.get(competitor.name, []))
+    return {
+        "number_of_responses": state.number_of_responses,
+        "brand": brand,
+        "entities": entities,
+    }
+
+def collect_prompts(state: State, config: RunnableConfig) -> dict:
+    """Join point after the per-perspective prompt generation tasks.
+
+    Routing from here sees every generated prompt at once instead of one perspective's worth,
+    so this is where near-duplicate prompts from different perspectives are collapsed.
     """
-    Executes all generated prompts against the LLM and collects the responses.
+    threshold = Configuration.from_runnable_config(config).dedup_threshold
+    if threshold is None:
+        return {}
+    duplicates = find_duplicates([p.text for p in state.prompts], threshold, state.brand_info.language)
+    return {
+        "prompt_duplicates": duplicates,
+        "messages": _log(state, AIMessage(content=f"Collapsed {len(duplicates)} of {len(state.prompts)} prompts as near-duplicates")),
+    }
+
+def _calls_saved(state: State) -> Tuple[int, int]:
+    """Return (calls saved by prompt collapsing, calls saved in total) for a finished run."""
+    # A collapsed prompt would have been sampled as often as the prompt that answered for it.
+    samples = {s.prompt_id: s.samples for s in state.sampling}
+    dedup = sum(samples.get(kept, 0) for kept in state.prompt_duplicates.values())
+    return dedup, dedup + sum(s.calls_saved for s in state.sampling)
+
+def execute_prompts_in_parallel(state: State, config: RunnableConfig) -> Union[List[Send], str]:
+    """Execute all generated prompts against the LLM and collect the responses.
+
     This node runs after all parallel prompt generation is complete.
+    With no prompts to execute the run goes straight to scoring ("score", which
+    each graph maps to its own scoring node).
     """
-    print(f"--- Executing {len(state.prompts)} generated prompts ---")
-    
-    # Create a list of Send() calls for each prompt
+    # Collapsed near-duplicates are not executed; the prompt kept in their
+    # place carries their perspectives, so its responses count for each of them.
+    prompt_ids = [i for i in range(len(state.prompts)) if i not in state.prompt_duplicates]
+    if not prompt_ids:
+        return "score"
+    print(f"--- Executing {len(prompt_ids)} generated prompts ---")
+    configuration = Configuration.from_runnable_config(config)
+    payload = _sampling_payload(state)
+
+    # In batch mode, one task per chunk keeps checkpoint writes and reducer
+    # merges proportional to the number of chunks rather than prompts.
+    if configuration.prompt_execution_mode == "batch":
+        size = max(1, configuration.prompt_batch_size)
+        return [
+            Send("execute_prompt_batch", {
+                "prompts": [state.prompts[i] for i in chunk],
+                "prompt_ids": chunk,
+                "perspective_ids": [state.prompt_perspective_ids(i) for i in chunk],
+                **payload,
+            })
+            for chunk in (prompt_ids[start:start + size] for start in range(0, len(prompt_ids), size))
+        ]
+
+    # Create a list of Send() calls for each prompt. The scheduler, not the
+    # number of Send() tasks, bounds how many of them hit the provider at once.
     return [
-        Send("execute_prompts", {"prompt": prompt})
-        for prompt in state.prompts
+        Send("execute_prompts", {"prompt": state.prompts[i], "prompt_id": i, "perspective_ids": [state.prompt_perspective_ids(i)], **payload})
+        for i in prompt_ids
     ]
 
-def execute_prompts(payload: dict) -> dict:
-    """
-    Executes a SINGLE prompt against the LLM.
+def _batch_runnable(config: RunnableConfig, node: str, stream_scoring: Optional[Tuple[MentionMatcher, str]] = None, **model_kwargs: Any) -> RunnableLambda:
+    # Every item still goes through the cache and scheduler, so the batch
+    # respects the same concurrency and rate limits as single calls. Items are
+    # (perspective_id, sample_index, payload) so instrumentation can attribute
+    # each call and repeated samples do not share a cache entry.
+    # With ``stream_scoring`` (matcher, brand) each call is streamed and may stop early.
+    def call(item: Tuple[int, int, Any]) -> Any:
+        perspective_id, sample, payload = item
+        with perspective_scope(perspective_id):
+            if stream_scoring is not None:
+                return _stream_invoke(config, node, payload, *stream_scoring, sample=sample, **model_kwargs)
+            return _invoke(config, node, payload, sample=sample, **model_kwargs)
+
+    async def acall(item: Tuple[int, int, Any]) -> Any:
+        perspective_id, sample, payload = item
+        with perspective_scope(perspective_id):
+            if stream_scoring is not None:
+                return await _astream_invoke(config, node, payload, *stream_scoring, sample=sample, **model_kwargs)
+            return await _ainvoke(config, node, payload, sample=sample, **model_kwargs)
+
+    return RunnableLambda(call, afunc=acall, name=node)
+
+class _PromptSampler:
+    """Drives adaptive sampling for a group of prompts, one batched round at a time."""
+
+    def __init__(self, prompts: List[Prompt], prompt_ids: List[int], payload: dict, config: RunnableConfig):
+        configuration = Configuration.from_runnable_config(config)
+        max_samples = payload.get("number_of_responses", 1)
+        self.prompts = prompts
+        self.prompt_ids = prompt_ids
+        self.perspective_ids = payload.get("perspective_ids") or [[p.perspective_id] for p in prompts]
+        self.samplers = [
+            SequentialSampler(max_samples, configuration.sampling_min_samples, configuration.sampling_ci_half_width, configuration.sampling_confidence)
+            for _ in prompts
+        ]
+        self.brand = payload.get("brand", "")
+        self.matcher = MentionMatcher(payload.get("entities") or {self.brand: []})
+        self.tally = VisibilityTally()
+        model_kwargs = {}
+        if max_samples > 1 and configuration.sampling_temperature is not None:
+            model_kwargs["temperature"] = configuration.sampling_temperature
+        stream_scoring = (self.matcher, self.brand) if _streams(configuration) else None
+        self.runnable = _batch_runnable(config, "execute_prompts", stream_scoring, **model_kwargs)
+        self.batch_config: RunnableConfig = {"max_concurrency": configuration.max_concurrency}
+        self.responses: List[Response] = []
+        self.jobs: List[Tuple[int, int]] = []
+
+    def next_round(self) -> List[Tuple[int, int, str]]:
+        """(perspective_id, sample_index, text) to sample in the next round; empty once every prompt has stopped."""
+        self.jobs = [
+            (i, sampler.trials + k)
+            for i, sampler in enumerate(self.samplers)
+            for k in range(sampler.next_round_size())
+        ]
+        return [(self.prompts[i].perspective_id, sample, self.prompts[i].text) for i, sample in self.jobs]
+
+    def record(self, job: int, ai_message: AIMessage) -> None:
+        """Score one sample as soon as it lands."""
+        i, sample = self.jobs[job]
+        text = _message_text(ai_message)
+        sampler = self.samplers[i]
+        self.responses.append(Response(prompt_id=self.prompt_ids[i], response=text, sample_index=sample, **stream_info(ai_message)))
+        mentions = self.matcher.scan(text)
+        sampler.add(self.brand in mentions.counts)
+        delta = score_response(self.perspective_ids[i], mentions, response_key(self.prompt_ids[i], sample))
+        self.tally = merge_tallies(self.tally, delta)
+
+    def update(self) -> dict:
+        # A list because the state reducers (operator.add) concatenate lists.
+        return {
+            "responses": self.responses,
+            "sampling": [sampler.report(prompt_id) for prompt_id, sampler in zip(self.prompt_ids, self.samplers)],
+            "tally": self.tally,
+        }
+
+def _sample_prompts(prompts: List[Prompt], prompt_ids: List[int], payload: dict, config: RunnableConfig) -> dict:
+    sampler = _PromptSampler(prompts, prompt_ids, payload, config)
+    while items := sampler.next_round():
+        for job, ai_message in sampler.runnable.batch_as_completed(items, config=sampler.batch_config):
+            sampler.record(job, ai_message)
+    return sampler.update()
+
+async def _asample_prompts(prompts: List[Prompt], prompt_ids: List[int], payload: dict, config: RunnableConfig) -> dict:
+    sampler = _PromptSampler(prompts, prompt_ids, payload, config)
+    while items := sampler.next_round():
+        async for job, ai_message in sampler.runnable.abatch_as_completed(items, config=sampler.batch_config):
+            sampler.record(job, ai_message)
+    return sampler.update()
+
+def execute_prompts(payload: dict, config: RunnableConfig) -> dict:
+    """Execute a SINGLE prompt against the LLM, sampling it up to number_of_responses times.
+
     This node is the worker that runs in parallel.
     """
     # 1. Get the single prompt from the payload dictionary.
@@ -124,43 +593,173 @@ def execute_prompts(payload: dict) -> dict:
         # Return an empty list for the update if the prompt is missing
         return {"responses": []}
 
-    # 2. Invoke the model with the text from the single prompt.
-    ai_message: AIMessage = model.invoke(p.text)
+    # 2. Sample the prompt until its brand-mention rate is pinned down.
+    return _sample_prompts([p], [payload.get("prompt_id", -1)], payload, config)
 
-    # Ensure the response content is a string.
-    if isinstance(ai_message.content, list):
-        response_text = "\n".join(str(x) for x in ai_message.content)
-    else:
-        response_text = str(ai_message.content)
+async def aexecute_prompts(payload: dict, config: RunnableConfig) -> dict:
+    """Async variant of execute_prompts."""
+    p = payload.get("prompt")
+    if not p:
+        return {"responses": []}
 
-    # 3. Create a single Response object.
-    result = Response(prompt=p, response=response_text)
+    return await _asample_prompts([p], [payload.get("prompt_id", -1)], payload, config)
 
-    # 4. Return a dictionary to update the 'responses' field.
-    #    It MUST be a list because the state reducer (operator.add) concatenates lists.
-    return {"responses": [result]}
+def execute_prompt_batch(payload: dict, config: RunnableConfig) -> dict:
+    """Execute a chunk of prompts with a single batch call per sampling round.
 
-def count_brand_mentions(state: State) -> State:
+    Used instead of execute_prompts when prompt_execution_mode is "batch".
     """
-    Counts brand and competitor mentions across all responses.
+    prompts = payload.get("prompts") or []
+    if not prompts:
+        return {"responses": []}
+
+    return _sample_prompts(prompts, payload.get("prompt_ids", []), payload, config)
+
+async def aexecute_prompt_batch(payload: dict, config: RunnableConfig) -> dict:
+    """Async variant of execute_prompt_batch."""
+    prompts = payload.get("prompts") or []
+    if not prompts:
+        return {"responses": []}
+
+    return await _asample_prompts(prompts, payload.get("prompt_ids", []), payload, config)
+
+def count_brand_mentions(state: State) -> dict:
+    """Count brand and competitor mentions across all responses.
+
+    Each response is scanned once for every entity; counts are recomputed from scratch,
+    so re-running the node never accumulates onto previous totals.
     """
-    responses = state.responses
     brand_name = state.brand_info.company_name
-    competitors = state.competitors
+    dedup_calls_saved, calls_saved = _calls_saved(state)
+    matcher = MentionMatcher.for_brand(brand_name, [c.name for c in state.competitors], state.aliases)
+    response_mentions = [matcher.scan(response.response) for response in state.responses]
+
+    # Number of responses that mention each entity at least once
+    mentioned_in: Dict[str, int] = {}
+    for mentions in response_mentions:
+        for entity in mentions.counts:
+            mentioned_in[entity] = mentioned_in.get(entity, 0) + 1
+
+    # Return only the fields this node owns: echoing the whole state back
+    # would re-append prompts and responses through their operator.add reducers.
+    return {
+        "brand_mentions": mentioned_in.get(brand_name, 0),
+        "competitors": [c.model_copy(update={"mentions": mentioned_in.get(c.name, 0)}) for c in state.competitors],
+        "response_mentions": response_mentions,
+        "calls_saved": calls_saved,
+        "dedup_calls_saved": dedup_calls_saved,
+    }
+
+# --- Results store ---
+# With a results store and a freshness window, a brand that already has a
+# stored prompt set skips search, synthesis, competitors and prompt generation:
+# load_prompt_set restores them and keeps only the stale prompts, which then
+# run through collect_prompts and execution as usual. A prompt set is only
+# reused by runs with the settings it was generated for (_prompt_set_key). The
+# tally starts from the stored answers to the fresh prompts, so it covers the
+# whole prompt set even when nothing is re-executed; responses and mention
+# counts cover the re-executed prompts.
+def _prompt_set_key(state: State) -> str:
+    return prompt_set_key(state.brand_info.region, state.brand_info.language, state.number_of_perspectives, state.number_of_prompts)
+
+def route_start(state: State, config: RunnableConfig) -> str:
+    """Start from the stored prompt set in incremental runs of a brand that has one."""
+    store = get_store(config)
+    if Configuration.from_runnable_config(config).freshness_seconds is None or store is None:
+        return "search_brand_info"
+    return "load_prompt_set" if store.has_prompt_set(state.brand_info.company_name, _prompt_set_key(state)) else "search_brand_info"
+
+def load_prompt_set(state: State, config: RunnableConfig) -> dict:
+    """Restore the brand's stored prompt set, keeping only prompts older than the freshness window."""
+    configuration = Configuration.from_runnable_config(config)
+    store = get_store(config)
+    brand = state.brand_info.company_name
+    prompt_set = store.latest_prompt_set(brand, _prompt_set_key(state))
+    stale = store.stale_prompts(brand, configuration.model, prompt_set, configuration.freshness_seconds)
+    fresh = sorted(set(range(len(prompt_set.prompts))) - set(stale))
+    return {
+        "prompt_set_id": prompt_set.set_id,
+        "brand_description": prompt_set.brand_description,
+        "competitors": prompt_set.competitors,
+        "perspectives": prompt_set.perspectives,
+        "prompts": [prompt_set.prompts[i] for i in stale],
+        "tally": store.stored_tally(brand, configuration.model, prompt_set, fresh),
+        "messages": _log(state, AIMessage(content=f"Re-executing {len(stale)} of {len(prompt_set.prompts)} stored prompts")),
+    }
 
-    # Initialize counts if they don't exist, or reset for this run
-    state.brand_mentions = 0
+def store_results(state: State, config: RunnableConfig) -> dict:
+    """Append the run's responses and mentions to the results store, saving a newly generated prompt set first."""
+    store = get_store(config)
+    if store is None:
+        return {}
+    brand = state.brand_info.company_name
+    prompt_set_id = state.prompt_set_id or store.save_prompt_set(
+        brand, state.perspectives, state.prompts, state.competitors, state.brand_description, _prompt_set_key(state)
+    )
+    run_id = ((config or {}).get("configurable") or {}).get("thread_id") or uuid.uuid4().hex
+    store.add_responses(
+        run_id, brand, Configuration.from_runnable_config(config).model, state.perspectives, state.prompts,
+        state.responses, state.response_mentions, state.prompt_duplicates,
+    )
+    return {"prompt_set_id": prompt_set_id}
 
-    # Count brand mentions
-    for response in responses:
-        if brand_name.lower() in response.response.lower(): # Case-insensitive check
-            state.brand_mentions += 1
+# --- Multi-brand batch nodes ---
+# A batch run profiles each brand (search, synthesis, competitors), builds one
+# perspective and prompt set for the whole market, executes it once and scores
+# every brand against the shared responses.
+MARKET_DESCRIPTION_CHARS = 12_000
+
+def profile_brands_in_parallel(state: BatchState) -> List[Send]:
+    """Fan out one profile_brand task per audited brand."""
+    return [Send("profile_brand", {"brand_info": brand}) for brand in state.brands]
+
+def profile_brand(payload: dict, config: RunnableConfig) -> dict:
+    """Search, describe and find the competitors of one brand of a batch."""
+    state = State(brand_info=payload["brand_info"])
+    state = state.model_copy(update=search_brand_info(state, config))
+    state = state.model_copy(update=synthesize_brand_description(state, config))
+    competitors = find_competitors(state, config)["competitors"]
+    return {"profiles": [BrandProfile(brand_info=state.brand_info, brand_description=state.brand_description, competitors=competitors)]}
+
+async def aprofile_brand(payload: dict, config: RunnableConfig) -> dict:
+    """Async variant of profile_brand."""
+    state = State(brand_info=payload["brand_info"])
+    state = state.model_copy(update=await asearch_brand_info(state, config))
+    state = state.model_copy(update=await asynthesize_brand_description(state, config))
+    competitors = (await afind_competitors(state, config))["competitors"]
+    return {"profiles": [BrandProfile(brand_info=state.brand_info, brand_description=state.brand_description, competitors=competitors)]}
+
+def describe_market(state: BatchState) -> dict:
+    """Join point after profiling.
+
+    Builds the market description the shared perspectives are generated from,
+    and the union of competitors that every response is scanned for.
+    Each brand gets an equal share of a fixed budget, so the prompt does not grow with the batch.
+    """
+    share = max(300, MARKET_DESCRIPTION_CHARS // max(1, len(state.profiles)))
+    market = state.brand_info.domain or "the market these brands compete in"
+    sections = [f"## {p.brand_info.company_name} ({p.brand_info.website})\n{(p.brand_description or '')[:share]}" for p in state.profiles]
+    description = f"Market: {market}. Describe the market as a whole; do not favor any single brand.\n\n" + "\n\n".join(sections)
 
-    # Count competitor mentions
-    for competitor in competitors:
+    audited = {b.company_name.lower() for b in state.brands}
+    competitors: Dict[str, Any] = {}
+    for profile in state.profiles:
+        for competitor in profile.competitors:
+            if competitor.name.lower() not in audited:
+                competitors.setdefault(competitor.name.lower(), competitor)
+    return {"brand_description": description, "competitors": list(competitors.values())}
 
-        for response in responses:
-            if competitor.name.lower() in response.response.lower(): # Case-insensitive check
-                competitor.mentions += 1
-    
-    return state
\ No newline at end of file
+def score_brands(state: BatchState) -> dict:
+    """Score every brand of the batch against the shared responses."""
+    results = {}
+    for profile in state.profiles:
+        scored = count_brand_mentions(State(brand_info=profile.brand_info, competitors=profile.competitors, responses=state.responses, aliases=state.aliases))
+        results[profile.brand_info.company_name] = BrandResult(
+            brand_info=profile.brand_info,
+            brand_description=profile.brand_description,
+            competitors=scored["competitors"],
+            brand_mentions=scored["brand_mentions"],
+            visibility=scored["brand_mentions"] / len(state.responses) if state.responses else 0.0,
+        )
+    dedup_calls_saved, calls_saved = _calls_saved(state)
+    return {"results": results, "calls_saved": calls_saved, "dedup_calls_saved": dedup_calls_saved}
@@ -1,36 +1,179 @@
-from agent.schema import State
-from langgraph.graph import StateGraph, END, START
-from agent.nodes import *
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import END, START, StateGraph
+
+from agent.durable import policy_for, with_timeout
+from agent.instrumentation import instrument
+from agent.nodes import (
+    aexecute_prompt_batch,
+    aexecute_prompts,
+    afind_competitors,
+    agenerate_perspectives,
+    agenerate_prompt_chunk,
+    agenerate_prompts_for_perspective,
+    aprofile_brand,
+    asearch_brand_info,
+    asynthesize_brand_description,
+    collect_prompts,
+    count_brand_mentions,
+    describe_market,
+    execute_prompt_batch,
+    execute_prompts,
+    execute_prompts_in_parallel,
+    find_competitors,
+    generate_perspectives,
+    generate_prompt_chunk,
+    generate_prompts_for_perspective,
+    load_prompt_set,
+    parallel_prompt_generation,
+    profile_brand,
+    profile_brands_in_parallel,
+    route_after_competitors,
+    route_after_search,
+    route_after_synthesis,
+    route_start,
+    score_brands,
+    search_brand_info,
+    store_results,
+    synthesize_brand_description,
+)
+from agent.schema import BatchState, BrandInfo, BrandResult, State
+
+
+def node(func, afunc=None) -> RunnableLambda:
+    """Wrap a node so graph.invoke runs `func` and graph.ainvoke runs `afunc`, both instrumented and timed out."""
+    name = func.__name__
+
+    def wrap(f):
+        return with_timeout(name, instrument(name, f))
+
+    return RunnableLambda(wrap(func), afunc=wrap(afunc) if afunc else None, name=name)
+
+def add_node(builder: StateGraph, func, afunc=None) -> None:
+    """Add a node named after `func`, with its retry policy from agent.durable.NODE_POLICIES."""
+    name = func.__name__
+    builder.add_node(name, node(func, afunc), retry_policy=policy_for(name).retry_policy())
 
 # --- Graph Construction ---
 builder = StateGraph(State)
 
 # Add nodes
-builder.add_node("search_brand_info", search_brand_info)
-builder.add_node("synthesize_brand_description", synthesize_brand_description)
-builder.add_node("generate_perspectives", generate_perspectives)
-builder.add_node("generate_prompts_for_perspective", generate_prompts_for_perspective)
-builder.add_node("execute_prompts", execute_prompts)
-builder.add_node("count_brand_mentions", count_brand_mentions)
-builder.add_node("find_competitors", find_competitors)
+add_node(builder, search_brand_info, asearch_brand_info)
+add_node(builder, synthesize_brand_description, asynthesize_brand_description)
+add_node(builder, generate_perspectives, agenerate_perspectives)
+add_node(builder, generate_prompts_for_perspective, agenerate_prompts_for_perspective)
+add_node(builder, generate_prompt_chunk, agenerate_prompt_chunk)
+add_node(builder, execute_prompts, aexecute_prompts)
+add_node(builder, collect_prompts)
+add_node(builder, execute_prompt_batch, aexecute_prompt_batch)
+add_node(builder, count_brand_mentions)
+add_node(builder, find_competitors, afind_competitors)
+add_node(builder, load_prompt_set)
+add_node(builder, store_results)
 
 # Add edges
-builder.add_edge(START, "search_brand_info")
-builder.add_edge("search_brand_info", "synthesize_brand_description")
-builder.add_edge("synthesize_brand_description", "find_competitors")
-builder.add_edge("find_competitors", "generate_perspectives")
+# Incremental runs (freshness_seconds) of a brand with a stored prompt set
+# start from it and go straight to execution.
+builder.add_conditional_edges(START, route_start, ["search_brand_info", "load_prompt_set"])
+builder.add_edge("load_prompt_set", "collect_prompts")
+# find_competitors and generate_perspectives run side by side unless
+# pre_fanout_mode says otherwise; see the routing functions in agent.nodes.
+builder.add_conditional_edges(
+    "search_brand_info",
+    route_after_search,
+    ["synthesize_brand_description", "generate_perspectives"]
+)
+builder.add_conditional_edges(
+    "synthesize_brand_description",
+    route_after_synthesis,
+    ["find_competitors", "generate_perspectives"]
+)
+builder.add_conditional_edges("find_competitors", route_after_competitors, ["generate_perspectives"])
 builder.add_conditional_edges(
     "generate_perspectives",
     parallel_prompt_generation,
-    ["generate_prompts_for_perspective"]
+    ["generate_prompts_for_perspective", "generate_prompt_chunk", "collect_prompts"]
 )
+# Join: collect_prompts waits for the competitors and for whichever prompt
+# generation node the run used. The other barrier never fills, which is harmless.
+# A run without perspectives goes from generate_perspectives to collect_prompts
+# directly; scoring is at least a step later, so the competitors are in by then.
+builder.add_edge(["find_competitors", "generate_prompts_for_perspective"], "collect_prompts")
+builder.add_edge(["find_competitors", "generate_prompt_chunk"], "collect_prompts")
 builder.add_conditional_edges(
-    "generate_prompts_for_perspective",
+    "collect_prompts",
     execute_prompts_in_parallel,
-    ["execute_prompts"]
+    {"execute_prompts": "execute_prompts", "execute_prompt_batch": "execute_prompt_batch", "score": "count_brand_mentions"}
 )
 builder.add_edge("execute_prompts", "count_brand_mentions")
-builder.add_edge("count_brand_mentions", END)
+builder.add_edge("execute_prompt_batch", "count_brand_mentions")
+builder.add_edge("count_brand_mentions", "store_results")
+builder.add_edge("store_results", END)
 
 # Compile the graph
-graph = builder.compile()
\ No newline at end of file
+graph = builder.compile()
+
+# --- Multi-brand batch graph ---
+batch_builder = StateGraph(BatchState)
+
+add_node(batch_builder, profile_brand, aprofile_brand)
+add_node(batch_builder, describe_market)
+add_node(batch_builder, generate_perspectives, agenerate_perspectives)
+add_node(batch_builder, generate_prompts_for_perspective, agenerate_prompts_for_perspective)
+add_node(batch_builder, generate_prompt_chunk, agenerate_prompt_chunk)
+add_node(batch_builder, collect_prompts)
+add_node(batch_builder, execute_prompts, aexecute_prompts)
+add_node(batch_builder, execute_prompt_batch, aexecute_prompt_batch)
+add_node(batch_builder, score_brands)
+
+batch_builder.add_conditional_edges(START, profile_brands_in_parallel, ["profile_brand"])
+batch_builder.add_edge("profile_brand", "describe_market")
+batch_builder.add_edge("describe_market", "generate_perspectives")
+batch_builder.add_conditional_edges(
+    "generate_perspectives",
+    parallel_prompt_generation,
+    ["generate_prompts_for_perspective", "generate_prompt_chunk", "collect_prompts"]
+)
+batch_builder.add_edge("generate_prompts_for_perspective", "collect_prompts")
+batch_builder.add_edge("generate_prompt_chunk", "collect_prompts")
+batch_builder.add_conditional_edges(
+    "collect_prompts",
+    execute_prompts_in_parallel,
+    {"execute_prompts": "execute_prompts", "execute_prompt_batch": "execute_prompt_batch", "score": "score_brands"}
+)
+batch_builder.add_edge("execute_prompts", "score_brands")
+batch_builder.add_edge("execute_prompt_batch", "score_brands")
+batch_builder.add_edge("score_brands", END)
+
+batch_graph = batch_builder.compile()
+
+def group_brands(brands: Iterable[BrandInfo]) -> Dict[Tuple[str, Optional[str], str], List[BrandInfo]]:
+    """Group brands that can share a prompt set: same domain, region and language.
+
+    A brand without a domain gets a group of its own.
+    """
+    groups: Dict[Tuple[str, Optional[str], str], List[BrandInfo]] = {}
+    for brand in brands:
+        domain = brand.domain.strip().lower() if brand.domain else f"brand:{brand.company_name}"
+        groups.setdefault((domain, brand.region, brand.language), []).append(brand)
+    return groups
+
+def _batch_inputs(brands: Iterable[BrandInfo], inputs: Dict[str, Any]) -> List[dict]:
+    return [{"brand_info": group[0], "brands": group, **inputs} for group in group_brands(brands).values()]
+
+def _batch_results(states: List[dict]) -> Dict[str, BrandResult]:
+    return {name: result for state in states for name, result in state["results"].items()}
+
+def run_brands(brands: Iterable[BrandInfo], config: Optional[dict] = None, **inputs: Any) -> Dict[str, BrandResult]:
+    """Audit many brands, executing each market's prompts once.
+
+    `inputs` are extra BatchState fields (number_of_perspectives, number_of_prompts, number_of_responses, aliases).
+    Results are keyed by company name.
+    """
+    return _batch_results(batch_graph.batch(_batch_inputs(brands, inputs), config))
+
+async def arun_brands(brands: Iterable[BrandInfo], config: Optional[dict] = None, **inputs: Any) -> Dict[str, BrandResult]:
+    """Async variant of run_brands."""
+    return _batch_results(await batch_graph.abatch(_batch_inputs(brands, inputs), config))
+
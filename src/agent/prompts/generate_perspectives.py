@@ -1,5 +1,6 @@
 from langchain_core.messages import SystemMessage
 
+
 def generate_perspectives_system_message(number_of_perspectives: int) -> SystemMessage:
     return SystemMessage(content=f"""You are tasked with generating a diverse and comprehensive set of user perspectives for assessing the AI visibility of a brand. 
     The goal is to understand how well-recognized a brand is by AI search engines, which are non-deterministic and operate as black boxes. 
@@ -17,8 +18,7 @@ def generate_perspectives_system_message(number_of_perspectives: int) -> SystemM
     The perspectives you generate will be used to create prompts that test if the brand is recognized by AI search engines in a natural, unbiased way.""")
 
 def generate_perspectives_system_message(number_of_perspectives: int, region: str, language: str) -> SystemMessage:
-    """
-    Generates a comprehensive, detailed system prompt that provides deep context 
+    """Generates a comprehensive, detailed system prompt that provides deep context
     and leaves no room for uncertainty in the persona generation task.
     """
     return SystemMessage(content=f"""
@@ -1,5 +1,6 @@
 from langchain_core.messages import SystemMessage
 
+
 def generate_prompts_system_message(number_of_prompts: int, region: str, language: str) -> SystemMessage:
     return SystemMessage(content=f"""You are tasked with generating realistic, unbiased prompts that a user with a specific perspective might enter into an AI search engine.
     Your goal is to create prompts that would naturally reveal whether a brand is recognized within its domain, without ever mentioning the brand name.
@@ -7,6 +8,14 @@ def generate_prompts_system_message(number_of_prompts: int, region: str, languag
     Generate EXACTLY {number_of_prompts} prompts that this perspective would realistically use.
     The region and language of the prompts should be the same as the {region} and {language} of the perspective.""")
 
+def generate_prompts_for_perspectives_system_message(number_of_prompts: int, region: str, language: str) -> SystemMessage:
+    """Build the system message for writing prompts for several perspectives in one call."""
+    return SystemMessage(content=f"""You are tasked with generating realistic, unbiased prompts that users with specific perspectives might enter into an AI search engine.
+    Your goal is to create prompts that would naturally reveal whether a brand is recognized within its domain, without ever mentioning the brand name.
+    You will receive several numbered perspectives. Treat each one separately: its prompts should be relevant to that perspective's intent, demographic, region, gender, market role, and specific needs.
+    For EACH perspective, generate EXACTLY {number_of_prompts} prompts that this perspective would realistically use, and label them with the perspective's number.
+    The region and language of the prompts should be the same as the {region} and {language} of the perspective.""")
+
 
 # def generate_prompts_system_message(number_of_prompts: int) -> SystemMessage:
 #     """
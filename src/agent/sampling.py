@@ -0,0 +1,84 @@
+"""Sequential sampling of a prompt with early stopping.
+
+Answer engines are non-deterministic, so a prompt is sampled up to
+``number_of_responses`` times and the brand-mention rate is estimated with a
+Wilson score interval. Sampling a prompt stops as soon as the interval is
+narrow enough, or once at least ``min_samples`` samples all agree and the
+interval no longer reaches 0.5 (the brand is clearly always or never
+mentioned), so calls are only spent on prompts whose outcome is uncertain.
+At 95% confidence unanimous samples stop after four: three agreeing samples
+still leave an interval of [0.44, 1.0].
+"""
+
+from __future__ import annotations
+
+import math
+from statistics import NormalDist
+from typing import Tuple
+
+from agent.schema import PromptSampling
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Return the Wilson score interval for a binomial proportion."""
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+class SequentialSampler:
+    """Track one prompt's samples and decide when to stop."""
+
+    def __init__(self, max_samples: int, min_samples: int = 3, half_width: float = 0.15, confidence: float = 0.95) -> None:
+        """Sample at most ``max_samples`` times, stopping once the interval is tight enough."""
+        self.max_samples = max(1, max_samples)
+        self.min_samples = max(1, min(min_samples, self.max_samples))
+        self.half_width = half_width
+        self.confidence = confidence
+        self.successes = 0
+        self.trials = 0
+
+    def add(self, mentioned: bool) -> None:
+        """Record one sample."""
+        self.trials += 1
+        self.successes += int(mentioned)
+
+    @property
+    def interval(self) -> Tuple[float, float]:
+        """Current confidence interval on the mention rate."""
+        return wilson_interval(self.successes, self.trials, self.confidence)
+
+    @property
+    def done(self) -> bool:
+        """Whether further samples are not worth paying for."""
+        if self.trials >= self.max_samples:
+            return True
+        if self.trials < self.min_samples:
+            return False
+        low, high = self.interval
+        unanimous = self.successes in (0, self.trials)
+        return (unanimous and (low > 0.5 or high < 0.5)) or (high - low) / 2 <= self.half_width
+
+    def next_round_size(self) -> int:
+        """Return the samples to request in the next round: a first burst, then one at a time."""
+        if self.done:
+            return 0
+        return max(1, self.min_samples - self.trials)
+
+    def report(self, prompt_id: int) -> PromptSampling:
+        """Summarize the samples taken for the prompt at ``prompt_id``."""
+        low, high = self.interval
+        return PromptSampling(
+            prompt_id=prompt_id,
+            samples=self.trials,
+            brand_mentions=self.successes,
+            mention_rate=self.successes / self.trials if self.trials else 0.0,
+            ci_low=low,
+            ci_high=high,
+            calls_saved=self.max_samples - self.trials,
+        )
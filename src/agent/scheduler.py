@@ -0,0 +1,263 @@
+"""Bounded-concurrency, rate-limit-aware scheduling for provider calls.
+
+Every LLM and search request made by the nodes goes through a ``Scheduler``.
+It caps the number of in-flight requests, paces them with requests- and
+tokens-per-minute buckets, and retries 429/5xx and connection errors with
+jittered exponential backoff (honoring ``Retry-After`` when the provider
+sends one).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from langchain_core.runnables import RunnableConfig
+
+from agent.configuration import Configuration
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Reservation-style token bucket refilled continuously over one minute.
+
+    ``reserve`` debits the bucket immediately and returns how long the caller
+    has to wait before its reservation is covered, so callers sleep outside
+    the lock and requests are released in arrival order.
+    """
+
+    def __init__(self, per_minute: int) -> None:
+        """Allow ``per_minute`` units per minute, starting with a full bucket."""
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Debit ``amount`` tokens and return the seconds to wait before using them."""
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Charge (positive) or refund (negative) tokens after the fact."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def estimate_tokens(payload: Any) -> int:
+    """Roughly estimate the prompt tokens of a model input (~4 chars per token)."""
+    if payload is None:
+        return 0
+    if isinstance(payload, str):
+        return len(payload) // 4 + 1
+    if isinstance(payload, dict):
+        return sum(estimate_tokens(v) for v in payload.values())
+    if isinstance(payload, (list, tuple)):
+        return sum(estimate_tokens(item) for item in payload)
+    content = getattr(payload, "content", None)
+    if content is not None:
+        return estimate_tokens(content)
+    return estimate_tokens(str(payload))
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for rate-limit, server-side and transport errors."""
+    status = _status_code(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return type(exc).__name__ in {"APIConnectionError", "APITimeoutError", "RateLimitError"}
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _usage_tokens(result: Any) -> Optional[int]:
+    usage = getattr(result, "usage_metadata", None)
+    if usage:
+        return int(usage.get("total_tokens", 0)) or None
+    return None
+
+
+@dataclass
+class CallStats:
+    """Filled in by ``Scheduler.call``/``acall`` when the caller passes one in."""
+
+    wait_seconds: float = 0.0  # rate-limit sleeps, slot waits and backoff
+    retries: int = 0
+
+
+class Scheduler:
+    """Run provider calls under a concurrency cap, rate buckets and retries.
+
+    Sync calls share a thread semaphore; async calls get one semaphore per
+    event loop, so each pool is bounded by ``max_concurrency`` independently.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ) -> None:
+        """Limit concurrency and, optionally, requests and tokens per minute."""
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._threads = threading.BoundedSemaphore(self.max_concurrency)
+        self._loop_semaphores: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = weakref.WeakKeyDictionary()
+        self._loop_lock = threading.Lock()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._loop_lock:
+            semaphore = self._loop_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._loop_semaphores[loop] = semaphore
+            return semaphore
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def _settle(self, reserved: int, result: Any) -> None:
+        actual = _usage_tokens(result)
+        if self.tokens is not None and actual is not None:
+            self.tokens.adjust(actual - reserved)
+
+    def backoff(self, attempt: int, exc: BaseException) -> float:
+        """Return the full-jitter delay before retry number ``attempt + 1``."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2**attempt))
+        delay = random.uniform(0, ceiling)
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def call(self, fn: Callable[..., T], *args: Any, tokens: int = 0, stats: Optional[CallStats] = None, **kwargs: Any) -> T:
+        """Run ``fn`` synchronously, blocking for a slot and rate budget."""
+        attempt = 0
+        queued = time.perf_counter()
+        while True:
+            wait = self._reserve(tokens)
+            if wait:
+                time.sleep(wait)
+            with self._threads:
+                if stats is not None:
+                    stats.wait_seconds += time.perf_counter() - queued
+                    stats.retries = attempt
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as exc:
+                    if attempt >= self.max_retries or not is_retryable(exc):
+                        raise
+                    delay = self.backoff(attempt, exc)
+                else:
+                    self._settle(tokens, result)
+                    return result
+            attempt += 1
+            queued = time.perf_counter()
+            time.sleep(delay)
+
+    async def acall(
+        self, fn: Callable[..., Awaitable[T]], *args: Any, tokens: int = 0, stats: Optional[CallStats] = None, **kwargs: Any
+    ) -> T:
+        """Await ``fn`` without blocking the event loop while queued."""
+        semaphore = self._semaphore()
+        attempt = 0
+        queued = time.perf_counter()
+        while True:
+            wait = self._reserve(tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            async with semaphore:
+                if stats is not None:
+                    stats.wait_seconds += time.perf_counter() - queued
+                    stats.retries = attempt
+                try:
+                    result = await fn(*args, **kwargs)
+                except Exception as exc:
+                    if attempt >= self.max_retries or not is_retryable(exc):
+                        raise
+                    delay = self.backoff(attempt, exc)
+                else:
+                    self._settle(tokens, result)
+                    return result
+            attempt += 1
+            queued = time.perf_counter()
+            await asyncio.sleep(delay)
+
+
+# --- Process-wide registry ---
+# Provider limits apply per API key, not per run, so every run (and every
+# Send() task inside a run) with the same settings shares one scheduler.
+_schedulers: Dict[Tuple[Any, ...], Scheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(config: Optional[RunnableConfig] = None, provider: str = "llm") -> Scheduler:
+    """Return the shared scheduler for ``provider`` ("llm" or "search")."""
+    configuration = Configuration.from_runnable_config(config)
+    if provider == "search":
+        settings: Tuple[Any, ...] = (
+            provider,
+            configuration.search_max_concurrency,
+            configuration.search_requests_per_minute,
+            None,
+        )
+    else:
+        settings = (
+            provider,
+            configuration.max_concurrency,
+            configuration.requests_per_minute,
+            configuration.tokens_per_minute,
+        )
+    settings += (configuration.max_retries, configuration.backoff_base, configuration.backoff_max)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(settings)
+        if scheduler is None:
+            scheduler = Scheduler(*settings[1:])
+            _schedulers[settings] = scheduler
+        return scheduler
@@ -1,22 +1,25 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Annotated, Any
-from langchain_core.messages import BaseMessage
 import operator
+from typing import Annotated, Any, Dict, List, Optional
+
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
+
 
 class BrandInfo(BaseModel):
     company_name: str
     website: str
     region: Optional[str] = Field(None, description="The region of the brand's headquarters. Examples: 'United States', 'Canada', 'United Kingdom', 'Australia', 'New Zealand', 'Europe', 'Asia', 'Africa', 'South America', 'North America', 'Oceania' etc.")
     language: str = Field("English", description="The primary language the user is thinking and searching in. E.g., 'English', 'Turkish', 'Spanish', 'Mandarin Chinese'.")
+    domain: Optional[str] = Field(None, description="The market or vertical the brand competes in. E.g., 'running shoes', 'CRM software'. Brands with the same domain, region and language share one prompt set in batch runs.")
 
 class Perspective(BaseModel):
-    """
-    A detailed persona representing a user approaching an AI search engine. 
+    """A detailed persona representing a user approaching an AI search engine.
     This is used to generate a diverse and strategic set of prompts.
     """
     intent: str = Field(..., description="The user's high-level goal. What do they want to achieve? E.g., 'Make a purchase decision', 'Solve a technical problem', 'Conduct competitive research', 'Explore a new hobby'.")
 
-    demographic: str = Field(None, description="The user's demographic profile. E.g., 'University Student', 'Young Professional', 'Retiree', 'Small Business Owner', 'Suburban Parent'.")
+    demographic: Optional[str] = Field(None, description="The user's demographic profile. E.g., 'University Student', 'Young Professional', 'Retiree', 'Small Business Owner', 'Suburban Parent'.")
 
     region: Optional[str] = Field(None, description="The user's geographic location, which influences local context and availability. E.g., 'Atlanta, GA, USA', 'Istanbul, Turkey', 'Rural France', 'Southeast Asia'.")
 
@@ -35,12 +38,132 @@ class Perspective(BaseModel):
     query_type: Optional[str] = Field(None, description="The specific type of information the user is looking for in their query. E.g., 'Navigational' (to find a specific website), 'Informational' (to learn something), 'Transactional' (to complete a purchase), 'Commercial Investigation' (to compare options before buying).")
 
 class Prompt(BaseModel):
-    perspective: Perspective
     text: str = Field(description="The actual prompt text that would be used to query an AI search engine")
+    # Filled in by the graph, not the LLM, so it is kept out of the structured-output schema.
+    perspective_id: SkipJsonSchema[int] = Field(-1, description="Index of the prompt's perspective in State.perspectives")
 
 class Response(BaseModel):
-    prompt: Prompt
+    prompt_id: int = Field(description="Index of the prompt in State.prompts")
     response: str
+    sample_index: int = 0
+    truncated: bool = False # Streamed and stopped early; response holds the partial text
+    stop_reason: Optional[str] = None # "token_budget" or the stopping rule that ended the stream
+    output_tokens: Optional[int] = None # Tokens received when streamed: the truncation point if truncated
+
+class PromptView(BaseModel):
+    """A prompt with its perspective resolved, as returned by State.prompt_view."""
+    perspective: Optional[Perspective] = None
+    text: str
+
+class ResponseView(BaseModel):
+    """A response with its prompt and perspective resolved, as returned by State.response_views."""
+    prompt: PromptView
+    response: str
+    sample_index: int = 0
+    truncated: bool = False
+
+class PromptSampling(BaseModel):
+    """How many times a prompt was sampled and what that says about its brand-mention rate."""
+    prompt_id: int
+    samples: int
+    brand_mentions: int
+    mention_rate: float
+    ci_low: float
+    ci_high: float
+    calls_saved: int = Field(0, description="Samples skipped thanks to early stopping, out of number_of_responses")
+
+class Mention(BaseModel):
+    """One occurrence of an entity in a response, as character offsets."""
+    entity: str
+    start: int
+    end: int
+
+class ResponseMentions(BaseModel):
+    """Mentions found in a single response, in order of appearance."""
+    hits: List[Mention] = []
+    counts: Dict[str, int] = {}
+    first_mention_rank: Dict[str, int] = Field(default_factory=dict, description="1-based order in which each entity is first mentioned")
+
+class VisibilityTally(BaseModel):
+    """Running counts of responses that mention each entity, overall and per perspective."""
+    responses: int = 0
+    mentions: Dict[str, int] = {}
+    perspective_responses: Dict[str, int] = {}
+    perspective_mentions: Dict[str, Dict[str, int]] = {}
+
+    def add(self, perspective, entities) -> None:
+        """Count one response that mentions ``entities``.
+
+        ``perspective`` is one key or several, for a response shared by perspectives that produced the same prompt; it counts once overall.
+        """
+        entities = set(entities)
+        self.responses += 1
+        for entity in entities:
+            self.mentions[entity] = self.mentions.get(entity, 0) + 1
+        for key in [perspective] if isinstance(perspective, str) else perspective:
+            self.perspective_responses[key] = self.perspective_responses.get(key, 0) + 1
+            breakdown = self.perspective_mentions.setdefault(key, {})
+            for entity in entities:
+                breakdown[entity] = breakdown.get(entity, 0) + 1
+
+    def visibility(self, entity: str, perspective: Optional[str] = None) -> float:
+        """Share of responses (optionally within one perspective) that mention ``entity``."""
+        if perspective is None:
+            return self.mentions.get(entity, 0) / self.responses if self.responses else 0.0
+        total = self.perspective_responses.get(perspective, 0)
+        return self.perspective_mentions.get(perspective, {}).get(entity, 0) / total if total else 0.0
+
+def merge_tallies(left: VisibilityTally, right: VisibilityTally) -> VisibilityTally:
+    """Reducer that sums two tallies, so Send() workers can report partial counts."""
+    merged = left.model_copy(deep=True)
+    merged.responses += right.responses
+    for entity, count in right.mentions.items():
+        merged.mentions[entity] = merged.mentions.get(entity, 0) + count
+    for perspective, count in right.perspective_responses.items():
+        merged.perspective_responses[perspective] = merged.perspective_responses.get(perspective, 0) + count
+    for perspective, counts in right.perspective_mentions.items():
+        breakdown = merged.perspective_mentions.setdefault(perspective, {})
+        for entity, count in counts.items():
+            breakdown[entity] = breakdown.get(entity, 0) + count
+    return merged
+
+class NodeMetrics(BaseModel):
+    """Cost and latency counters for one node (or one perspective) within a run."""
+    tasks: int = 0  # node executions; Send() fans out one task per payload
+    calls: int = 0  # provider calls, cache hits excluded
+    cache_hits: int = 0
+    retries: int = 0
+    wall_seconds: float = 0.0
+    wait_seconds: float = 0.0  # time queued for a concurrency slot, rate budget or backoff
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def add(self, other: "NodeMetrics") -> None:
+        """Add ``other``'s counters to this one."""
+        for name in type(self).model_fields:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+class RunMetrics(BaseModel):
+    """Per-node and per-perspective instrumentation for a run."""
+    nodes: Dict[str, NodeMetrics] = {}
+    perspectives: Dict[str, NodeMetrics] = {}
+
+    @property
+    def total(self) -> NodeMetrics:
+        """Counters summed over every node."""
+        total = NodeMetrics()
+        for metrics in self.nodes.values():
+            total.add(metrics)
+        return total
+
+def merge_metrics(left: RunMetrics, right: RunMetrics) -> RunMetrics:
+    """Reducer that sums two metric sets, so every node task can report its own."""
+    merged = left.model_copy(deep=True)
+    for target, source in ((merged.nodes, right.nodes), (merged.perspectives, right.perspectives)):
+        for key, metrics in source.items():
+            target.setdefault(key, NodeMetrics()).add(metrics)
+    return merged
 
 class Perspectives(BaseModel):
     perspectives: List[Perspective] = Field(
@@ -52,6 +175,19 @@ class Prompts(BaseModel):
         description="List of prompts generated for a given perspective"
     )
 
+class PerspectivePrompts(BaseModel):
+    """Prompts written for one numbered perspective."""
+    perspective_id: int = Field(description="The number of the perspective these prompts were written for, exactly as given in the request")
+    prompts: List[Prompt] = Field(
+        description="List of prompts generated for this perspective"
+    )
+
+class PromptsByPerspective(BaseModel):
+    """Prompts for each perspective of a chunked request."""
+    perspectives: List[PerspectivePrompts] = Field(
+        description="One entry per requested perspective"
+    )
+
 class Competitor(BaseModel):
     name: str
     description: str
@@ -73,10 +209,70 @@ class State(BaseModel):
     current_perspective: Optional[Perspective] = None
     prompts: Annotated[List[Prompt], operator.add] = []  # For Send() API
     responses: Annotated[List[Response], operator.add] = [] # For Send() API
-    messages: List[BaseMessage] = []
+    messages: Annotated[List[BaseMessage], operator.add] = [] # Log; nodes that run in the same step both append
     human_feedback: Optional[Any] = None
     number_of_perspectives: int = 5
     number_of_prompts: int = 5
     number_of_responses: int = 1
     brand_mentions: int = 0
-    competitors: List[Competitor] = []
\ No newline at end of file
+    competitors: List[Competitor] = []
+    aliases: Dict[str, List[str]] = Field(default_factory=dict, description="Extra names to match, keyed by brand or competitor name")
+    response_mentions: List[ResponseMentions] = [] # Aligned with responses
+    sampling: Annotated[List[PromptSampling], operator.add] = [] # For Send() API
+    calls_saved: int = 0
+    prompt_duplicates: Dict[int, int] = {} # Near-duplicate prompt id -> id of the prompt executed in its place
+    dedup_calls_saved: int = 0
+    prompt_set_id: Optional[str] = None # Set once the prompt set is in the results store
+    tally: Annotated[VisibilityTally, merge_tallies] = VisibilityTally() # Updated as each response is scored
+    metrics: Annotated[RunMetrics, merge_metrics] = RunMetrics() # Filled in when instrumentation is enabled
+
+    # --- Views ---
+    # Prompts and responses reference perspectives and prompts by index so each
+    # perspective is stored (and checkpointed) once; these rebuild the nested objects.
+    def perspective_of(self, prompt: Prompt) -> Optional[Perspective]:
+        """Return the perspective ``prompt`` was written for, or None."""
+        if 0 <= prompt.perspective_id < len(self.perspectives):
+            return self.perspectives[prompt.perspective_id]
+        return None
+
+    def prompt_perspective_ids(self, prompt_id: int) -> List[int]:
+        """Perspectives a prompt's responses count for: its own and those of its collapsed duplicates."""
+        ids = [self.prompts[prompt_id].perspective_id]
+        for duplicate, kept in self.prompt_duplicates.items():
+            if kept == prompt_id and self.prompts[duplicate].perspective_id not in ids:
+                ids.append(self.prompts[duplicate].perspective_id)
+        return ids
+
+    def prompt_view(self, prompt_id: int) -> PromptView:
+        """Return the prompt with its perspective nested in it."""
+        prompt = self.prompts[prompt_id]
+        return PromptView(perspective=self.perspective_of(prompt), text=prompt.text)
+
+    def response_views(self) -> List[ResponseView]:
+        """Return every response with its prompt and perspective nested in it."""
+        return [
+            ResponseView(prompt=self.prompt_view(r.prompt_id), response=r.response, sample_index=r.sample_index, truncated=r.truncated)
+            for r in self.responses
+        ]
+class BrandProfile(BaseModel):
+    """What a batch run learns about one brand before the shared prompt set is built."""
+    brand_info: BrandInfo
+    brand_description: Optional[str] = None
+    competitors: List[Competitor] = []
+
+class BrandResult(BaseModel):
+    """One brand's visibility, scored against the responses shared by its batch."""
+    brand_info: BrandInfo
+    brand_description: Optional[str] = None
+    competitors: List[Competitor] = []
+    brand_mentions: int = 0
+    visibility: float = 0.0
+
+class BatchState(State):
+    """State of a multi-brand run.
+
+    brand_info holds the first brand (it sets region and language), brand_description the market description the shared perspectives and prompts are built from.
+    """
+    brands: List[BrandInfo] = []
+    profiles: Annotated[List[BrandProfile], operator.add] = [] # For Send() API
+    results: Dict[str, BrandResult] = {} # Keyed by company name
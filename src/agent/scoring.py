@@ -0,0 +1,108 @@
+"""Incremental visibility scoring.
+
+Prompt-execution workers score every response as soon as it arrives and
+publish the delta twice: as a ``visibility`` custom stream event (picked up
+by ``graph.astream(..., stream_mode="custom")``) and as a ``tally`` state
+update merged by the ``merge_tallies`` reducer. ``astream_visibility`` folds
+the events into running totals, so callers can watch partial scores and stop
+at a deadline with a valid partial result.
+
+Events carry the id of the response they score. A node that is retried
+scores its responses again and writes their events a second time, so the
+stream counts each response id once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Set, Union
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
+
+from agent.schema import ResponseMentions, VisibilityTally, merge_tallies
+
+VISIBILITY_EVENT = "visibility"
+
+
+def perspective_key(perspective_id: int) -> str:
+    """Key per-perspective breakdowns by the perspective's index in State.perspectives."""
+    return str(perspective_id)
+
+
+def response_key(prompt_id: int, sample_index: int) -> str:
+    """Identify one response of a run: the n-th sample of a prompt."""
+    return f"{prompt_id}:{sample_index}"
+
+
+def score_response(
+    perspective_id: Union[int, Sequence[int]],
+    mentions: ResponseMentions,
+    response_id: Optional[str] = None,
+) -> VisibilityTally:
+    """Turn one scanned response into a tally delta and publish it to the stream.
+
+    A response to a prompt shared by several perspectives (see ``agent.dedup``)
+    is passed all of their ids and counts for each of them. ``response_id``
+    (see ``response_key``) lets stream consumers drop repeats of the event.
+    """
+    ids = [perspective_id] if isinstance(perspective_id, int) else perspective_id
+    delta = VisibilityTally()
+    delta.add([perspective_key(i) for i in ids], mentions.counts)
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:  # called outside of a graph run
+        return delta
+    writer({"event": VISIBILITY_EVENT, "response_id": response_id, "delta": delta.model_dump()})
+    return delta
+
+
+def visibility_report(tally: VisibilityTally) -> Dict[str, Any]:
+    """Summarize a tally as visibility shares, overall and per perspective."""
+    return {
+        "responses": tally.responses,
+        "visibility": {entity: tally.visibility(entity) for entity in tally.mentions},
+        "perspectives": {
+            perspective: {entity: tally.visibility(entity, perspective) for entity in counts}
+            for perspective, counts in tally.perspective_mentions.items()
+        },
+    }
+
+
+async def astream_visibility(
+    graph: Any,
+    inputs: Any,
+    config: Optional[RunnableConfig] = None,
+    deadline: Optional[float] = None,
+) -> AsyncIterator[VisibilityTally]:
+    """Run ``graph`` and yield the running tally after every scored response.
+
+    ``deadline`` is a number of seconds from the start of the run. When it
+    passes, the run is cancelled and iteration ends after the last partial
+    tally, which only ever contains fully scored responses. Each response id
+    is counted once, even if a retried node scores it again.
+    """
+    started = time.monotonic()
+    tally = VisibilityTally()
+    seen: Set[str] = set()
+    stream = graph.astream(inputs, config, stream_mode="custom")
+    try:
+        while True:
+            remaining = None if deadline is None else deadline - (time.monotonic() - started)
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+            except (StopAsyncIteration, asyncio.TimeoutError):
+                break
+            if isinstance(chunk, dict) and chunk.get("event") == VISIBILITY_EVENT:
+                response_id = chunk.get("response_id")
+                if response_id is not None:
+                    if response_id in seen:
+                        continue
+                    seen.add(response_id)
+                tally = merge_tallies(tally, VisibilityTally.model_validate(chunk["delta"]))
+                yield tally
+    finally:
+        await stream.aclose()
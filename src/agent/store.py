@@ -0,0 +1,392 @@
+"""Persistent results store for tracking brand visibility over time.
+
+Every run with ``results_store_path`` set appends its responses to a SQLite
+file, one row per response with flat columns (brand, perspective, prompt,
+model, timestamp) and one row per entity a response mentions. Nothing is
+stored as a serialized run, so trends are computed by SQL aggregation and
+never require loading runs into memory.
+
+A full run also saves its prompt set: the perspectives, prompts, competitors
+and brand description it generated, keyed by the brand and the settings it
+was generated for (region, language, number of perspectives and prompts; see
+``prompt_set_key``). With ``freshness_seconds`` set, the next run of the same
+brand with the same settings reuses the latest prompt set instead of
+regenerating it and re-executes only the prompts whose latest response from
+the configured model is older than the freshness window; the other prompts
+are scored from their stored answers (``stored_tally``).
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+from agent import scoring
+from agent.cache import cache_key
+from agent.configuration import Configuration
+from agent.schema import (
+    Competitor,
+    Perspective,
+    Prompt,
+    Response,
+    ResponseMentions,
+    VisibilityTally,
+)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS prompt_sets ("
+    " set_id TEXT PRIMARY KEY,"
+    " brand TEXT NOT NULL,"
+    " settings_key TEXT NOT NULL DEFAULT '',"
+    " created_at REAL NOT NULL,"
+    " brand_description TEXT,"
+    " competitors TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS prompt_sets_brand ON prompt_sets (brand, created_at)",
+    "CREATE TABLE IF NOT EXISTS prompts ("
+    " set_id TEXT NOT NULL,"
+    " position INTEGER NOT NULL,"
+    " prompt_key TEXT NOT NULL,"
+    " perspective_key TEXT NOT NULL,"
+    " perspective TEXT,"
+    " text TEXT NOT NULL,"
+    " PRIMARY KEY (set_id, position))",
+    "CREATE TABLE IF NOT EXISTS responses ("
+    " id INTEGER PRIMARY KEY,"
+    " run_id TEXT NOT NULL,"
+    " brand TEXT NOT NULL,"
+    " perspective_key TEXT NOT NULL,"
+    " prompt_key TEXT NOT NULL,"
+    " model TEXT NOT NULL,"
+    " created_at REAL NOT NULL,"
+    " sample_index INTEGER NOT NULL,"
+    " response TEXT NOT NULL,"
+    " truncated INTEGER NOT NULL DEFAULT 0,"
+    " stop_reason TEXT,"
+    " output_tokens INTEGER)",
+    "CREATE INDEX IF NOT EXISTS responses_brand ON responses (brand, created_at)",
+    "CREATE INDEX IF NOT EXISTS responses_prompt ON responses (brand, prompt_key, model, created_at)",
+    "CREATE TABLE IF NOT EXISTS mentions ("
+    " response_id INTEGER NOT NULL,"
+    " entity TEXT NOT NULL,"
+    " count INTEGER NOT NULL,"
+    " first_rank INTEGER)",
+    "CREATE INDEX IF NOT EXISTS mentions_entity ON mentions (entity, response_id)",
+    # Collapsed near-duplicate prompts are answered by the prompt kept in their
+    # place; this records when each prompt was last answered, by either route.
+    "CREATE TABLE IF NOT EXISTS answered ("
+    " brand TEXT NOT NULL,"
+    " prompt_key TEXT NOT NULL,"
+    " model TEXT NOT NULL,"
+    " answered_at REAL NOT NULL,"
+    " PRIMARY KEY (brand, prompt_key, model))",
+)
+# Columns added after a table was first released, for stores created before them.
+_ADDED_COLUMNS = {
+    # Prompt sets saved before it have the empty key and are never reused.
+    "prompt_sets": (("settings_key", "TEXT NOT NULL DEFAULT ''"),),
+    "responses": (
+        ("truncated", "INTEGER NOT NULL DEFAULT 0"),
+        ("stop_reason", "TEXT"),
+        ("output_tokens", "INTEGER"),
+    ),
+}
+
+
+def perspective_key(perspective: Optional[Perspective]) -> str:
+    """Stable key of a perspective; prompts without one share the empty key."""
+    return cache_key("perspective", perspective)[:16] if perspective is not None else ""
+
+
+def prompt_key(perspective: Optional[Perspective], text: str) -> str:
+    """Stable key of a prompt: the same text asked from another perspective is another prompt."""
+    return cache_key("prompt", {"perspective": perspective, "text": text})[:16]
+
+
+def prompt_set_key(region: Optional[str], language: str, number_of_perspectives: int, number_of_prompts: int) -> str:
+    """Key of the settings a prompt set was generated for; only a run with the same settings reuses it."""
+    return cache_key(
+        "prompt_set",
+        {"region": region, "language": language, "perspectives": number_of_perspectives, "prompts": number_of_prompts},
+    )[:16]
+
+
+def _perspective(perspectives: Sequence[Perspective], prompt: Prompt) -> Optional[Perspective]:
+    return perspectives[prompt.perspective_id] if 0 <= prompt.perspective_id < len(perspectives) else None
+
+
+@dataclass
+class PromptSet:
+    """A brand's stored perspectives, prompts and competitors."""
+
+    set_id: str
+    brand_description: Optional[str]
+    competitors: List[Competitor]
+    perspectives: List[Perspective]
+    prompts: List[Prompt]
+
+
+@dataclass
+class TrendPoint:
+    """Visibility of one entity over the responses of one time bucket."""
+
+    bucket_start: float
+    responses: int
+    mentioned: int
+
+    @property
+    def visibility(self) -> float:
+        """Return the share of responses that mention the entity."""
+        return self.mentioned / self.responses if self.responses else 0.0
+
+
+class ResultsStore:
+    """SQLite store of prompt sets, responses and their mentions."""
+
+    def __init__(self, path: str) -> None:
+        """Open (or create) the store at ``path``."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        for table, columns in _ADDED_COLUMNS.items():
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for name, definition in columns:
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    # --- Writing ---
+    def save_prompt_set(
+        self,
+        brand: str,
+        perspectives: Sequence[Perspective],
+        prompts: Sequence[Prompt],
+        competitors: Sequence[Competitor],
+        brand_description: Optional[str] = None,
+        settings_key: str = "",
+    ) -> str:
+        """Store a generated prompt set as the brand's latest for ``settings_key`` and return its id."""
+        set_id = uuid.uuid4().hex
+        rows = []
+        for position, prompt in enumerate(prompts):
+            perspective = _perspective(perspectives, prompt)
+            rows.append((
+                set_id, position, prompt_key(perspective, prompt.text), perspective_key(perspective),
+                perspective.model_dump_json(exclude_none=True) if perspective is not None else None, prompt.text,
+            ))
+        encoded_competitors = json.dumps([c.model_dump(mode="json", exclude={"mentions"}) for c in competitors])
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT INTO prompt_sets (set_id, brand, settings_key, created_at, brand_description, competitors) VALUES (?, ?, ?, ?, ?, ?)",
+                (set_id, brand, settings_key, time.time(), brand_description, encoded_competitors),
+            )
+            self._conn.executemany(
+                "INSERT INTO prompts (set_id, position, prompt_key, perspective_key, perspective, text) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return set_id
+
+    def add_responses(
+        self,
+        run_id: str,
+        brand: str,
+        model: str,
+        perspectives: Sequence[Perspective],
+        prompts: Sequence[Prompt],
+        responses: Sequence[Response],
+        response_mentions: Sequence[ResponseMentions],
+        duplicates: Optional[Dict[int, int]] = None,
+        created_at: Optional[float] = None,
+    ) -> int:
+        """Append a run's responses and their mentions; return the number of responses stored.
+
+        ``duplicates`` maps collapsed prompt ids to the prompt answered in their
+        place, so those prompts count as answered too.
+        """
+        created_at = time.time() if created_at is None else created_at
+
+        def keys(prompt_id: int) -> Tuple[str, str]:
+            perspective = _perspective(perspectives, prompts[prompt_id])
+            return perspective_key(perspective), prompt_key(perspective, prompts[prompt_id].text)
+
+        answered = {response.prompt_id for response in responses}
+        answered |= {duplicate for duplicate, kept in (duplicates or {}).items() if kept in answered}
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            for response, mentions in zip(responses, response_mentions):
+                perspective, prompt = keys(response.prompt_id)
+                cursor = self._conn.execute(
+                    "INSERT INTO responses (run_id, brand, perspective_key, prompt_key, model, created_at, sample_index, response,"
+                    " truncated, stop_reason, output_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (run_id, brand, perspective, prompt, model, created_at, response.sample_index, response.response,
+                     int(response.truncated), response.stop_reason, response.output_tokens),
+                )
+                self._conn.executemany(
+                    "INSERT INTO mentions (response_id, entity, count, first_rank) VALUES (?, ?, ?, ?)",
+                    [(cursor.lastrowid, entity, count, mentions.first_mention_rank.get(entity)) for entity, count in mentions.counts.items()],
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO answered (brand, prompt_key, model, answered_at) VALUES (?, ?, ?, ?)",
+                [(brand, keys(prompt_id)[1], model, created_at) for prompt_id in sorted(answered)],
+            )
+        return len(responses)
+
+    # --- Incremental runs ---
+    def has_prompt_set(self, brand: str, settings_key: str = "") -> bool:
+        """Whether a prompt set has been stored for ``brand`` and ``settings_key``."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM prompt_sets WHERE brand = ? AND settings_key = ? LIMIT 1", (brand, settings_key)
+            ).fetchone() is not None
+
+    def latest_prompt_set(self, brand: str, settings_key: str = "") -> Optional[PromptSet]:
+        """Return the brand's most recently stored prompt set for ``settings_key``, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT set_id, brand_description, competitors FROM prompt_sets WHERE brand = ? AND settings_key = ?"
+                " ORDER BY created_at DESC LIMIT 1",
+                (brand, settings_key),
+            ).fetchone()
+            if row is None:
+                return None
+            prompt_rows = self._conn.execute(
+                "SELECT perspective_key, perspective, text FROM prompts WHERE set_id = ? ORDER BY position", (row[0],)
+            ).fetchall()
+        perspectives: List[Perspective] = []
+        index: Dict[str, int] = {}
+        prompts = []
+        for key, perspective, text in prompt_rows:
+            if perspective is not None and key not in index:
+                index[key] = len(perspectives)
+                perspectives.append(Perspective.model_validate_json(perspective))
+            prompts.append(Prompt(text=text, perspective_id=index.get(key, -1)))
+        competitors = [Competitor.model_validate(c) for c in json.loads(row[2])]
+        return PromptSet(set_id=row[0], brand_description=row[1], competitors=competitors, perspectives=perspectives, prompts=prompts)
+
+    def stale_prompts(self, brand: str, model: str, prompt_set: PromptSet, max_age_seconds: float, now: Optional[float] = None) -> List[int]:
+        """Return the indices of the prompts in ``prompt_set`` with no answer from ``model`` newer than ``max_age_seconds``."""
+        cutoff = (time.time() if now is None else now) - max_age_seconds
+        with self._lock:
+            fresh = {
+                key for (key,) in self._conn.execute(
+                    "SELECT prompt_key FROM answered WHERE brand = ? AND model = ? AND answered_at >= ?", (brand, model, cutoff)
+                )
+            }
+        return [
+            i for i, prompt in enumerate(prompt_set.prompts)
+            if prompt_key(_perspective(prompt_set.perspectives, prompt), prompt.text) not in fresh
+        ]
+
+    def stored_tally(self, brand: str, model: str, prompt_set: PromptSet, prompt_ids: Sequence[int]) -> VisibilityTally:
+        """Tally the latest stored answers from ``model`` to the given prompts of ``prompt_set``.
+
+        Perspectives are keyed by their index in ``prompt_set``, as in a run's
+        own tally. A prompt answered only through a collapsed duplicate has no
+        responses of its own and is left out.
+        """
+        perspective_ids: Dict[str, int] = {}
+        for i in prompt_ids:
+            prompt = prompt_set.prompts[i]
+            perspective_ids[prompt_key(_perspective(prompt_set.perspectives, prompt), prompt.text)] = prompt.perspective_id
+        tally = VisibilityTally()
+        if not perspective_ids:
+            return tally
+        query = (
+            "SELECT r.id, r.prompt_key, m.entity FROM responses r LEFT JOIN mentions m ON m.response_id = r.id"
+            f" WHERE r.brand = ? AND r.model = ? AND r.prompt_key IN ({', '.join('?' * len(perspective_ids))})"
+            " AND r.created_at = (SELECT MAX(created_at) FROM responses"
+            " WHERE brand = r.brand AND prompt_key = r.prompt_key AND model = r.model)"
+            " ORDER BY r.id"
+        )
+        responses: Dict[int, Tuple[str, List[str]]] = {}
+        for response_id, key, entity in self._read(query, [brand, model, *perspective_ids]):
+            _, entities = responses.setdefault(response_id, (key, []))
+            if entity is not None:
+                entities.append(entity)
+        for key, entities in responses.values():
+            tally.add(scoring.perspective_key(perspective_ids[key]), entities)
+        return tally
+
+    # --- Queries ---
+    def perspectives(self, brand: str) -> Dict[str, Perspective]:
+        """Every perspective ever used for ``brand``, by perspective key."""
+        rows = self._read(
+            "SELECT DISTINCT p.perspective_key, p.perspective FROM prompts p JOIN prompt_sets s ON s.set_id = p.set_id"
+            " WHERE s.brand = ? AND p.perspective IS NOT NULL",
+            [brand],
+        )
+        return {key: Perspective.model_validate_json(perspective) for key, perspective in rows}
+
+    def visibility_trend(
+        self,
+        brand: str,
+        entity: Optional[str] = None,
+        perspective: Optional[str] = None,
+        model: Optional[str] = None,
+        bucket_seconds: float = 86400.0,
+        since: Optional[float] = None,
+        truncated: Optional[bool] = None,
+    ) -> Iterator[TrendPoint]:
+        """Yield, per time bucket, how many of ``brand``'s responses mention ``entity``.
+
+        ``entity`` defaults to the brand itself and may be any competitor;
+        ``perspective`` is a perspective key (see ``perspectives``).
+        ``truncated`` keeps only streamed-and-stopped (True) or complete
+        (False) responses; a stopped response may miss later mentions. Rows are
+        aggregated in SQLite and streamed one bucket at a time.
+        """
+        filters = ["r.brand = ?"]
+        params: list = [bucket_seconds, entity or brand, brand]
+        for column, value in (("r.perspective_key", perspective), ("r.model", model)):
+            if value is not None:
+                filters.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            filters.append("r.created_at >= ?")
+            params.append(since)
+        if truncated is not None:
+            filters.append("r.truncated = ?")
+            params.append(int(truncated))
+        query = (
+            "SELECT CAST(r.created_at / ? AS INTEGER) AS bucket, COUNT(*),"
+            " SUM(EXISTS (SELECT 1 FROM mentions m WHERE m.response_id = r.id AND m.entity = ?))"
+            f" FROM responses r WHERE {' AND '.join(filters)} GROUP BY bucket ORDER BY bucket"
+        )
+        for bucket, responses, mentioned in self._read(query, params):
+            yield TrendPoint(bucket_start=bucket * bucket_seconds, responses=responses, mentioned=mentioned)
+
+    def _read(self, query: str, params: list) -> Iterator[tuple]:
+        # Reads use their own connection so a long trend query neither holds
+        # the writer's lock nor sees half-written runs (WAL snapshot).
+        conn = sqlite3.connect(self.path)
+        try:
+            yield from conn.execute(query, params)
+        finally:
+            conn.close()
+
+
+# --- Process-wide registry, one store per database file ---
+_stores: Dict[str, ResultsStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(config: Optional[RunnableConfig] = None) -> Optional[ResultsStore]:
+    """Return the results store for this run, or None if results are not stored."""
+    path = Configuration.from_runnable_config(config).results_store_path
+    if not path:
+        return None
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = ResultsStore(path)
+            _stores[path] = store
+        return store
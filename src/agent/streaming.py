@@ -0,0 +1,150 @@
+"""Streamed prompt execution with early termination.
+
+Only the entities an answer mentions, and in what order, matter for scoring,
+so the rest of a long answer-engine response is wasted latency and output
+tokens. In streaming mode each execution call streams its answer, scans the
+chunks for the brand and competitor names as they arrive
+(``agent.matching.StreamingScan``) and closes the stream as soon as
+``response_token_budget`` output tokens have arrived or the configured
+stopping rule fires. Closing the stream ends the request, so generation
+stops there instead of at the model's own end of answer.
+
+The returned message carries the partial text, and its ``response_metadata``
+records why the stream stopped and after how many tokens. These end up on
+``Response.truncated``, ``stop_reason`` and ``output_tokens``, so truncated
+and full samples can be told apart in the analysis.
+"""
+
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from agent.matching import StreamingScan
+from agent.schema import ResponseMentions
+
+TOKEN_BUDGET = "token_budget"
+
+# A stopping rule gets the mentions found so far, the audited brand and every
+# tracked entity, and returns True once the rest of the answer is not needed.
+StoppingRule = Callable[[ResponseMentions, str, Sequence[str]], bool]
+
+STOPPING_RULES: Dict[str, StoppingRule] = {
+    # Whether the brand is mentioned is settled; competitor counts stay partial.
+    "brand_mentioned": lambda mentions, brand, entities: brand in mentions.counts,
+    # The first-mentioned entity (the answer's top pick) is known.
+    "first_mention": lambda mentions, brand, entities: bool(mentions.counts),
+    "all_mentioned": lambda mentions, brand, entities: all(entity in mentions.counts for entity in entities),
+}
+
+
+def register_stopping_rule(name: str, rule: StoppingRule) -> None:
+    """Make ``response_stop_rule=name`` stop streamed responses once ``rule`` returns True."""
+    STOPPING_RULES[name] = rule
+
+
+def get_stopping_rule(name: Optional[str]) -> Optional[StoppingRule]:
+    """Look up a stopping rule by name; None disables it."""
+    if name is None:
+        return None
+    if name not in STOPPING_RULES:
+        raise ValueError(f"Unknown stopping rule '{name}'. Available: {sorted(STOPPING_RULES)}")
+    return STOPPING_RULES[name]
+
+
+class StreamState:
+    """Accumulates one streamed answer and decides when to stop it."""
+
+    def __init__(
+        self,
+        scan: StreamingScan,
+        brand: str,
+        budget: Optional[int],
+        rule_name: Optional[str],
+        count_tokens: Callable[[str], int],
+    ) -> None:
+        """Scan the stream with ``scan`` and stop it at ``budget`` tokens or when ``rule_name`` fires."""
+        self.scan = scan
+        self.brand = brand
+        self.budget = budget
+        self.rule_name = rule_name
+        self.rule = get_stopping_rule(rule_name)
+        self.count_tokens = count_tokens
+        self.usage: Optional[Dict[str, Any]] = None
+        self.response_metadata: Dict[str, Any] = {}
+        self.tokens = 0
+        self.stop_reason: Optional[str] = None
+
+    def add(self, chunk: AIMessageChunk) -> bool:
+        """Take one chunk; return True once the stream should be closed."""
+        # Chunks are not merged into one message (quadratic in the answer
+        # length); the text lives in the scan and only metadata is kept.
+        if chunk.usage_metadata:
+            self.usage = chunk.usage_metadata
+        self.response_metadata.update(chunk.response_metadata)
+        text = chunk.content if isinstance(chunk.content, str) else "".join(str(part) for part in chunk.content)
+        if not text:
+            return False
+        # Streamed chunks are about a token each; count at least one per chunk.
+        self.tokens += max(1, self.count_tokens(text))
+        mentions = self.scan.feed(text)
+        if self.rule is not None and self.rule(mentions, self.brand, self.scan.matcher.entities):
+            self.stop_reason = self.rule_name
+        elif self.budget is not None and self.tokens >= self.budget:
+            self.stop_reason = TOKEN_BUDGET
+        return self.stop_reason is not None
+
+    def result(self, input_tokens: int) -> AIMessage:
+        """Build the message for the streamed answer."""
+        usage = self.usage
+        if usage is None:
+            # A stream closed early never gets the provider's usage chunk.
+            usage = {"input_tokens": input_tokens, "output_tokens": self.tokens, "total_tokens": input_tokens + self.tokens}
+        return AIMessage(
+            content=self.scan.text,
+            usage_metadata=usage,
+            response_metadata={
+                **self.response_metadata,
+                "stop_reason": self.stop_reason,
+                "streamed_tokens": self.tokens,
+            },
+        )
+
+
+def consume(stream: Iterator[AIMessageChunk], state: StreamState, input_tokens: int) -> AIMessage:
+    """Read ``stream`` until it ends or ``state`` says stop, then close it."""
+    try:
+        for chunk in stream:
+            if state.add(chunk):
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    return state.result(input_tokens)
+
+
+async def aconsume(stream: AsyncIterator[AIMessageChunk], state: StreamState, input_tokens: int) -> AIMessage:
+    """Async variant of consume."""
+    try:
+        async for chunk in stream:
+            if state.add(chunk):
+                break
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    return state.result(input_tokens)
+
+
+def stream_info(message: Any) -> Dict[str, Any]:
+    """``Response`` fields describing how a (possibly streamed) answer ended."""
+    metadata = getattr(message, "response_metadata", None) or {}
+    if "streamed_tokens" not in metadata:
+        return {}
+    return {
+        "truncated": metadata.get("stop_reason") is not None,
+        "stop_reason": metadata.get("stop_reason"),
+        "output_tokens": metadata.get("streamed_tokens"),
+    }
@@ -0,0 +1,70 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agent.cache import MISSING, ResponseCache, cache_key
+from agent.schema import Perspective, Perspectives
+
+
+def test_key_depends_on_model_params_and_schema() -> None:
+    messages = [HumanMessage(content="hello")]
+    base = cache_key("llm", messages, model="gpt-4o", temperature=0, schema=None)
+    assert base == cache_key("llm", [HumanMessage(content="hello")], model="gpt-4o", temperature=0, schema=None)
+    assert base != cache_key("llm", messages, model="gpt-4o", temperature=0.7, schema=None)
+    assert base != cache_key("llm", messages, model="gpt-4o", temperature=0, schema={"title": "Prompts"})
+
+
+def test_round_trips_messages_and_structured_output(tmp_path) -> None:
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.put("m", AIMessage(content="hi"))
+    cache.put("s", Perspectives(perspectives=[Perspective(intent="buy")]))
+
+    assert cache.get("m", "node").content == "hi"
+    assert cache.get("s", "node", Perspectives).perspectives[0].intent == "buy"
+    assert cache.get("absent", "node") is MISSING
+    assert cache.stats["node"] == {"hits": 2, "misses": 1}
+
+
+def test_ttl_and_lru_eviction(tmp_path) -> None:
+    expired = ResponseCache(str(tmp_path / "ttl.sqlite"), ttl_seconds=-1)
+    expired.put("k", "v")
+    assert expired.get("k") is MISSING
+
+    cache = ResponseCache(str(tmp_path / "lru.sqlite"), max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+
+    # Larger caches trim a batch at once, down to TRIM_RATIO of the bound.
+    batched = ResponseCache(str(tmp_path / "batch.sqlite"), max_entries=10)
+    for i in range(10):
+        batched.put(str(i), i)
+    batched.put("0", 0)
+    assert len(batched) == 10
+    batched.put("10", 10)
+    assert len(batched) == 9
+    assert batched.get("1") is MISSING and batched.get("0") == 0
+
+
+def test_cached_samples_stay_independent(tmp_path) -> None:
+    from agent.petra_agent import graph
+    from benchmarks.fakes import install_fakes
+
+    configurable = {
+        "model": "fake/test", "search_backend": "fake", "cache_path": str(tmp_path / "cache.sqlite"),
+        "cache_nodes": frozenset({"execute_prompts"}), "sampling_min_samples": 2,
+    }
+    inputs = {"brand_info": {"company_name": "Acme", "website": "acme.example"}, "number_of_perspectives": 1,
+              "number_of_prompts": 1, "number_of_responses": 2}
+    install_fakes()
+    first = graph.invoke(inputs, {"configurable": configurable})
+    model, _ = install_fakes()
+    second = graph.invoke(inputs, {"configurable": configurable})
+
+    responses = sorted((r.sample_index, r.response) for r in first["responses"])
+    assert [index for index, _ in responses] == [0, 1]
+    assert responses[0][1] != responses[1][1]
+    assert sorted((r.sample_index, r.response) for r in second["responses"]) == responses
+    assert model.calls == 4  # only the uncached nodes call the model; both samples come from the cache
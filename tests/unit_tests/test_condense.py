@@ -0,0 +1,95 @@
+import logging
+import subprocess
+import sys
+
+import tiktoken
+
+from agent import condense as condense_module
+from agent.condense import (
+    ENCODINGS,
+    condense,
+    load_encodings,
+    snippets,
+    token_counter,
+    truncate_to_tokens,
+)
+from agent.scheduler import estimate_tokens
+
+RESULTS = {
+    "query": "What is Acme?",
+    "results": [
+        {"title": "Acme - About", "url": "https://acme.example/about", "score": 0.9,
+         "content": "Acme makes trail running shoes for beginners. Founded in 1990 in Portland. "
+                    "Acme sells in 30 countries through its own stores."},
+        {"title": "Shoe news", "url": "https://news.example/acme", "score": 0.4,
+         "content": "Acme makes trail running shoes for beginners! The weather was mild this week across the region. "
+                    "Analysts expect the footwear market to grow steadily."},
+    ],
+}
+
+
+def test_snippets_split_results_into_sentences() -> None:
+    parts = snippets(RESULTS)
+    assert [p.source for p in parts] == [0, 0, 0, 1, 1, 1]
+    assert parts[0].text == "Acme makes trail running shoes for beginners."
+
+
+def test_condense_dedupes_and_keeps_source_order() -> None:
+    text = condense(RESULTS, None, "Acme")
+    assert text.count("Acme makes trail running shoes") == 1
+    assert text.startswith("[1] Acme - About (https://acme.example/about)\n- Acme makes")
+    assert text.index("Founded in 1990") < text.index("Acme sells in 30 countries")
+
+
+def test_condense_respects_the_token_budget() -> None:
+    count = token_counter("gpt-4o")
+    full = condense(RESULTS, None, "Acme")
+    budget = count(full) // 2
+    short = condense(RESULTS, budget, "Acme")
+    assert count(short) <= budget
+    # The highest-ranked snippet (relevant page, lead sentence, names the brand) survives.
+    assert "Acme makes trail running shoes" in short
+
+
+def test_truncate_to_tokens_cuts_at_sentence_boundaries() -> None:
+    text = "First sentence here. Second sentence follows. Third one ends it."
+    assert truncate_to_tokens(text, None) == text
+    count = token_counter("gpt-4o")
+    cut = truncate_to_tokens(text, count("First sentence here.") + count("Second sentence follows.") + 2)
+    assert cut == "First sentence here. Second sentence follows."
+
+
+def test_truncate_to_tokens_keeps_newlines_and_lists() -> None:
+    text = "Acme makes shoes.\n\n- Trail shoes.\n- Road shoes.\nFounded in 1990 in Portland, Oregon, by two runners."
+    count = token_counter("gpt-4o")
+    cut = truncate_to_tokens(text, count(text) - 5)
+    assert cut == "Acme makes shoes.\n\n- Trail shoes.\n- Road shoes."
+
+
+def test_encodings_load_once_and_warn_once(monkeypatch, caplog) -> None:
+    fetched = []
+
+    def offline(name: str) -> None:
+        fetched.append(name)
+        raise OSError("no network")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", offline)
+    monkeypatch.setattr(condense_module, "_attempted", set())
+    monkeypatch.setattr(condense_module, "_encodings", {})
+    token_counter.cache_clear()
+    try:
+        with caplog.at_level(logging.WARNING, logger="agent.condense"):
+            load_encodings()
+            load_encodings()
+            count = token_counter("openai/gpt-4o")
+        assert count("some text to count") == estimate_tokens("some text to count")
+    finally:
+        token_counter.cache_clear()
+    assert fetched == list(ENCODINGS)
+    assert len(caplog.records) == len(ENCODINGS)
+
+
+def test_importing_the_graph_loads_no_encoding() -> None:
+    # tiktoken would fetch its BPE files over the network; that waits for the first count.
+    check = "import agent.petra_agent, agent.condense as c; assert not c._attempted and not c._encodings"
+    subprocess.run([sys.executable, "-c", check], check=True, timeout=60)
@@ -0,0 +1,21 @@
+import asyncio
+
+from agent.config import get_model, http_async_client, register_model_provider
+
+CONFIG = {"configurable": {"model": "perloop/test"}}
+
+
+def test_async_clients_and_models_are_per_event_loop() -> None:
+    register_model_provider("perloop", lambda name, temperature: object())
+
+    async def clients() -> tuple:
+        return http_async_client(), http_async_client(), get_model(CONFIG), get_model(CONFIG)
+
+    client, same_client, model, same_model = asyncio.run(clients())
+    other_client, _, other_model, _ = asyncio.run(clients())
+    assert client is same_client and model is same_model
+    # A second asyncio.run must not reuse connections or models bound to the closed loop.
+    assert other_client is not client and other_model is not model
+    # Sync callers keep the process-wide model.
+    assert get_model(CONFIG) is get_model(CONFIG)
+    assert get_model(CONFIG) is not model
@@ -0,0 +1,80 @@
+import random
+from typing import List
+
+from agent.configuration import Configuration
+from agent.dedup import RECOMMENDED_THRESHOLD, find_duplicates, jaccard, shingles
+from agent.petra_agent import graph
+from agent.schema import Prompt, ResponseMentions
+from agent.scoring import score_response
+from benchmarks.fakes import FakeChatModel, install_fakes
+
+
+def test_shingles_ignore_order_case_and_plurals() -> None:
+    assert jaccard(shingles("Best running shoes for beginners", "English"), shingles("best beginner running shoes", "English")) > 0.8
+    assert jaccard(shingles("Best running shoes for beginners", "English"), shingles("Which trail shoes are waterproof?", "English")) < 0.5
+
+
+def test_find_duplicates_maps_to_first_occurrence() -> None:
+    texts = [
+        "Best running shoes for beginners",
+        "Which trail running shoes are waterproof?",
+        "best beginner running shoes",
+        "What are the best running shoes for beginners?",
+        "Cheapest running shoes for beginners",
+    ]
+    assert find_duplicates(texts, RECOMMENDED_THRESHOLD, "English") == {2: 0, 3: 0}
+    assert find_duplicates(texts, 1.01, "English") == {}
+
+
+def test_stopwords_follow_the_prompt_language() -> None:
+    statement = "Yeni başlayanlar için hangi koşu ayakkabısı en iyi?"
+    question = "yeni başlayanlar için en iyi koşu ayakkabısı nedir"
+    assert find_duplicates([statement, question], RECOMMENDED_THRESHOLD, "Turkish") == {1: 0}
+    # English function words are not Turkish ones, and languages without a list keep every word.
+    assert find_duplicates([statement, question], RECOMMENDED_THRESHOLD, "English") == {}
+    assert shingles("What is the best CRM?", "Spanish") == shingles("What is the best CRM?")
+    assert shingles("What is the best CRM?", "English") == shingles("best CRM")
+
+
+def test_shared_response_counts_for_every_perspective() -> None:
+    delta = score_response([0, 2], ResponseMentions(counts={"Acme": 1}))
+    assert delta.responses == 1
+    assert delta.mentions == {"Acme": 1}
+    assert delta.perspective_responses == {"0": 1, "2": 1}
+
+
+REWORDINGS = [
+    ("Best running shoes for beginners", "What are the best running shoes for beginners?", "best beginner running shoes"),
+    ("Which trail running shoes are waterproof?", "waterproof trail running shoes"),
+    ("Cheapest running shoes with good cushioning", "What are the cheapest running shoes with good cushioning?"),
+    ("Are carbon plate racing shoes worth it?", "are carbon plate racing shoes worth it"),
+    ("Most durable running shoes for heavy runners", "most durable running shoes for a heavy runner"),
+]
+
+
+def _reworded_prompts(self: FakeChatModel, prompt: str, count: int, rng: random.Random) -> List[Prompt]:
+    # Every perspective asks the same questions in its own words, as real generations tend to.
+    return [Prompt(text=rng.choice(REWORDINGS[i])) for i in range(count)]
+
+
+def test_graph_executes_collapsed_prompts_once(monkeypatch) -> None:
+    inputs = {"brand_info": {"company_name": "Acme", "website": "acme.example"}, "number_of_perspectives": 4, "number_of_prompts": 5}
+    config = {"configurable": {"model": "fake/test", "search_backend": "fake", "backoff_base": 0.0}}
+    monkeypatch.setattr(FakeChatModel, "_prompts", _reworded_prompts)
+    install_fakes()
+    # Deduplication is opt-in: by default every prompt is executed.
+    assert Configuration().dedup_threshold is None
+    assert len(graph.invoke(inputs, config)["responses"]) == 20
+
+    install_fakes()
+    config["configurable"]["dedup_threshold"] = RECOMMENDED_THRESHOLD
+    state = graph.invoke(inputs, config)
+
+    duplicates = state["prompt_duplicates"]
+    # Each question's rewordings collapse to one prompt; different questions are all still asked.
+    assert len(duplicates) == 20 - len(REWORDINGS)
+    assert len(state["responses"]) == 20 - len(duplicates)
+    assert {r.prompt_id for r in state["responses"]}.isdisjoint(duplicates)
+    assert state["dedup_calls_saved"] == len(duplicates)
+    # Perspectives whose prompt was collapsed still get the shared responses.
+    assert sum(state["tally"].perspective_responses.values()) > state["tally"].responses
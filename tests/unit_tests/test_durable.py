@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from agent import durable
+from agent.durable import NodeTimeoutError, retry_on, with_timeout
+from benchmarks.fakes import FakeChatModel, FakeProviderError, install_fakes
+
+INPUTS = {
+    "brand_info": {"company_name": "Acme", "website": "acme.example"},
+    "number_of_perspectives": 2,
+    "number_of_prompts": 3,
+}
+
+
+def test_resume_reruns_only_unfinished_tasks(tmp_path, monkeypatch) -> None:
+    # One task at a time: the failing task stops the step before any sibling is
+    # cut off mid-flight, so which tasks finished is exactly what the model saw.
+    config = {"max_concurrency": 1,
+              "configurable": {"model": "fake/test", "search_backend": "fake", "backoff_base": 0.0,
+                               "checkpoint_path": str(tmp_path / "runs.sqlite")}}
+    generate = FakeChatModel._generate
+
+    def reject_third_prompts(self, messages, *args, **kwargs):
+        # The fake tags each perspective's prompts "-0)", "-1)", "-2)".
+        if "-2)" in str(messages[-1].content):
+            raise FakeProviderError(400)
+        return generate(self, messages, *args, **kwargs)
+
+    model, _ = install_fakes()
+    monkeypatch.setattr(FakeChatModel, "_generate", reject_third_prompts)
+    with pytest.raises(FakeProviderError):
+        durable.run("run-1", INPUTS, config)
+    executed = model.calls - (3 + 2)  # synthesis, competitors, perspectives, 2 prompt generations
+    pending = durable.pending_nodes("run-1", config)
+    assert pending == ("execute_prompts",) * (6 - executed)
+    assert 0 < executed < 6
+
+    monkeypatch.setattr(FakeChatModel, "_generate", generate)
+    model, search = install_fakes()
+    state = durable.resume("run-1", config)
+    assert (model.calls, search.calls) == (len(pending), 0)
+    assert len(state["responses"]) == 6
+    assert durable.pending_nodes("run-1", config) == ()
+
+
+def test_with_timeout_raises_node_timeout() -> None:
+    def slow(state, config):
+        time.sleep(0.2)
+        return {}
+
+    wrapped = with_timeout("slow", slow)
+    with pytest.raises(NodeTimeoutError):
+        wrapped({}, {"configurable": {"node_timeouts": {"slow": 0.01}}})
+    assert wrapped({}, {}) == {}
+
+
+def test_timeout_counts_from_start_and_is_not_retried_while_running() -> None:
+    release = threading.Event()
+    calls = []
+
+    def stuck(state, config):
+        calls.append(1)
+        release.wait(5)
+        return {}
+
+    wrapped = with_timeout("stuck", stuck)
+    config = {"configurable": {"node_timeouts": {"stuck": 0.02}}}
+    # More timed-out calls than a default thread pool has workers: each later
+    # call must still get its full timeout to run, not time out in a queue.
+    errors = []
+    for _ in range(40):
+        with pytest.raises(NodeTimeoutError) as info:
+            wrapped({}, config)
+        errors.append(info.value)
+    assert len(calls) == 40
+    assert errors[0].still_running and not retry_on(errors[0])
+    release.set()
+    errors[0].abandoned.result(5)
+    assert retry_on(errors[0])
+
+
+def test_retry_on() -> None:
+    assert retry_on(NodeTimeoutError())
+    assert retry_on(FakeProviderError(503))
+    assert not retry_on(FakeProviderError(400))
+    assert not retry_on(KeyError("x"))
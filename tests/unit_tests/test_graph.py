@@ -0,0 +1,141 @@
+import pytest
+
+from agent.petra_agent import graph
+from benchmarks.fakes import FakeBehavior, install_fakes
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"configurable": {"model": "fake/test", "search_backend": "fake", "backoff_base": 0.0}}
+INPUTS = {
+    "brand_info": {"company_name": "Acme", "website": "acme.example"},
+    "number_of_perspectives": 2,
+    "number_of_prompts": 3,
+}
+
+
+async def test_graph_runs_offline_with_fakes() -> None:
+    model, search = install_fakes(FakeBehavior(error_rate=0.1))
+    state = await graph.ainvoke(INPUTS, CONFIG)
+
+    assert len(state["perspectives"]) == 2
+    assert len(state["prompts"]) == 6
+    assert len(state["responses"]) == 6
+    assert {c.name for c in state["competitors"]} == set(FakeBehavior().competitors)
+    assert state["tally"].responses == 6
+    assert state["brand_mentions"] == state["tally"].mentions.get("Acme", 0)
+    assert search.calls == 1
+
+
+def test_fake_runs_are_deterministic() -> None:
+    install_fakes(FakeBehavior(seed=7))
+    first = graph.invoke(INPUTS, CONFIG)
+    install_fakes(FakeBehavior(seed=7))
+    second = graph.invoke(INPUTS, CONFIG)
+    assert [r.response for r in first["responses"]] == [r.response for r in second["responses"]]
+
+
+def test_batch_execution_mode_matches_send_mode() -> None:
+    inputs = {**INPUTS, "number_of_responses": 2}
+    install_fakes()
+    sent = graph.invoke(inputs, CONFIG)
+    model, _ = install_fakes()
+    config = {"configurable": {**CONFIG["configurable"], "prompt_execution_mode": "batch", "prompt_batch_size": 4}}
+    batched = graph.invoke(inputs, config)
+
+    def by_prompt(state: dict) -> list:
+        # Prompt ids and sample order follow completion order, so compare by prompt text.
+        return sorted((state["prompts"][r.prompt_id].text, r.response) for r in state["responses"])
+
+    assert len(batched["responses"]) == 12
+    assert by_prompt(batched) == by_prompt(sent)
+    assert batched["tally"] == sent["tally"]
+    assert batched["brand_mentions"] == sent["brand_mentions"]
+    assert model.calls == 3 + 2 + 6 * 2
+
+
+def test_run_brands_executes_shared_prompts_once() -> None:
+    from agent.petra_agent import group_brands, run_brands
+    from agent.schema import BrandInfo
+
+    names = ["Acme", "Globex", "Initech", "Umbrella"]
+    brands = [BrandInfo(company_name=name, website=f"{name.lower()}.example", domain="widgets") for name in names]
+    model, _ = install_fakes()
+    run_brands(brands[:1], CONFIG, number_of_perspectives=2, number_of_prompts=3)
+    single = model.calls
+    model, search = install_fakes()
+    results = run_brands(brands, CONFIG, number_of_perspectives=2, number_of_prompts=3)
+
+    assert list(results) == names
+    assert search.calls == 4
+    # Two calls (synthesis, competitors) per extra brand; prompts run once.
+    assert model.calls == single + 2 * 3
+    assert len(group_brands([*brands, BrandInfo(company_name="Solo", website="solo.example")])) == 2
+
+
+@pytest.mark.parametrize(
+    "mode, together",
+    [
+        ("sequential", set()),
+        ("concurrent", {"find_competitors", "generate_perspectives"}),
+        ("speculative", {"synthesize_brand_description", "generate_perspectives"}),
+    ],
+)
+def test_pre_fanout_modes_share_a_step_and_join_before_scoring(mode: str, together: set) -> None:
+    model, _ = install_fakes()
+    config = {"configurable": {**CONFIG["configurable"], "pre_fanout_mode": mode}}
+    steps: dict = {}
+    for chunk in graph.stream(INPUTS, config, stream_mode="debug"):
+        if chunk["type"] == "task":
+            steps.setdefault(chunk["payload"]["name"], chunk["step"])
+    stages = ["synthesize_brand_description", "find_competitors", "generate_perspectives"]
+    shared = {name for name in stages if [steps[other] for other in stages].count(steps[name]) > 1}
+    assert shared == together
+    assert steps["find_competitors"] < steps["collect_prompts"]
+    assert model.calls == 3 + 2 + 6  # synthesis, competitors and perspectives; 2 prompt generations; 6 executions
+
+
+@pytest.mark.parametrize("mode", ["sequential", "concurrent", "speculative"])
+def test_prompt_generation_description_follows_the_mode(monkeypatch, mode: str) -> None:
+    from benchmarks.fakes import FakeChatModel
+
+    seen: list = []
+    original = FakeChatModel._prompts
+
+    def record(self, prompt, count, rng):
+        seen.append(prompt)
+        return original(self, prompt, count, rng)
+
+    monkeypatch.setattr(FakeChatModel, "_prompts", record)
+    install_fakes()
+    config = {"configurable": {**CONFIG["configurable"], "pre_fanout_mode": mode}}
+    state = graph.invoke(INPUTS, config)
+
+    assert len(seen) == 2
+    # Speculative prompt generation is routed before synthesis has written its description.
+    synthesized = [state["brand_description"] in prompt for prompt in seen]
+    from_search = ["Acme result 0" in prompt for prompt in seen]
+    assert synthesized == [mode != "speculative"] * 2
+    assert from_search == [mode == "speculative"] * 2
+
+
+@pytest.mark.parametrize("mode", ["sequential", "concurrent", "speculative"])
+def test_run_without_perspectives_still_scores(mode: str) -> None:
+    install_fakes()
+    config = {"configurable": {**CONFIG["configurable"], "pre_fanout_mode": mode}}
+    steps: dict = {}
+    for chunk in graph.stream({**INPUTS, "number_of_perspectives": 0}, config, stream_mode="debug"):
+        if chunk["type"] == "task":
+            steps.setdefault(chunk["payload"]["name"], chunk["step"])
+    assert "generate_prompts_for_perspective" not in steps and "execute_prompts" not in steps
+    assert steps["find_competitors"] < steps["count_brand_mentions"] < steps["store_results"]
+    assert steps["collect_prompts"] < steps["count_brand_mentions"]
+
+
+def test_run_brands_without_perspectives_still_scores() -> None:
+    from agent.petra_agent import run_brands
+    from agent.schema import BrandInfo
+
+    install_fakes()
+    results = run_brands([BrandInfo(company_name="Acme", website="acme.example")], CONFIG, number_of_perspectives=0)
+    assert results["Acme"].brand_mentions == 0
+    assert results["Acme"].visibility == 0.0
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from agent.instrumentation import (
+    PrometheusTextfileExporter,
+    estimate_cost,
+    register_price,
+)
+from agent.petra_agent import graph
+from agent.schema import NodeMetrics, RunMetrics, merge_metrics
+from benchmarks.fakes import FakeBehavior, install_fakes
+
+pytestmark = pytest.mark.anyio
+
+INPUTS = {
+    "brand_info": {"company_name": "Acme", "website": "acme.example"},
+    "number_of_perspectives": 2,
+    "number_of_prompts": 2,
+}
+
+
+def _config(**configurable):
+    return {"configurable": {"model": "fake/test", "search_backend": "fake", "backoff_base": 0.0, **configurable}}
+
+
+def test_estimate_cost_uses_longest_prefix() -> None:
+    assert estimate_cost("openai/gpt-4o-mini-2024-07-18", 1_000_000, 0) == 0.15
+    assert estimate_cost("gpt-4o-2024-08-06", 0, 1_000_000) == 10.0
+    assert estimate_cost("unknown-model", 10, 10) == 0.0
+
+
+def test_merge_metrics_sums_nodes_and_perspectives() -> None:
+    left = RunMetrics(nodes={"a": NodeMetrics(calls=1, input_tokens=10)})
+    right = RunMetrics(nodes={"a": NodeMetrics(calls=2), "b": NodeMetrics(tasks=1)}, perspectives={"0": NodeMetrics(calls=2)})
+    merged = merge_metrics(left, right)
+    assert merged.nodes["a"].calls == 3
+    assert merged.nodes["a"].input_tokens == 10
+    assert merged.total.tasks == 1
+    assert merged.perspectives["0"].calls == 2
+    assert left.nodes["a"].calls == 1
+
+
+async def test_graph_records_metrics_when_enabled(tmp_path) -> None:
+    model, search = install_fakes(FakeBehavior(error_rate=0.1))
+    register_price("fake", 1.0, 1.0)
+    path = tmp_path / "metrics.jsonl"
+    state = await graph.ainvoke(INPUTS, _config(metrics_exporter=f"jsonl:{path}"))
+
+    metrics = state["metrics"]
+    assert metrics.nodes["generate_prompts_for_perspective"].tasks == 2
+    assert metrics.nodes["execute_prompts"].tasks == 4
+    assert metrics.total.calls + metrics.total.cache_hits == model.calls + search.calls - metrics.total.retries
+    assert metrics.nodes["synthesize_brand_description"].input_tokens > 0
+    assert metrics.total.cost_usd > 0
+    assert set(metrics.perspectives) == {"0", "1"}
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert sum(line["tasks"] for line in lines) == metrics.total.tasks
+
+
+def test_graph_records_nothing_when_disabled() -> None:
+    install_fakes()
+    state = graph.invoke(INPUTS, _config())
+    assert state["metrics"] == RunMetrics()
+
+
+def test_prometheus_exporter_writes_cumulative_counters(tmp_path) -> None:
+    exporter = PrometheusTextfileExporter(str(tmp_path / "petra.prom"))
+    update = RunMetrics(nodes={"find_competitors": NodeMetrics(tasks=1, calls=1)})
+    exporter.export("find_competitors", update)
+    exporter.export("find_competitors", update)
+    text = (tmp_path / "petra.prom").read_text()
+    assert "# TYPE petra_node_calls_total counter" in text
+    assert 'petra_node_calls_total{node="find_competitors"} 2' in text
@@ -0,0 +1,46 @@
+from agent.matching import MentionMatcher
+
+
+def test_word_boundaries_and_case() -> None:
+    matcher = MentionMatcher.for_brand("Apple", ["Nike"])
+    scan = matcher.scan("Pineapple juice, Nikes and NIKE's app. apple")
+    assert [(m.entity, m.start) for m in scan.hits] == [("Nike", 27), ("Apple", 39)]
+    assert scan.counts == {"Nike": 1, "Apple": 1}
+
+
+def test_aliases_longest_match_and_first_rank() -> None:
+    matcher = MentionMatcher.for_brand(
+        "Under Armour",
+        ["Adidas", "Armour Co"],
+        aliases={"Under Armour": ["UA"], "Adidas": ["adidas originals"]},
+    )
+    text = "Try Adidas Originals, then under\narmour or UA. Armour Co is niche."
+    scan = matcher.scan(text)
+    assert scan.counts == {"Adidas": 1, "Under Armour": 2, "Armour Co": 1}
+    assert scan.first_mention_rank == {"Adidas": 1, "Under Armour": 2, "Armour Co": 3}
+    assert text[scan.hits[0].start:scan.hits[0].end] == "Adidas Originals"
+
+
+def test_unicode_word_boundaries() -> None:
+    matcher = MentionMatcher.for_brand("Şok", ["Migros"])
+    assert matcher.scan("Şokta değil, Şok ve Migros'ta").counts == {"Şok": 1, "Migros": 1}
+
+
+def test_turkish_dotted_and_dotless_i() -> None:
+    matcher = MentionMatcher.for_brand("Straße", ["İstanbul Co", "Kırmızı"])
+    text = "İstanbul Co, istanbul co, ISTANBUL CO; KIRMIZI ve kırmızı"
+    scan = matcher.scan(text)
+    assert scan.counts == {"İstanbul Co": 3, "Kırmızı": 2}
+    assert [text[m.start:m.end] for m in scan.hits][:3] == ["İstanbul Co", "istanbul co", "ISTANBUL CO"]
+
+
+def test_sharp_s_folds_to_ss() -> None:
+    matcher = MentionMatcher.for_brand("Straße", ["Ölçü"])
+    text = "ẞ: STRASSE, strasse und Straße. ÖLÇÜ"
+    scan = matcher.scan(text)
+    assert scan.counts == {"Straße": 3, "Ölçü": 1}
+    assert [text[m.start:m.end] for m in scan.hits] == ["STRASSE", "strasse", "Straße", "ÖLÇÜ"]
+    streamed = matcher.stream()
+    for chunk in ("ẞ: STRA", "SSE, strasse und Stra", "ße. ÖLÇÜ", " "):
+        streamed.feed(chunk)
+    assert [(m.start, m.end) for m in streamed.mentions.hits] == [(m.start, m.end) for m in scan.hits]
@@ -0,0 +1,43 @@
+from agent.nodes import _chunk_messages, _chunk_prompts, _prompt_messages
+from agent.petra_agent import graph
+from agent.schema import Perspective, PerspectivePrompts, Prompt, PromptsByPerspective
+from benchmarks.fakes import install_fakes
+
+PERSPECTIVES = [Perspective(intent="Buy a gift"), Perspective(intent="Compare prices"), Perspective(intent="Fix a problem")]
+PAYLOAD = {"brand_description": "A long brand description. " * 50, "number_of_prompts": 3, "region": "Canada", "language": "English"}
+
+
+def test_static_prefix_is_shared_across_calls() -> None:
+    first = _prompt_messages({**PAYLOAD, "current_perspective": PERSPECTIVES[0]})
+    second = _prompt_messages({**PAYLOAD, "current_perspective": PERSPECTIVES[1]})
+    assert first[:-1] == second[:-1]
+    assert PAYLOAD["brand_description"] in first[1].content
+    assert first[-1] != second[-1]
+
+    chunk_a = _chunk_messages({**PAYLOAD, "perspectives": PERSPECTIVES[:2], "perspective_ids": [0, 1]})
+    chunk_b = _chunk_messages({**PAYLOAD, "perspectives": PERSPECTIVES[2:], "perspective_ids": [2]})
+    assert chunk_a[:-1] == chunk_b[:-1]
+
+
+def test_chunk_prompts_tags_and_reports_missing_perspectives() -> None:
+    result = PromptsByPerspective(perspectives=[
+        PerspectivePrompts(perspective_id=2, prompts=[Prompt(text="b")]),
+        PerspectivePrompts(perspective_id=0, prompts=[Prompt(text="a")]),
+        PerspectivePrompts(perspective_id=7, prompts=[Prompt(text="not requested")]),
+    ])
+    prompts, missing = _chunk_prompts(result, {"perspective_ids": [0, 1, 2]})
+    assert [(p.text, p.perspective_id) for p in prompts] == [("a", 0), ("b", 2)]
+    assert missing == [1]
+
+
+def test_chunked_mode_makes_one_call_per_chunk() -> None:
+    inputs = {"brand_info": {"company_name": "Acme", "website": "acme.example"}, "number_of_perspectives": 7, "number_of_prompts": 3}
+    config = {"configurable": {"model": "fake/test", "search_backend": "fake", "backoff_base": 0.0,
+                               "prompt_generation_mode": "chunked", "prompt_generation_chunk_size": 3}}
+    model, _ = install_fakes()
+    state = graph.invoke(inputs, config)
+
+    assert sorted({p.perspective_id for p in state["prompts"]}) == list(range(7))
+    assert len(state["prompts"]) == 21
+    # synthesis, competitors, perspectives, 3 chunks, 21 executions
+    assert model.calls == 3 + 3 + 21
@@ -0,0 +1,42 @@
+import pytest
+
+from agent.sampling import SequentialSampler, wilson_interval
+
+
+def test_wilson_interval() -> None:
+    low, high = wilson_interval(5, 10)
+    assert low == pytest.approx(0.2366, abs=1e-3)
+    assert high == pytest.approx(0.7634, abs=1e-3)
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+
+def test_unanimous_samples_stop_once_interval_excludes_the_middle() -> None:
+    sampler = SequentialSampler(max_samples=10, min_samples=3)
+    assert sampler.next_round_size() == 3
+    for _ in range(3):
+        sampler.add(True)
+    # 3/3 still leaves [0.44, 1.0]: not clearly always mentioned.
+    assert not sampler.done
+    assert sampler.next_round_size() == 1
+    sampler.add(True)
+    assert sampler.done
+    report = sampler.report(0)
+    assert (report.samples, report.brand_mentions, report.calls_saved) == (4, 4, 6)
+    assert report.ci_low > 0.5
+
+    never = SequentialSampler(max_samples=10, min_samples=3)
+    for _ in range(3):
+        never.add(False)
+    assert not never.done
+    never.add(False)
+    assert never.done and never.interval[1] < 0.5
+
+
+def test_mixed_samples_continue_until_max() -> None:
+    sampler = SequentialSampler(max_samples=6, min_samples=2, half_width=0.05)
+    for mentioned in [True, False, True, False, True]:
+        sampler.add(mentioned)
+        assert sampler.next_round_size() == 1
+    sampler.add(False)
+    assert sampler.done
+    assert sampler.report(0).calls_saved == 0
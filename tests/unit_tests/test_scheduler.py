@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from agent.scheduler import Scheduler, TokenBucket, is_retryable
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_retries_rate_limit_then_succeeds() -> None:
+    scheduler = Scheduler(max_retries=3, backoff_base=0.001, backoff_max=0.001)
+    calls = []
+
+    def flaky() -> str:
+        calls.append(1)
+        if len(calls) < 3:
+            raise FakeStatusError(429)
+        return "ok"
+
+    assert scheduler.call(flaky) == "ok"
+    assert len(calls) == 3
+
+
+def test_does_not_retry_client_errors() -> None:
+    scheduler = Scheduler(max_retries=3, backoff_base=0.001)
+    calls = []
+
+    def bad_request() -> None:
+        calls.append(1)
+        raise FakeStatusError(400)
+
+    with pytest.raises(FakeStatusError):
+        scheduler.call(bad_request)
+    assert len(calls) == 1
+    assert is_retryable(FakeStatusError(503))
+
+
+def test_async_concurrency_is_bounded() -> None:
+    scheduler = Scheduler(max_concurrency=3)
+    in_flight = 0
+    peak = 0
+
+    async def work() -> None:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    async def main() -> None:
+        await asyncio.gather(*(scheduler.acall(work) for _ in range(20)))
+
+    asyncio.run(main())
+    assert peak == 3
+
+
+def test_token_bucket_reports_wait_when_exhausted() -> None:
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.05)
+
+
+def test_openai_client_leaves_retries_to_the_scheduler(monkeypatch: pytest.MonkeyPatch) -> None:
+    from agent.config import _openai_model
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    model = _openai_model("gpt-4o", 0.0)
+    assert model.max_retries == 0
+    assert model.root_client.max_retries == 0
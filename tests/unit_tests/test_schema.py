@@ -0,0 +1,55 @@
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.nodes import _log
+from agent.schema import BrandInfo, Perspective, Prompt, Response, State
+
+
+def _perspective(i: int) -> Perspective:
+    # About 600 characters, like the perspectives the model writes.
+    return Perspective(
+        intent=f"Intent {i}: " + "compare options " * 6, demographic="Suburban parent " * 4, region="Istanbul, Turkey",
+        market_role="End-User/Consumer", specific_need="Needs something specific " * 6, knowledge_level="Novice",
+        sentiment_bias="Price-Conscious Shopper", query_type="Commercial Investigation",
+    )
+
+
+def _state(prompts: int) -> State:
+    return State(
+        brand_info=BrandInfo(company_name="Acme", website="acme.example"),
+        perspectives=[_perspective(i) for i in range(4)],
+        prompts=[Prompt(text=f"Which brand is best for need {j}?", perspective_id=j % 4) for j in range(prompts)],
+        responses=[Response(prompt_id=j, response="Acme and Globex are popular.", sample_index=0) for j in range(prompts)],
+    )
+
+
+def _checkpoint_bytes(value: object) -> int:
+    return len(JsonPlusSerializer().dumps_typed(value)[1])
+
+
+def test_views_resolve_prompt_and_perspective_indexes() -> None:
+    state = _state(6)
+    state.prompts.append(Prompt(text="orphan"))
+    assert state.perspective_of(state.prompts[5]) == state.perspectives[1]
+    assert state.perspective_of(state.prompts[6]) is None
+    assert state.prompt_view(2).text == "Which brand is best for need 2?"
+    assert state.prompt_view(2).perspective == state.perspectives[2]
+    views = state.response_views()
+    assert [v.prompt.text for v in views] == [p.text for p in state.prompts[:6]]
+    assert views[3].prompt.perspective == state.perspectives[3]
+    assert views[3].response == "Acme and Globex are popular."
+
+
+def test_checkpoint_size_per_prompt_is_small_and_flat() -> None:
+    small, large = _state(48), _state(192)
+    per_prompt = (_checkpoint_bytes(large) - _checkpoint_bytes(small)) / (192 - 48)
+    nested_per_prompt = _checkpoint_bytes([v.model_dump() for v in large.response_views()]) / 192
+    # Each prompt and response costs a few hundred bytes, not a copy of its perspective.
+    assert per_prompt < 250
+    assert nested_per_prompt > 3 * per_prompt
+
+
+def test_message_log_entries_are_bounded() -> None:
+    state = _state(1)
+    update = _log(state, HumanMessage(content="search result " * 2000))
+    assert _checkpoint_bytes(update) < 1000
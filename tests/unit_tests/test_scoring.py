@@ -0,0 +1,76 @@
+import asyncio
+
+from agent.schema import ResponseMentions, VisibilityTally, merge_tallies
+from agent.scoring import VISIBILITY_EVENT, astream_visibility, visibility_report
+
+
+def test_merge_tallies_sums_overall_and_per_perspective() -> None:
+    left = VisibilityTally()
+    left.add("compare options", ["Nike", "Adidas"])
+    right = VisibilityTally()
+    right.add("compare options", ["Nike"])
+    right.add("find a gift", [])
+
+    merged = merge_tallies(left, right)
+    assert merged.responses == 3
+    assert merged.mentions == {"Nike": 2, "Adidas": 1}
+    assert merged.visibility("Nike", "compare options") == 1.0
+    assert merged.visibility("Nike", "find a gift") == 0.0
+    assert left.responses == 1  # reducer does not mutate its inputs
+
+
+def test_visibility_report() -> None:
+    tally = VisibilityTally()
+    tally.add("p", ResponseMentions(counts={"Nike": 3}).counts)
+    tally.add("p", {})
+    assert visibility_report(tally)["visibility"] == {"Nike": 0.5}
+
+
+class ScriptedGraph:
+    """Stands in for a compiled graph: writes visibility events on a schedule."""
+
+    def __init__(self, events: list) -> None:
+        self.events = events
+        self.closed = False
+
+    async def astream(self, inputs, config=None, stream_mode=None):
+        try:
+            for delay, response_id, entities in self.events:
+                await asyncio.sleep(delay)
+                delta = VisibilityTally()
+                delta.add("0", {entity: 1 for entity in entities})
+                yield {"event": VISIBILITY_EVENT, "response_id": response_id, "delta": delta.model_dump()}
+        finally:
+            self.closed = True
+
+
+async def _collect(graph, inputs=None, config=None, deadline=None) -> list:
+    return [tally async for tally in astream_visibility(graph, inputs or {}, config, deadline=deadline)]
+
+
+def test_stream_stops_at_deadline_with_partial_tally() -> None:
+    graph = ScriptedGraph([(0.0, "0:0", ["Acme"]), (0.0, "1:0", []), (5.0, "2:0", ["Acme"])])
+    tallies = asyncio.run(_collect(graph, deadline=0.3))
+    assert [t.responses for t in tallies] == [1, 2]
+    assert tallies[-1].mentions == {"Acme": 1}
+    assert graph.closed
+
+
+def test_stream_counts_each_response_once() -> None:
+    # A retried node writes the events of the responses it scored before failing again.
+    graph = ScriptedGraph([(0.0, "0:0", ["Acme"]), (0.0, "1:0", []), (0.0, "0:0", ["Acme"]), (0.0, "2:0", ["Acme"])])
+    tallies = asyncio.run(_collect(graph))
+    assert tallies[-1].responses == 3
+    assert tallies[-1].mentions == {"Acme": 2}
+
+
+def test_streamed_tally_matches_final_state() -> None:
+    from agent.petra_agent import graph
+    from benchmarks.fakes import install_fakes
+
+    config = {"configurable": {"model": "fake/test", "search_backend": "fake"}}
+    inputs = {"brand_info": {"company_name": "Acme", "website": "acme.example"}, "number_of_perspectives": 2, "number_of_prompts": 2}
+    install_fakes()
+    tallies = asyncio.run(_collect(graph, inputs, config))
+    install_fakes()
+    assert tallies[-1] == graph.invoke(inputs, config)["tally"]
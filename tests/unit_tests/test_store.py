@@ -0,0 +1,74 @@
+from agent.petra_agent import graph
+from agent.store import ResultsStore
+from benchmarks.fakes import install_fakes
+
+INPUTS = {
+    "brand_info": {"company_name": "Acme", "website": "acme.example"},
+    "number_of_perspectives": 2,
+    "number_of_prompts": 3,
+}
+
+
+def _config(path: str, **configurable) -> dict:
+    return {"configurable": {"model": "fake/test", "search_backend": "fake", "results_store_path": path, **configurable}}
+
+
+def test_incremental_run_reexecutes_only_stale_prompts(tmp_path) -> None:
+    path = str(tmp_path / "results.sqlite")
+    install_fakes()
+    first = graph.invoke(INPUTS, _config(path))
+    assert first["prompt_set_id"]
+
+    # Everything was answered moments ago: nothing is re-executed or regenerated,
+    # and the stored answers are scored instead.
+    model, search = install_fakes()
+    fresh = graph.invoke(INPUTS, _config(path, freshness_seconds=3600))
+    assert (model.calls, search.calls) == (0, 0)
+    assert fresh["responses"] == []
+    assert fresh["tally"] == first["tally"]
+
+    # With a zero window every stored prompt is stale and re-executed as-is.
+    model, search = install_fakes()
+    rerun = graph.invoke(INPUTS, _config(path, freshness_seconds=0))
+    assert (model.calls, search.calls) == (6, 0)
+    assert rerun["prompt_set_id"] == first["prompt_set_id"]
+    assert [p.text for p in rerun["prompts"]] == [p.text for p in first["prompts"]]
+    assert {c.name for c in rerun["competitors"]} == {c.name for c in first["competitors"]}
+    assert rerun["tally"].responses == 6
+
+
+def test_prompt_sets_are_reused_only_with_the_same_settings(tmp_path) -> None:
+    path = str(tmp_path / "results.sqlite")
+    install_fakes()
+    graph.invoke(INPUTS, _config(path))
+
+    for changed in ({"number_of_prompts": 2}, {"number_of_perspectives": 3}, {"brand_info": {**INPUTS["brand_info"], "language": "Turkish"}}):
+        model, search = install_fakes()
+        graph.invoke({**INPUTS, **changed}, _config(path, freshness_seconds=3600))
+        assert search.calls == 1
+        assert model.calls > 0
+
+    # Each settings combination now has its own prompt set; the original is still reused.
+    model, search = install_fakes()
+    graph.invoke(INPUTS, _config(path, freshness_seconds=3600))
+    assert (model.calls, search.calls) == (0, 0)
+
+
+def test_visibility_trend_aggregates_in_sql(tmp_path) -> None:
+    path = str(tmp_path / "results.sqlite")
+    install_fakes()
+    state = graph.invoke(INPUTS, _config(path))
+    store = ResultsStore(path)
+
+    (point,) = store.visibility_trend("Acme")
+    assert point.responses == 6
+    assert point.mentioned == state["tally"].mentions.get("Acme", 0)
+
+    competitor = state["competitors"][0]
+    (point,) = store.visibility_trend("Acme", entity=competitor.name)
+    assert point.mentioned == competitor.mentions
+
+    perspectives = store.perspectives("Acme")
+    assert len(perspectives) == 2
+    assert sum(next(store.visibility_trend("Acme", perspective=key)).responses for key in perspectives) == 6
+    assert list(store.visibility_trend("Acme", model="other/model")) == []
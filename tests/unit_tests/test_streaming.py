@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from agent.matching import MentionMatcher
+from agent.petra_agent import graph
+from benchmarks.fakes import FakeBehavior, install_fakes
+
+pytestmark = pytest.mark.anyio
+
+INPUTS = {
+    "brand_info": {"company_name": "Acme", "website": "acme.example"},
+    "number_of_perspectives": 2,
+    "number_of_prompts": 3,
+}
+
+
+def _config(**configurable) -> dict:
+    return {"configurable": {"model": "fake/test", "search_backend": "fake", **configurable}}
+
+
+def test_streaming_scan_matches_full_scan_for_any_chunking() -> None:
+    matcher = MentionMatcher.for_brand("Under Armour", ["Adidas", "Armour Co"], aliases={"Adidas": ["adidas originals"]})
+    text = "Try Adidas Originals, then under\narmour. Armour Co is niche; Adidas too. "
+    full = matcher.scan(text)
+    for seed in range(20):
+        rng, scan, i = random.Random(seed), matcher.stream(), 0
+        while i < len(text):
+            step = rng.randint(1, 6)
+            scan.feed(text[i:i + step])
+            i += step
+        assert scan.mentions.counts == full.counts
+        assert scan.mentions.first_mention_rank == full.first_mention_rank
+
+
+def test_token_budget_truncates_and_records_the_cut() -> None:
+    model, _ = install_fakes()
+    full = graph.invoke(INPUTS, _config(response_streaming=True))
+    complete_chunks = model.streamed_chunks
+    model, _ = install_fakes()
+    state = graph.invoke(INPUTS, _config(response_token_budget=20, instrumentation=True))
+
+    assert all(r.truncated and r.stop_reason == "token_budget" and r.output_tokens >= 20 for r in state["responses"])
+    assert not any(r.truncated for r in full["responses"])
+    lengths = {r.prompt_id: len(r.response) for r in full["responses"]}
+    assert all(len(r.response) < lengths[r.prompt_id] for r in state["responses"])
+    assert model.streamed_chunks < complete_chunks / 3
+    # Closed streams never report usage; their tokens are still accounted for.
+    assert state["metrics"].nodes["execute_prompts"].output_tokens > 0
+
+
+async def test_stopping_rule_ends_streams_once_the_brand_is_mentioned() -> None:
+    install_fakes(FakeBehavior(mention_rate=0.5))
+    state = await graph.ainvoke(INPUTS, _config(response_stop_rule="brand_mentioned"))
+    matcher = MentionMatcher.for_brand("Acme")
+
+    responses = state["responses"]
+    assert any(r.truncated for r in responses) and not all(r.truncated for r in responses)
+    for r in responses:
+        mentioned = "Acme" in matcher.scan(r.response).counts
+        assert r.truncated == mentioned
+        assert r.stop_reason == ("brand_mentioned" if mentioned else None)
+    assert state["brand_mentions"] == sum(r.truncated for r in responses)
+
+
+def test_unknown_stopping_rule_is_rejected() -> None:
+    install_fakes()
+    with pytest.raises(ValueError, match="Unknown stopping rule"):
+        graph.invoke(INPUTS, _config(response_stop_rule="nope"))